@@ -10,7 +10,8 @@ import ReportView from './components/ReportView';
 import HistoryView from './components/HistoryView';
 import Login from './components/Login';
 import TopologyView from './components/TopologyView';
-import { ScanReport, AppConfig } from './types';
+import { ScanReport, ScanSummary, HistoryPage, AppConfig } from './types';
+import { streamHistoryReport } from './services/scanService';
 import { Map, ShieldCheck, Shield, Activity, HardDrive } from 'lucide-react';
 
 function App() {
@@ -20,7 +21,8 @@ function App() {
     const saved = localStorage.getItem('last_report');
     return saved ? JSON.parse(saved) : null;
   });
-  const [scanHistory, setScanHistory] = useState<ScanReport[]>([]);
+  const [scanHistory, setScanHistory] = useState<ScanSummary[]>([]);
+  const [historyCursor, setHistoryCursor] = useState<number | null>(null);
   
   const [scanLogs, setScanLogs] = useState<{msg: string, type: 'info' | 'warn' | 'error' | 'success' | 'system'}[]>(() => {
     const savedLogs = localStorage.getItem('netaudit_logs');
@@ -81,19 +83,25 @@ function App() {
     localStorage.setItem('netaudit_logs', JSON.stringify(scanLogs));
   }, [scanLogs]);
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (cursor?: number) => {
     if (!isAuthenticated) return;
     try {
-      const response = await fetch(`${config.apiBaseUrl.replace(/\/$/, "")}/api/history`);
+      const query = cursor !== undefined ? `?cursor=${cursor}` : '';
+      const response = await fetch(`${config.apiBaseUrl.replace(/\/$/, "")}/api/history${query}`);
       if (response.ok) {
-        const data = await response.json();
-        setScanHistory(data);
+        const data: HistoryPage = await response.json();
+        setScanHistory(prev => cursor !== undefined ? [...prev, ...data.items] : data.items);
+        setHistoryCursor(data.next_cursor);
       }
     } catch (e) {
       console.warn("审计引擎连接失败");
     }
   };
 
+  const loadMoreHistory = () => {
+    if (historyCursor !== null) fetchHistory(historyCursor);
+  };
+
   useEffect(() => {
     if (isAuthenticated) fetchHistory();
   }, [isAuthenticated, config.apiBaseUrl]);
@@ -109,16 +117,36 @@ function App() {
     setCurrentView('dashboard');
   };
 
-  const handleScanComplete = (newReport: ScanReport) => {
+  const handleScanComplete = async (newReport: ScanReport) => {
     setReport(newReport);
+    setCurrentView('dashboard');
+    // 大型审计的任务结果只含预览，单主机报告从档案流式加载完整内容
+    if (newReport.preview && newReport.id !== undefined) {
+      try {
+        newReport = await streamHistoryReport(config.apiBaseUrl, newReport.id, setReport);
+      } catch (e) {
+        console.warn("完整报告加载失败，仅显示预览");
+      }
+    }
     localStorage.setItem('last_report', JSON.stringify(newReport));
     fetchHistory();
-    setCurrentView('dashboard');
   };
 
-  const handleSelectHistory = (selected: ScanReport) => {
-    setReport(selected);
-    localStorage.setItem('last_report', JSON.stringify(selected));
+  const handleSelectHistory = async (selected: ScanSummary) => {
+    let full = selected as ScanReport;
+    // 列表只含摘要，查看详情时再拉取完整报告
+    if (!selected.defects && selected.id !== undefined) {
+      try {
+        setCurrentView('dashboard');
+        // 报告头到达即开始渲染，发现项随数据流增量追加
+        full = await streamHistoryReport(config.apiBaseUrl, selected.id, setReport);
+      } catch (e) {
+        alert('加载审计报告失败，请检查后端引擎是否在运行。');
+        return;
+      }
+    }
+    setReport(full);
+    localStorage.setItem('last_report', JSON.stringify(full));
     setCurrentView('dashboard');
   };
 
@@ -187,7 +215,8 @@ function App() {
                 onSelect={handleSelectHistory} 
                 onDelete={handleDeleteHistory} 
                 onImport={handleImportHistory} 
-                onRefresh={fetchHistory}
+                onRefresh={() => fetchHistory()}
+                onLoadMore={historyCursor !== null ? loadMoreHistory : undefined}
                 apiBaseUrl={config.apiBaseUrl} 
               />
             );
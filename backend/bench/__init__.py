@@ -0,0 +1,7 @@
+"""
+离线性能基准：在回环地址上启动各协议的本地替身服务，对扫描器与完整审计流程计时。
+
+在 backend 目录下运行：
+    python -m bench.run --output bench.json
+    python -m bench.run --compare bench.json
+"""
@@ -0,0 +1,380 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from bench.servers import LOOPBACK, TcpFarm, HttpStandIn, SshStandIn, DnsStandIn
+
+SCENARIOS = {}
+
+def scenario(name: str):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def latency_stats(samples: list) -> dict:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0
+    }
+
+def timed(fn, iterations: int):
+    """重复执行 fn，返回 (每次耗时列表, 总耗时, 最后一次的返回值)"""
+    samples, result = [], None
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - start, result
+
+def _rate(count: float, elapsed: float) -> float:
+    return round(count / elapsed, 2) if elapsed > 0 else 0.0
+
+def uncached(fn):
+    """每次调用前清空进程级探测缓存，测量的是单次扫描的完整探测成本"""
+    from core.probe_cache import PROBES, PORTS
+    def call():
+        PROBES.clear()
+        PORTS.clear()
+        return fn()
+    return call
+
+@scenario("port_sweep")
+def bench_port_sweep(opts):
+    from scanners.port_scan import sweep_hosts
+    farm = TcpFarm(opts.listeners).start()
+    try:
+        listening = set(farm.ports)
+        closed = [p for p in range(1, 65536) if p not in listening]
+        ports = sorted(listening | set(closed[:max(0, opts.sweep_ports - len(listening))]))
+        start = time.perf_counter()
+        found = sweep_hosts([LOOPBACK], ports)[LOOPBACK]
+        elapsed = time.perf_counter() - start
+    finally:
+        farm.close()
+    return {
+        "ports": len(ports), "elapsed_s": round(elapsed, 3), "ports_per_sec": _rate(len(ports), elapsed),
+        "open_expected": len(listening), "open_found": len(listening & set(found))
+    }
+
+@scenario("scan_http")
+def bench_scan_http(opts):
+    from scanners.web_scan import scan_http
+    server = HttpStandIn(latency=opts.http_latency, soft404=True).start()
+    try:
+        samples, elapsed, result = timed(uncached(lambda: scan_http(LOOPBACK, server.port)), opts.iterations)
+    finally:
+        server.close()
+    return {
+        "calls": len(samples), "elapsed_s": round(elapsed, 3), **latency_stats(samples),
+        "probes_per_sec": _rate(server.requests.value, elapsed),
+        "requests_per_call": round(server.requests.value / len(samples), 1),
+        "connections_per_call": round(server.connections.value / len(samples), 1),
+        "exposed_found": len(result.get("deep_scan", {}).get("exposed_paths", []))
+    }
+
+@scenario("tls")
+def bench_tls(opts):
+    from scanners.tls_scan import check_tls_vulnerability
+    server = HttpStandIn(tls=True, min_version=ssl.TLSVersion.TLSv1).start()
+    try:
+        # 每次使用新的 TlsInspector 并清空探测缓存，测量无缓存时的完整检查成本
+        samples, elapsed, result = timed(uncached(lambda: check_tls_vulnerability(LOOPBACK, server.port)), opts.iterations)
+    finally:
+        server.close()
+    return {
+        "calls": len(samples), "elapsed_s": round(elapsed, 3), **latency_stats(samples),
+        "handshakes_per_call": round(server.connections.value / len(samples), 1),
+        "weak_protocols": result.get("weak_protocols", [])
+    }
+
+@scenario("ssh_brute")
+def bench_ssh_brute(opts):
+    from scanners.sys_scan import brute_force_ssh
+    server = SshStandIn(credential=("admin", "correct-horse"), max_auth_tries=opts.ssh_max_auth_tries).start()
+    users = ["root", "test", "admin"]
+    passwords = [f"pw{i}" for i in range(opts.ssh_passwords)] + ["correct-horse"]
+    try:
+        start = time.perf_counter()
+        found = brute_force_ssh(LOOPBACK, server.port, users, passwords)["weak_creds"]
+        elapsed = time.perf_counter() - start
+    finally:
+        server.close()
+    return {
+        "elapsed_s": round(elapsed, 3), "attempts": server.attempts.value,
+        "attempts_per_sec": _rate(server.attempts.value, elapsed),
+        "sessions": server.sessions.value, "found": bool(found)
+    }
+
+@scenario("axfr")
+def bench_axfr(opts):
+    from scanners.dns_scan import check_zone_transfer
+    server = DnsStandIn(records=opts.axfr_records).start()
+    try:
+        samples, elapsed, result = timed(
+            lambda: check_zone_transfer("bench.local", LOOPBACK, server.port), opts.iterations)
+    finally:
+        server.close()
+    return {
+        "calls": len(samples), "elapsed_s": round(elapsed, 3), **latency_stats(samples),
+        "records_per_sec": _rate(opts.axfr_records * len(samples), elapsed),
+        "vulnerable": bool(result.get("vulnerable"))
+    }
+
+@scenario("shared_probes")
+def bench_shared_probes(opts):
+    """模拟多个操作员同时审计同一目标：统计实际到达替身服务的连接数与探测缓存命中情况"""
+    from concurrent.futures import ThreadPoolExecutor
+    from core.probe_cache import PROBE_CACHE
+    from scanners.sys_scan import check_ssh_banner
+    from scanners.tls_scan import check_tls_vulnerability
+    from scanners.web_scan import fingerprint_http
+    http = HttpStandIn(latency=opts.http_latency).start()
+    https = HttpStandIn(tls=True).start()
+    ssh = SshStandIn().start()
+
+    def audit(_):
+        check_ssh_banner(LOOPBACK, ssh.port)
+        fingerprint_http(LOOPBACK, http.port)
+        check_tls_vulnerability(LOOPBACK, https.port)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts.concurrent_scans) as pool:
+            list(pool.map(audit, range(opts.concurrent_scans)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for server in (http, https, ssh):
+            server.close()
+    lookups = {}
+    for (cache, kind, result), n in PROBE_CACHE.snapshot().items():
+        lookups[result] = lookups.get(result, 0) + n
+    return {
+        "scans": opts.concurrent_scans, "elapsed_s": round(elapsed, 3),
+        "http_connections": http.connections.value, "tls_connections": https.connections.value,
+        "cache_hits": lookups.get("hit", 0), "cache_shared": lookups.get("shared", 0), "cache_misses": lookups.get("miss", 0)
+    }
+
+@scenario("deep_scan")
+def bench_deep_scan(opts):
+    # 配置在导入 engine 时读取，需先把数据目录指向临时目录
+    os.environ["NETAUDIT_DATA_DIR"] = tempfile.mkdtemp(prefix="netaudit-bench-data-")
+    from core import engine
+
+    farm = TcpFarm(opts.listeners).start()
+    http = HttpStandIn(latency=opts.http_latency, soft404=True).start()
+    https = HttpStandIn(tls=True, min_version=ssl.TLSVersion.TLSv1).start()
+    ssh = SshStandIn(credential=("admin", "correct-horse")).start()
+    dns_server = DnsStandIn(records=opts.axfr_records).start()
+    servers = [farm, http, https, ssh, dns_server]
+    ports = farm.ports + [http.port, https.port, ssh.port, dns_server.port]
+    # DNS 端口不在端口配置中标注 (空列表覆盖默认的 53)，须由服务指纹识别并路由到 AXFR 审计
+    request = engine.ScanRequest(
+        target=LOOPBACK, domains=["bench.local"], port_range=",".join(map(str, ports)),
+        ports_config={"ssh": str(ssh.port), "http": str(http.port), "https": str(https.port), "dns": ""},
+        dictionaries={"usernames": "root\nadmin", "passwords": "\n".join([f"pw{i}" for i in range(opts.ssh_passwords)] + ["correct-horse"])},
+        mode="深度审计", enable_brute=True)
+    task_id = str(uuid.uuid4())
+    try:
+        engine.task_store.create(task_id, {"percent": 0, "log": "bench"})
+        start = time.perf_counter()
+        engine.run_deep_scan(task_id, request)
+        elapsed = time.perf_counter() - start
+    finally:
+        for server in servers:
+            server.close()
+    state = engine.task_store.get(task_id) or {}
+    report = state.get("result") or {}
+    if not any(d["id"] == f"DNS-AXFR-{dns_server.port}" for d in report.get("defects", [])):
+        raise RuntimeError(f"未标注的 DNS 端口 {dns_server.port} 未被识别并执行 AXFR 审计")
+    return {
+        "elapsed_s": round(elapsed, 3), "status": state.get("status"),
+        "open_ports": len(report.get("port_statuses", [])), "defects": len(report.get("defects", [])),
+        "ports_per_sec": _rate(len(ports), elapsed)
+    }
+
+# API 进程启动时不应导入的重量级依赖 (由扫描器在首次使用时加载)
+HEAVY_MODULES = ("paramiko", "dns", "cryptography", "requests")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"import_ms": elapsed * 1000, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+@scenario("import_time")
+def bench_import_time(opts):
+    """在全新解释器中导入 API 入口，测量冷启动导入耗时，并确认扫描器依赖未被提前加载"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, NETAUDIT_DATA_DIR=tempfile.mkdtemp(prefix="netaudit-bench-data-"))
+    samples, heavy = [], []
+    for _ in range(opts.iterations):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE % (HEAVY_MODULES,)], cwd=backend, env=env,
+                             capture_output=True, text=True, timeout=120, check=True)
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(probe["import_ms"])
+        heavy = probe["heavy"]
+    import_ms = round(min(samples), 3)
+    if heavy:
+        raise RuntimeError(f"导入 main 时加载了重量级依赖: {', '.join(heavy)}")
+    if opts.import_budget_ms and import_ms > opts.import_budget_ms:
+        raise RuntimeError(f"导入耗时 {import_ms}ms 超出预算 {opts.import_budget_ms}ms")
+    return {"import_ms": import_ms, "import_p50_ms": round(percentile(samples, 50), 3)}
+
+@scenario("findings")
+def bench_findings(opts):
+    """大量发现项的汇集、分批入库与报告生成：peak_rss_kb 应基本不随 --findings 增长"""
+    os.environ["NETAUDIT_DATA_DIR"] = tempfile.mkdtemp(prefix="netaudit-bench-data-")
+    from core import engine
+    from core.findings import HostReport
+
+    task_id = str(uuid.uuid4())
+    request = engine.ScanRequest(target=LOOPBACK, port_range="1-65535", ports_config={}, dictionaries={})
+    scan_id = engine.storage.begin_scans([LOOPBACK], task_id)[LOOPBACK]
+    host = HostReport(LOOPBACK, scan_id, engine.storage.append_results)
+    start = time.perf_counter()
+    for i in range(opts.findings):
+        port = i % 65535 + 1
+        findings = engine.analyzer.analyze_service("TCP", port, "")
+        for f in findings:
+            f["port"] = port
+        host.add(findings, {"port": port, "protocol": "TCP", "status": "OPEN", "detail": "Active"})
+    report = engine.build_report(host, request)
+    elapsed = time.perf_counter() - start
+    return {
+        "findings": report["defect_count"], "elapsed_s": round(elapsed, 3),
+        "findings_per_sec": _rate(report["defect_count"], elapsed)
+    }
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _child(name, opts, conn):
+    try:
+        metrics = SCENARIOS[name](opts)
+        metrics["peak_rss_kb"] = _peak_rss_kb()
+        conn.send(metrics)
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+def run_scenario(name: str, opts) -> dict:
+    """每个场景在独立子进程中运行，peak_rss_kb 只反映该场景自身的内存峰值"""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(name, opts, child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"error": f"scenario exited with code {proc.exitcode}"}
+    proc.join()
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+# 指标方向：按名称后缀判断数值越大越好还是越小越好
+HIGHER_IS_BETTER = ("_per_sec",)
+LOWER_IS_BETTER = ("_ms", "_s", "_kb")
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """返回超出容差的回退项列表"""
+    regressions = []
+    for name, metrics in current.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name, {})
+        for key, value in metrics.items():
+            old = before.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            if key.endswith(HIGHER_IS_BETTER) and change < -tolerance:
+                regressions.append(f"{name}.{key}: {old} -> {value} ({change:+.1%})")
+            elif key.endswith(LOWER_IS_BETTER) and change > tolerance:
+                regressions.append(f"{name}.{key}: {old} -> {value} ({change:+.1%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NetAudit 离线性能基准")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景名称")
+    parser.add_argument("--output", help="结果 JSON 的输出路径，缺省输出到标准输出")
+    parser.add_argument("--compare", help="与之前的结果 JSON 比较，出现回退时返回非零退出码")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对回退幅度")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--listeners", type=int, default=100, help="TCP 监听端口数量")
+    parser.add_argument("--sweep-ports", type=int, default=65535, help="端口扫描场景探测的端口总数")
+    parser.add_argument("--http-latency", type=float, default=0.005, help="HTTP 替身服务的单请求延迟 (秒)")
+    parser.add_argument("--ssh-passwords", type=int, default=30)
+    parser.add_argument("--ssh-max-auth-tries", type=int, default=0, help="SSH 替身服务每个会话允许的失败认证次数，0 表示不限制")
+    parser.add_argument("--axfr-records", type=int, default=2000)
+    parser.add_argument("--concurrent-scans", type=int, default=8, help="shared_probes 场景中同时审计同一目标的扫描数")
+    parser.add_argument("--findings", type=int, default=100000, help="findings 场景生成的发现项数量")
+    # 默认预算约为当前冷启动导入耗时 (~400ms，主要来自 fastapi / pydantic) 的 2.5 倍，为较慢的机器留出余量
+    parser.add_argument("--import-budget-ms", type=float, default=1000, help="import_time 场景的导入耗时上限 (毫秒)，0 表示不检查")
+    opts = parser.parse_args(argv)
+
+    names = [n.strip() for n in opts.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    results = {
+        "meta": {
+            "commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "options": {k: v for k, v in vars(opts).items() if k not in ("output", "compare")}
+        },
+        "scenarios": {}
+    }
+    for name in names:
+        print(f"[bench] {name} ...", file=sys.stderr)
+        results["scenarios"][name] = run_scenario(name, opts)
+
+    payload = json.dumps(results, ensure_ascii=False, indent=2)
+    if opts.output:
+        with open(opts.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    failed = [n for n, m in results["scenarios"].items() if "error" in m]
+    for name in failed:
+        print(f"[bench] {name} failed: {results['scenarios'][name]['error']}", file=sys.stderr)
+    if opts.compare:
+        with open(opts.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, opts.tolerance)
+        for line in regressions:
+            print(f"[bench] regression {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
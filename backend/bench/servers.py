@@ -0,0 +1,313 @@
+import datetime
+import http.server
+import logging
+import os
+import selectors
+import socket
+import ssl
+import struct
+import tempfile
+import threading
+import time
+
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+import paramiko
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+LOOPBACK = "127.0.0.1"
+
+# 端口扫描与 Banner 探测会直接断开 SSH 替身的连接，屏蔽 paramiko 服务端的异常日志
+logging.getLogger("paramiko.transport").setLevel(logging.CRITICAL)
+
+class Counter:
+    """替身服务端的线程安全计数器，用于统计实际到达服务端的探测数"""
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def incr(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+class TcpFarm:
+    """一组只接受并立即关闭连接的 TCP 监听端口，模拟大量开放端口"""
+    def __init__(self, count: int = 100):
+        self.sockets = []
+        for _ in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((LOOPBACK, 0))
+            s.listen(128)
+            s.setblocking(False)
+            self.sockets.append(s)
+        self.ports = sorted(s.getsockname()[1] for s in self.sockets)
+        self.accepted = Counter()
+        self._selector = selectors.DefaultSelector()
+        for s in self.sockets:
+            self._selector.register(s, selectors.EVENT_READ)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            for key, _ in self._selector.select(timeout=0.2):
+                try:
+                    conn, _ = key.fileobj.accept()
+                    conn.close()
+                    self.accepted.incr()
+                except OSError:
+                    pass
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._selector.close()
+        for s in self.sockets:
+            s.close()
+
+def self_signed_cert(common_name: str = "bench.local", key_size: int = 2048, days: int = 30):
+    """生成自签名证书，返回 (证书 PEM 路径, 私钥 PEM 路径)，文件位于临时目录"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=days))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(common_name)]), critical=False)
+            .sign(key, hashes.SHA256()))
+    directory = tempfile.mkdtemp(prefix="netaudit-bench-")
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+class HttpStandIn:
+    """
+    HTTP/HTTPS 替身服务：
+    1. latency 为每个请求的固定处理延迟 (秒)。
+    2. soft404=True 时不存在的路径返回 200 与统一的错误页，用于检验伪 404 基线。
+    3. tls=True 时使用自签名证书；min_version 可放宽到 TLSv1 以触发老旧协议检查。
+    """
+    def __init__(self, latency: float = 0.0, soft404: bool = False, exposed=("/.env", "/.git/config"),
+                 tls: bool = False, key_size: int = 2048, min_version=None):
+        self.requests = Counter()
+        self.connections = Counter()
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in.requests.incr()
+                if latency: time.sleep(latency)
+                path = self.path.split("?", 1)[0]
+                if path == "/" or path in exposed:
+                    status, body = 200, f"<html>bench {path}</html>".encode()
+                elif soft404:
+                    status, body = 200, b"<html>Page not found, return to home</html>"
+                else:
+                    status, body = 404, b"not found"
+                self.send_response(status)
+                self.send_header("Server", "nginx/1.18.0")
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_HEAD = do_GET
+
+        class Server(http.server.ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+            def get_request(self):
+                sock, addr = super().get_request()
+                stand_in.connections.incr()
+                return sock, addr
+
+            def handle_error(self, request, client_address):
+                # 被拒绝的老旧协议握手、客户端提前断开都属于预期行为
+                pass
+
+        self.server = Server((LOOPBACK, 0), Handler)
+        if tls:
+            cert_path, key_path = self_signed_cert(key_size=key_size)
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            if min_version is not None:
+                ctx.minimum_version = min_version
+                ctx.set_ciphers("ALL:@SECLEVEL=0")
+            ctx.load_cert_chain(cert_path, key_path)
+            self.server.socket = ctx.wrap_socket(self.server.socket, server_side=True, do_handshake_on_connect=False)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class _SshInterface(paramiko.ServerInterface):
+    def __init__(self, stand_in, transport):
+        self.stand_in = stand_in
+        self.transport = transport
+        self.failures = 0
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        limit = self.stand_in.max_auth_tries
+        if limit and self.failures >= limit:
+            # 与 OpenSSH 的 MaxAuthTries 一致：失败次数达到上限后断开会话
+            self.transport.close()
+            return paramiko.AUTH_FAILED
+        self.stand_in.attempts.incr()
+        if (username, password) == self.stand_in.credential:
+            return paramiko.AUTH_SUCCESSFUL
+        self.failures += 1
+        return paramiko.AUTH_FAILED
+
+class SshStandIn:
+    """
+    基于 paramiko 的 SSH 替身服务，只接受一组预设凭据；统计密钥交换与认证尝试次数。
+    max_auth_tries 为每个会话允许的失败认证次数，0 表示不限制。
+    """
+    def __init__(self, credential=("admin", "letmein"), max_auth_tries: int = 0):
+        self.credential = tuple(credential)
+        self.max_auth_tries = max_auth_tries
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.attempts = Counter()
+        self.sessions = Counter()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((LOOPBACK, 0))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        try:
+            transport.start_server(server=_SshInterface(self, transport))
+            self.sessions.incr()
+            # 会话由客户端关闭；认证成功后客户端不会打开通道
+            while transport.is_active() and not self._stop.is_set():
+                time.sleep(0.05)
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.sock.close()
+
+class DnsStandIn:
+    """DNS 替身服务 (TCP)：对本区域的 AXFR 返回 records 条 A 记录，其余查询回应 REFUSED"""
+    def __init__(self, zone: str = "bench.local", records: int = 500, chunk: int = 200):
+        self.zone = dns.name.from_text(zone)
+        self.transfers = Counter()
+        soa = dns.rrset.from_text(self.zone, 3600, "IN", "SOA",
+                                  f"ns1.{zone}. admin.{zone}. 1 3600 600 86400 300")
+        self.soa = soa
+        self.ns = dns.rrset.from_text(self.zone, 3600, "IN", "NS", f"ns1.{zone}.")
+        self.rrsets = [dns.rrset.from_text(f"host{i}.{zone}.", 3600, "IN", "A",
+                                           f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}")
+                       for i in range(records)]
+        self.chunk = chunk
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((LOOPBACK, 0))
+        self.sock.listen(32)
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    @staticmethod
+    def _recv_exact(conn, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            part = conn.recv(size - len(data))
+            if not part:
+                raise ConnectionError("peer closed")
+            data += part
+        return data
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                length = struct.unpack("!H", self._recv_exact(conn, 2))[0]
+                query = dns.message.from_wire(self._recv_exact(conn, length))
+            except Exception:
+                return
+            if query.question[0].rdtype != dns.rdatatype.AXFR or query.question[0].name != self.zone:
+                response = dns.message.make_response(query)
+                response.set_rcode(dns.rcode.REFUSED)
+                wire = response.to_wire()
+                try:
+                    conn.sendall(struct.pack("!H", len(wire)) + wire)
+                except OSError:
+                    pass
+                return
+            self.transfers.incr()
+            answers = [self.soa, self.ns] + self.rrsets + [self.soa]
+            for i in range(0, len(answers), self.chunk):
+                response = dns.message.make_response(query)
+                response.answer = answers[i:i + self.chunk]
+                wire = response.to_wire(max_size=65535)
+                try:
+                    conn.sendall(struct.pack("!H", len(wire)) + wire)
+                except OSError:
+                    # 客户端达到读取上限后会提前断开
+                    return
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.sock.close()
@@ -1,119 +1,257 @@
-
 import json
 import os
+import re
+import sys
+import threading
+import time
+
+# 规则文件中的英文风险等级到报告等级的映射
+LEVEL_MAP = {"High": "高危", "Medium": "中危", "Low": "低危", "Info": "安全"}
+
+# 各风险等级的扣分，评分 = 100 - 扣分总和 (不低于 0)
+RISK_PENALTY = {"高危": 25, "中危": 10, "低危": 2}
+# 风险等级到报告 summary 计数字段的映射
+SUMMARY_KEYS = {"高危": "high", "中危": "medium", "低危": "low"}
+
+def score_from_summary(summary: dict) -> int:
+    """按各风险等级的发现项计数计算评分"""
+    penalty = sum(RISK_PENALTY[level] * summary.get(key, 0) for level, key in SUMMARY_KEYS.items())
+    return max(0, 100 - penalty)
+
+# 规则文件 mtime 的检查间隔 (秒)，避免每次分析都 stat 文件
+RELOAD_INTERVAL = 1.0
+
+_MISSING = object()
+_PLACEHOLDER = re.compile(r"\{([^{}|]+)(?:\|([^{}]+))?\}")
+
+def _resolve(context: dict, path: str):
+    """按点分路径取值，列表段使用数字下标；路径不存在时返回 _MISSING"""
+    value = context
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, (list, tuple)) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+def _format_paths(paths, limit=None):
+    # 大字典可能命中大量路径，详情仅列出前 limit 条
+    limit = int(limit or 20)
+    listed = ", ".join(f"{p['path']} (HTTP {p['status']})" for p in paths[:limit])
+    return listed + (f" 等共 {len(paths)} 条" if len(paths) > limit else "")
+
+# 模板过滤器：{字段|过滤器:参数}
+FILTERS = {
+    "join": lambda v, sep=None: (sep or ", ").join(str(x) for x in v),
+    "count": lambda v, _=None: str(len(v)),
+    "paths": _format_paths
+}
+
+def _ordered(op):
+    def compare(actual, expected):
+        try:
+            return op(actual, expected)
+        except TypeError:
+            return False
+    return compare
+
+# 字段谓词：actual 为 _MISSING 时除 missing 外一律不成立
+OPERATORS = {
+    "exists": lambda a, _: True,
+    "nonempty": lambda a, _: bool(a),
+    "true": lambda a, _: a is True,
+    "false": lambda a, _: a is False,
+    "eq": lambda a, v: a == v,
+    "ne": lambda a, v: a != v,
+    "lt": _ordered(lambda a, v: a < v),
+    "le": _ordered(lambda a, v: a <= v),
+    "gt": _ordered(lambda a, v: a > v),
+    "ge": _ordered(lambda a, v: a >= v),
+    "in": lambda a, v: a in v,
+    "contains": lambda a, v: v in a if isinstance(a, (str, list, tuple, dict)) else False,
+    "regex": lambda a, v: isinstance(a, str) and v.search(a) is not None
+}
+
+def render(template: str, context: dict) -> str:
+    def substitute(m):
+        value = _resolve(context, m.group(1).strip())
+        if value is _MISSING or value is None:
+            return ""
+        if m.group(2):
+            name, _, arg = m.group(2).partition(":")
+            return FILTERS[name.strip()](value, arg or None)
+        return str(value)
+    return _PLACEHOLDER.sub(substitute, template)
+
+def _compile_text(template: str):
+    """不含占位符的模板在加载时驻留为常量字符串，所有发现项共享同一对象；否则返回模板由 render 渲染"""
+    template = str(template)
+    return (sys.intern(template), False) if not _PLACEHOLDER.search(template) else (template, True)
+
+class CompiledRule:
+    """单条规则编译后的形态：条件在加载时转换为谓词函数，分析时只做求值与模板渲染"""
+    __slots__ = ("key", "rule", "fallback", "protocols", "banner", "predicates", "template", "texts", "level", "clause")
+
+    def __init__(self, key: str, rule: dict):
+        match = rule.get("match") or {}
+        self.key = key
+        self.rule = rule
+        self.fallback = bool(rule.get("fallback"))
+        self.protocols = tuple(match.get("protocols") or ())
+        self.banner = re.compile(match["banner"]) if match.get("banner") else None
+        self.predicates = [self._predicate(cond) for cond in match.get("all") or []]
+        self.template = dict(rule.get("finding") or {})
+        if "id" not in self.template:
+            self.template["id"] = f"{key}-{{port}}"
+        tpl = self.template
+        self.texts = {
+            "id": _compile_text(tpl["id"]),
+            "check_item": _compile_text(tpl.get("check_item", rule.get("name", "通用安全检查"))),
+            "description": _compile_text(tpl.get("description", rule.get("description", "检测到潜在安全风险。"))),
+            "detail_value": _compile_text(tpl.get("detail", "")),
+            "suggestion": _compile_text(tpl.get("suggestion", rule.get("suggestion", "请核查此服务的必要性。")))
+        }
+        self.level = LEVEL_MAP.get(rule.get("risk_level", "Low"), "低危")
+        self.clause = sys.intern(str(tpl.get("clause_id", rule.get("clause_id", "G3-访问控制"))))
+
+    @staticmethod
+    def _predicate(cond: dict):
+        field, op, expected = cond["field"], cond.get("op", "nonempty"), cond.get("value")
+        if op == "missing":
+            return lambda ctx: _resolve(ctx, field) is _MISSING
+        if op not in OPERATORS:
+            raise ValueError(f"未知的规则运算符: {op}")
+        check = OPERATORS[op]
+        if op == "regex":
+            # 正则在加载时编译，规则文件中的非法正则会使整次重载失败
+            expected = re.compile(expected)
+        def predicate(ctx):
+            actual = _resolve(ctx, field)
+            return actual is not _MISSING and check(actual, expected)
+        return predicate
+
+    def matches(self, context: dict) -> bool:
+        if self.banner and not self.banner.search(context.get("banner") or ""):
+            return False
+        return all(p(context) for p in self.predicates)
+
+    def build(self, context: dict) -> dict:
+        finding = {name: render(text, context) if dynamic else text for name, (text, dynamic) in self.texts.items()}
+        finding["protocol"] = context["protocol"]
+        finding["risk_level"] = self.level
+        finding["mlps_clause"] = self.clause
+        if "metadata" in self.template:
+            finding["metadata"] = dict(self.template["metadata"])
+        return finding
+
+class RuleTable:
+    """
+    按协议索引的规则分派表：
+    未声明 protocols 的规则对所有协议生效；常规规则全部求值，
+    兜底规则 (fallback) 仅在常规规则无命中时按顺序取第一条命中。
+    """
+    def __init__(self, rules: dict):
+        self.rules = rules
+        compiled = [CompiledRule(key, rule) for key, rule in rules.items() if isinstance(rule, dict)]
+        protocols = {p for r in compiled for p in r.protocols}
+        self._wildcard = self._split([r for r in compiled if not r.protocols])
+        self._table = {
+            proto: self._split([r for r in compiled if not r.protocols or proto in r.protocols])
+            for proto in protocols
+        }
+
+    @staticmethod
+    def _split(rules: list):
+        return [r for r in rules if not r.fallback], [r for r in rules if r.fallback]
+
+    def evaluate(self, context: dict) -> list:
+        primary, fallback = self._table.get(context["protocol"], self._wildcard)
+        findings = [r.build(context) for r in primary if r.matches(context)]
+        if not findings:
+            for r in fallback:
+                if r.matches(context):
+                    findings.append(r.build(context))
+                    break
+        return findings
 
 class SecurityAnalyzer:
+    """
+    声明式合规规则引擎：
+    1. compliance_rules.json 中每条规则携带匹配条件 (协议、Banner 正则、字段谓词)，加载时编译为按协议索引的分派表。
+    2. 规则文件 mtime 变化时重新编译并整体替换分派表；文件被删除或新内容解析失败时记录日志并继续使用旧规则。
+    3. 构造时规则文件缺失或无法解析直接抛出 RuntimeError：没有任何规则时扫描会静默地产出零发现项。
+    """
     def __init__(self, rules_path: str = None):
         if not rules_path:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             rules_path = os.path.join(base_dir, "data", "compliance_rules.json")
-        self.rules = self._load_rules(rules_path)
+        self.rules_path = rules_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self._table = self._load()
 
-    def _load_rules(self, path: str):
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except: pass
-        return {}
+    @property
+    def rules(self) -> dict:
+        return self._table.rules
 
-    def analyze_service(self, protocol: str, port: int, banner: str, extra_data: dict = None):
-        findings = []
-        banner_low = banner.lower()
-        extra = extra_data or {}
-        
-        # 1. SSH 弱口令检查
-        if protocol == "SSH":
-            weak_creds = extra.get("weak_creds", [])
-            if weak_creds:
-                rule = self.rules.get("SSH_WEAK_PASS", {})
-                creds = weak_creds[0]
-                findings.append({
-                    "id": f"SSH-PWD-{port}",
-                    "protocol": protocol,
-                    "check_item": "系统权限已失陷 (SSH 弱口令)",
-                    "risk_level": "高危",
-                    "description": f"成功获取系统登录凭据：{creds['user']} / {creds['pass']}",
-                    "detail_value": f"Exploit Data: Found Valid Credential pair on port {port}",
-                    "suggestion": "1. 立即强制修改该账户密码；2. 启用多因素认证 (MFA)；3. 限制 SSH 来源 IP。",
-                    "mlps_clause": "G3-安全计算环境-身份鉴别",
-                    "metadata": {"is_compromised": True}
-                })
-
-        # 2. TLS/HTTPS 基础检查
-        if protocol == "HTTPS" and "tls_results" in extra:
-            tls = extra["tls_results"]
-            if tls.get("weak_protocols"):
-                rule = self.rules.get("TLS_OLD_PROTO", {})
-                findings.append(self._format_finding(f"TLS-PROTO-{port}", protocol, rule, f"支持不安全协议: {', '.join(tls['weak_protocols'])}"))
-            
-            if tls.get("cert_info"):
-                info = tls["cert_info"]
-                if info.get("is_expired"):
-                    findings.append(self._format_finding(f"TLS-CERT-EXP-{port}", protocol, {"name": "数字证书已过期", "risk_level": "High", "clause_id": "G3-安全通信网络"}, f"过期时间: {info['expiry']}"))
-                if info.get("key_size", 2048) < 2048:
-                    rule = self.rules.get("TLS_WEAK_CERT", {})
-                    findings.append(self._format_finding(f"TLS-CERT-SIZE-{port}", protocol, rule, f"当前 RSA 密钥长度: {info['key_size']} bit"))
-
-        # 3. Web 深度探测分析
-        if protocol in ["HTTP", "HTTPS"] and "web_results" in extra:
-            web = extra["web_results"]
-            deep = web.get("deep_scan", {})
-            
-            # 敏感目录暴露
-            exposed = deep.get("exposed_paths", [])
-            if exposed:
-                rule = self.rules.get("WEB_SENSITIVE_EXPOSURE", {})
-                path_list = [f"{p['path']} (HTTP {p['status']})" for p in exposed]
-                findings.append(self._format_finding(f"WEB-EXPOSED-{port}", protocol, rule, f"发现敏感暴露路径: {', '.join(path_list)}"))
-            
-            # 安全头缺失
-            missing = deep.get("missing_headers", [])
-            if missing:
-                rule = self.rules.get("WEB_MISSING_HEADERS", {})
-                findings.append(self._format_finding(f"WEB-HEADERS-{port}", protocol, rule, f"缺失安全响应头: {', '.join(missing)}"))
-
-            # 指纹泄露
-            if any(x in banner_low for x in ["nginx", "apache", "iis"]):
-                rule = self.rules.get("HTTP_BANNER_LEAK", {})
-                findings.append(self._format_finding(f"WEB-BANNER-{port}", protocol, rule, banner))
-
-        # 4. DNS AXFR 检查
-        if protocol == "DNS" and extra.get("dns_results"):
-            dns = extra["dns_results"]
-            if dns.get("vulnerable"):
-                rule = self.rules.get("DNS_ZONE_TRANSFER", {})
-                findings.append(self._format_finding(f"DNS-AXFR-{port}", protocol, rule, dns.get("detail", "")))
-
-        # 5. 默认兜底
-        if not findings:
-            if protocol == "SSH" and "openssh" in banner_low:
-                rule = self.rules.get("SSH_BANNER_LEAK", {})
-                findings.append(self._format_finding(f"SSH-BANNER-{port}", protocol, rule, banner))
-            else:
-                rule = self.rules.get("TCP_PORT_OPEN", {})
-                findings.append(self._format_finding(f"PORT-{port}", protocol, rule, f"开放端口: {port}"))
+    def _load(self) -> RuleTable:
+        """首次加载规则表，失败时抛出 RuntimeError"""
+        try:
+            mtime = os.stat(self.rules_path).st_mtime_ns
+            with open(self.rules_path, 'r', encoding='utf-8') as f:
+                table = RuleTable(json.load(f))
+        except Exception as e:
+            raise RuntimeError(f"Failed to load compliance rules from {self.rules_path}: {str(e)}") from e
+        self._mtime = mtime
+        return table
 
-        return findings
+    def _reload(self):
+        try:
+            mtime = os.stat(self.rules_path).st_mtime_ns
+        except OSError as e:
+            # 只在文件刚消失时记录一次，文件恢复后按 mtime 变化重新加载
+            if self._mtime is not None:
+                print(f"Compliance rules unavailable, keeping previous rules: {str(e)}")
+                self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.rules_path, 'r', encoding='utf-8') as f:
+                table = RuleTable(json.load(f))
+        except Exception as e:
+            print(f"Failed to reload compliance rules, keeping previous rules: {str(e)}")
+            self._mtime = mtime
+            return
+        # 单次属性赋值完成替换，并发的分析调用要么看到旧表、要么看到新表
+        self._table = table
+        self._mtime = mtime
 
-    def _format_finding(self, id_val: str, protocol: str, rule: dict, detail: str):
-        level_map = {"High": "高危", "Medium": "中危", "Low": "低危", "Info": "安全"}
-        raw_level = rule.get("risk_level", "Low")
-        return {
-            "id": id_val, "protocol": protocol,
-            "check_item": rule.get("name", "通用安全检查"),
-            "risk_level": level_map.get(raw_level, "低危"),
-            "description": rule.get("description", "检测到潜在安全风险。"),
-            "detail_value": detail,
-            "suggestion": rule.get("suggestion", "请核查此服务的必要性。"),
-            "mlps_clause": rule.get("clause_id", "G3-访问控制")
-        }
+    def _current(self) -> RuleTable:
+        now = time.monotonic()
+        if now - self._checked >= RELOAD_INTERVAL:
+            with self._lock:
+                if now - self._checked >= RELOAD_INTERVAL:
+                    self._checked = now
+                    self._reload()
+        return self._table
+
+    @staticmethod
+    def _context(protocol: str, port: int, banner: str, extra_data: dict = None) -> dict:
+        return {**(extra_data or {}), "protocol": protocol, "port": port, "banner": banner or ""}
+
+    def analyze_service(self, protocol: str, port: int, banner: str, extra_data: dict = None):
+        return self._current().evaluate(self._context(protocol, port, banner, extra_data))
 
-    def calculate_score(self, defects: list):
-        score = 100
-        for d in defects:
-            level = d.get('risk_level')
-            if level == '高危': score -= 25
-            elif level == '中危': score -= 10
-            elif level == '低危': score -= 2
-        return max(0, score)
+    def analyze_batch(self, observations) -> list:
+        """
+        批量分析多个服务观测 (protocol, port, banner[, extra_data])，整批使用同一版本的规则表。
+        返回与输入顺序一致的发现项列表。
+        """
+        table = self._current()
+        return [table.evaluate(self._context(*obs)) for obs in observations]
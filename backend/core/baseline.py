@@ -0,0 +1,78 @@
+import hashlib
+import json
+from collections import defaultdict
+
+def unit_key(port: int, kind: str, domain: str = None) -> str:
+    """审计单元标识：端口/协议类别/域名，用于在两次审计之间对齐指纹与发现项"""
+    return f"{port}/{kind}/{domain or ''}"
+
+# 发现项协议到审计单元类别的映射 (HTTPS 的 TLS 检查属于 Web 审计单元)
+UNIT_KINDS = {"SSH": "ssh", "HTTP": "web", "HTTPS": "web", "DNS": "dns"}
+
+def finding_unit(finding: dict) -> str:
+    return unit_key(finding.get("port"), UNIT_KINDS.get(finding.get("protocol"), "tcp"), finding.get("domain"))
+
+def finding_key(finding: dict):
+    return finding.get("port"), finding.get("id"), finding.get("domain")
+
+def digest(*parts) -> str:
+    """对服务指纹的各组成部分取稳定摘要"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ScanBaseline:
+    """
+    上一次审计报告的只读视图，供增量审计使用：
+    1. 增量模式仍完整探测本次请求的端口范围 (新开放的端口是最重要的变化)，基线只用于跳过深度审计。
+    2. 审计单元的指纹 (SSH Banner、HTTP 响应头、证书指纹) 未变化时，直接复用上次该单元的发现项。
+    """
+    def __init__(self, report: dict):
+        self.scan_id = report.get("id")
+        self.fingerprints = report.get("fingerprints") or {}
+        self.defects = report.get("defects") or []
+        self._findings = defaultdict(list)
+        for f in self.defects:
+            self._findings[finding_unit(f)].append(f)
+
+    def reuse(self, key: str, fingerprint: str):
+        """指纹一致时返回上次该单元发现项的副本，否则返回 None"""
+        if fingerprint is None or self.fingerprints.get(key) != fingerprint:
+            return None
+        return [dict(f) for f in self._findings.get(key, [])]
+
+    def tracker(self) -> "BaselineDiff":
+        return BaselineDiff(self)
+
+# 差异明细随报告保存的条数上限，完整数量见 new_count / fixed_count / unchanged_count
+DIFF_LIST_LIMIT = 200
+
+class BaselineDiff:
+    """
+    与基线逐条对比的增量差异：发现项产生时即归入新增或未变化，结束时基线中未出现的归入已修复。
+    只保留本次发现项的键与前 DIFF_LIST_LIMIT 条明细，不需要完整的发现项列表。
+    """
+    def __init__(self, baseline: ScanBaseline):
+        self.scan_id = baseline.scan_id
+        self._before = {finding_key(f): f for f in baseline.defects}
+        self._seen = set()
+        self._lists = {"new": [], "unchanged": []}
+        self._counts = {"new": 0, "unchanged": 0}
+
+    def add(self, finding: dict):
+        key = finding_key(finding)
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        kind = "unchanged" if key in self._before else "new"
+        self._counts[kind] += 1
+        if len(self._lists[kind]) < DIFF_LIST_LIMIT:
+            self._lists[kind].append(finding)
+
+    def result(self, reused_units: int = 0) -> dict:
+        fixed = [f for k, f in self._before.items() if k not in self._seen]
+        return {
+            "base_scan_id": self.scan_id,
+            "new": self._lists["new"], "fixed": fixed[:DIFF_LIST_LIMIT], "unchanged": self._lists["unchanged"],
+            "new_count": self._counts["new"], "fixed_count": len(fixed), "unchanged_count": self._counts["unchanged"],
+            "reused_units": reused_units
+        }
@@ -0,0 +1,73 @@
+import threading
+import time
+
+class ScanCancelled(Exception):
+    """扫描已被取消或超出截止时间，工作单元抛出后不再视为失败"""
+
+class LeaseLost(Exception):
+    """执行扫描的 worker 已失去任务租约，任务可能已由其他 worker 重新领取，本次执行不得再写入任何结果"""
+
+class CancelToken:
+    """
+    单次扫描的取消信号，贯穿端口扫描、审计流水线与各扫描器：
+    1. cancel() 由用户取消 (API/worker 轮询取消标记) 触发；set_deadline() 到期后由定时器以 "deadline" 原因触发；
+       worker 续约失败时以 "lease_lost" 原因触发。
+    2. 长耗时的扫描器通过 cancelled 轮询，或以 on_cancel() 注册回调 (如关闭在途连接) 立即中断。
+    3. 只会触发一次，reason 记录首次触发的原因。
+    """
+    def __init__(self):
+        self.reason = None
+        self.deadline = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timer = None
+
+    def set_deadline(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self._timer = threading.Timer(seconds, self.cancel, args=("deadline",))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback failed: {str(e)}")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise ScanCancelled(self.reason)
+
+    def wait(self, timeout: float) -> bool:
+        """可被取消打断的等待，返回是否已取消"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """注册取消回调 (已取消时立即执行)，返回用于注销的函数"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
@@ -0,0 +1,34 @@
+import os
+
+DATA_DIR = os.environ.get("NETAUDIT_DATA_DIR", "/app/data")
+DIST_DIR = os.environ.get("NETAUDIT_DIST_DIR", "/app/dist")
+
+DB_PATH = os.path.join(DATA_DIR, "netaudit.db")
+TASK_DB_PATH = os.path.join(DATA_DIR, "tasks.db")
+
+# 已结束任务在任务库中的保留策略
+TASK_TTL_SECONDS = int(os.environ.get("NETAUDIT_TASK_TTL", "3600"))
+TASK_MAX_ENTRIES = int(os.environ.get("NETAUDIT_TASK_MAX_ENTRIES", "500"))
+TASK_MAX_BYTES = int(os.environ.get("NETAUDIT_TASK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 持久化扫描队列：API 进程入队，worker 进程以租约方式领取
+QUEUE_DB_PATH = os.path.join(DATA_DIR, "queue.db")
+JOB_LEASE_SECONDS = int(os.environ.get("NETAUDIT_JOB_LEASE", "60"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("NETAUDIT_JOB_MAX_ATTEMPTS", "3"))
+# API 进程内嵌的执行槽位数；拆分部署 (独立运行 worker.py) 时设为 0，API 进程只负责入队
+EMBEDDED_WORKERS = int(os.environ.get("NETAUDIT_EMBEDDED_WORKERS", "2"))
+# 同时执行的扫描任务上限 (所有 worker 合计，由队列领取时保证)；0 表示只受各 worker 的槽位数限制
+MAX_CONCURRENT_SCANS = int(os.environ.get("NETAUDIT_MAX_CONCURRENT_SCANS", "0"))
+
+# 建连速率预算 (每秒)，进程内所有扫描共享；0 表示不限速。拆分部署时为每个 worker 进程各自的预算
+CONNECT_RATE = float(os.environ.get("NETAUDIT_CONNECT_RATE", "0"))
+# 令牌桶容量 (允许的瞬时突发)，0 表示与 CONNECT_RATE 相同
+CONNECT_BURST = float(os.environ.get("NETAUDIT_CONNECT_BURST", "0"))
+
+# 周期扫描调度：API 进程按间隔检查到期的计划并入队；多个 API 进程共享同一库时不会重复触发
+SCHEDULER_ENABLED = os.environ.get("NETAUDIT_SCHEDULER", "1") == "1"
+SCHEDULER_POLL_INTERVAL = float(os.environ.get("NETAUDIT_SCHEDULER_POLL_INTERVAL", "5"))
+
+# 进程内探测结果缓存：并发/相邻扫描对同一目标的相同服务探测共享结果；TTL 为 0 时关闭缓存 (端口存活结果从不缓存)
+PROBE_CACHE_TTL = float(os.environ.get("NETAUDIT_PROBE_CACHE_TTL", "30"))
+PROBE_CACHE_MAX_ENTRIES = int(os.environ.get("NETAUDIT_PROBE_CACHE_MAX_ENTRIES", "4096"))
@@ -0,0 +1,424 @@
+import os
+import time
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+from pydantic import BaseModel
+
+from core.analyzer import SecurityAnalyzer, SUMMARY_KEYS
+from core.targets import expand_targets
+from core.pipeline import AuditPipeline
+from core.events import EventBroker
+from core.task_store import TaskStore
+from core.storage import ScanStorage
+from core.baseline import ScanBaseline, DIFF_LIST_LIMIT, unit_key, digest
+from core.findings import HostReport, PREVIEW_LIMIT
+from core.cancel import CancelToken, LeaseLost, ScanCancelled
+from core.metrics import REGISTRY, SCANS, Gauge, ScanTimer
+from core.rtt import RTT
+from core.lazy import LazyObject
+from core.config import DATA_DIR, DB_PATH, TASK_DB_PATH, TASK_TTL_SECONDS, TASK_MAX_ENTRIES, TASK_MAX_BYTES
+from scanners import registry as scanners
+from scanners.port_scan import sweep_hosts, DEFAULT_CONCURRENCY
+
+if TYPE_CHECKING:
+    from scanners.http_pool import HttpClientPool
+    from scanners.tls_scan import TlsInspector
+
+# 审计引擎：API 进程 (内嵌模式) 与独立 worker 进程共用的扫描执行逻辑与共享存储。
+# 单例与协议扫描器都在首次使用时才构造/导入，导入本模块不触发规则加载、文件系统操作或重量级依赖。
+
+def ensure_data_dir():
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+def _open_storage() -> ScanStorage:
+    ensure_data_dir()
+    return ScanStorage(DB_PATH)
+
+def _open_task_store() -> TaskStore:
+    ensure_data_dir()
+    return TaskStore(TASK_DB_PATH, ttl=TASK_TTL_SECONDS, max_entries=TASK_MAX_ENTRIES, max_bytes=TASK_MAX_BYTES)
+
+analyzer = LazyObject(SecurityAnalyzer)
+events = EventBroker()
+storage = LazyObject(_open_storage)
+task_store = LazyObject(_open_task_store)
+
+class ScanRequest(BaseModel):
+    target: str
+    domains: Optional[List[str]] = []
+    port_range: str
+    ports_config: Dict[str, str]
+    dictionaries: Dict[str, str]
+    mode: str = "快速扫描"
+    enable_brute: bool = False
+    concurrency: int = DEFAULT_CONCURRENCY
+    per_host_concurrency: Optional[int] = None
+    web_wordlist: Optional[str] = None
+    incremental: bool = False
+    # 扫描截止时间 (秒)，超时后停止探测并保存部分结果
+    deadline: Optional[int] = None
+    metadata: Optional[Dict[str, str]] = {} 
+
+def parse_ports(port_str: str) -> List[int]:
+    ports = set()
+    for part in port_str.replace('，', ',').split(','):
+        part = part.strip()
+        if not part: continue
+        try:
+            if '-' in part:
+                s, e = map(int, part.split('-'))
+                ports.update(range(max(s, 1), min(e, 65535) + 1))
+            else:
+                p = int(part)
+                if 0 < p <= 65535: ports.add(p)
+        except: continue
+    return sorted(list(ports))
+
+# 各协议审计阶段的独立线程池大小
+AUDIT_STAGE_WORKERS = {"fingerprint": 16, "ssh": 4, "web": 8, "tls": 8, "dns": 8}
+
+# 指纹识别出的服务 -> 审计路由；未列出的服务 (FTP、SMTP 等) 只标注端口状态
+SERVICE_ROUTES = {"ssh": "ssh", "http": "http", "tls": "https", "dns": "dns"}
+
+def ssh_fingerprint(banner: str, request: ScanRequest):
+    # 弱口令检测的结果取决于审计模式与字典，二者变化时同样视为指纹变化
+    if banner == "SSH Connection Refused":
+        return None
+    brute = request.mode == "深度审计" and request.enable_brute
+    return digest(banner, brute, request.dictionaries if brute else None)
+
+def audit_ssh(target_ip: str, port: int, request: ScanRequest, baseline: Optional[ScanBaseline] = None, cancel: Optional[CancelToken] = None, banner: Optional[str] = None):
+    ssh = scanners.load("ssh")
+    # 指纹识别阶段已读到的 Banner 直接沿用，不再单独建连
+    banner = banner or ssh.check_ssh_banner(target_ip, port)
+    key, fingerprint = unit_key(port, "ssh"), ssh_fingerprint(banner, request)
+    port_status = {"port": port, "protocol": "SSH", "status": "OPEN", "detail": f"Banner: {banner}"}
+    reused = baseline.reuse(key, fingerprint) if baseline else None
+    if reused is not None:
+        return reused, port_status, (key, fingerprint, True)
+
+    brute = {"weak_creds": [], "complete": True, "untested": 0}
+    if request.mode == "深度审计" and request.enable_brute:
+        user_list = request.dictionaries.get('usernames', 'admin').split('\n')
+        pass_list = request.dictionaries.get('passwords', '123456').split('\n')
+        brute = ssh.brute_force_ssh(target_ip, port, user_list, pass_list, cancel=cancel)
+
+    observations = [("SSH", port, banner, {"weak_creds": brute["weak_creds"]})]
+    if not brute["complete"]:
+        # 未完成的弱口令审计单独求值 (不带 Banner)，不影响 Banner 泄露等兜底规则的命中；
+        # 该单元也不记录指纹，下次增量审计会重新验证
+        observations.append(("SSH", port, "", {"brute_force": brute}))
+        fingerprint = None
+    findings = [f for result in analyzer.analyze_batch(observations) for f in result]
+    return findings, port_status, (key, fingerprint, False)
+
+def web_fingerprint(http_pool: "HttpClientPool", target_ip: str, port: int, domain: Optional[str], is_https: bool, wordlist: Optional[str]):
+    """Web 单元指纹：稳定响应头 + 证书指纹 + 探测字典，任一变化都需重新深度审计"""
+    headers = scanners.load("web").fingerprint_http(target_ip, port, vhost=domain, pool=http_pool, scheme="https" if is_https else "http")
+    if headers is None:
+        return None
+    cert = scanners.load("tls").certificate_fingerprint(target_ip, port, domain) if is_https else None
+    if is_https and cert is None:
+        return None
+    return digest(headers, cert, wordlist)
+
+def audit_web(pipeline: AuditPipeline, http_pool: "HttpClientPool", tls: "TlsInspector", target_ip: str, port: int, domain: Optional[str], is_https: bool, wordlist: Optional[str], baseline: Optional[ScanBaseline] = None):
+    # 该端口未承载此域名时不做深度审计，避免把默认站点的发现项记到该域名下
+    if domain and not scanners.load("web").verify_vhost(target_ip, port, domain, http_pool, tls, "https" if is_https else "http"):
+        return [], {"port": port, "protocol": "WEB", "status": "OPEN", "detail": f"虚拟主机 {domain} 未由此端口承载"}, None
+    key = unit_key(port, "web", domain)
+    fingerprint = web_fingerprint(http_pool, target_ip, port, domain, is_https, wordlist)
+    reused = baseline.reuse(key, fingerprint) if baseline else None
+    if reused is not None:
+        return reused, None, (key, fingerprint, True)
+
+    # TLS 检查在独立阶段并行执行，与 HTTP 深度探测互不阻塞
+    tls_future = pipeline.spawn("tls", scanners.load("tls").check_tls_vulnerability, target_ip, port, domain, tls) if is_https else None
+    res = scanners.load("web").scan_http(target_ip, port, vhost=domain, pool=http_pool, wordlist=wordlist, cancel=pipeline.cancel,
+                                         scheme="https" if is_https else "http")
+    try:
+        tls_res = tls_future.result() if tls_future else {}
+    except ScanCancelled:
+        # TLS 检查尚未开始即被取消，保留已完成的 HTTP 结果
+        tls_res = {}
+    
+    # 关键逻辑：将 scan_http 的深度结果传给 analyzer
+    findings = analyzer.analyze_service("HTTPS" if is_https else "HTTP", port, res.get("banner", "Unknown"), {
+        "tls_results": tls_res,
+        "web_results": res
+    })
+    if domain:
+        for f in findings: f["domain"] = domain
+    return findings, None, (key, fingerprint, False)
+
+def audit_dns(target_ip: str, port: int, domain: str):
+    dns_res = scanners.load("dns").check_zone_transfer(domain, target_ip, port)
+    findings = []
+    if dns_res.get("vulnerable"):
+        findings = analyzer.analyze_service("DNS", port, "DNS-AXFR", {"dns_results": dns_res})
+        for f in findings: f["domain"] = domain
+    return findings, None
+
+def port_hints(request: ScanRequest) -> dict:
+    """端口配置给出的预期协议 (端口 -> ssh/http/https/dns)，同一端口出现在多个列表时 SSH 优先、DNS 最后"""
+    hints = {}
+    for proto, default in (("dns", "53"), ("http", "80"), ("https", "443"), ("ssh", "22")):
+        for port in parse_ports(request.ports_config.get(proto, default)):
+            hints[port] = proto
+    return hints
+
+def plan_host_audit(pipeline: AuditPipeline, http_pool: "HttpClientPool", tls: "TlsInspector", target_ip: str, active_ports: List[int], request: ScanRequest, collect, baseline: Optional[ScanBaseline] = None):
+    """
+    先对每个开放端口做单连接服务指纹识别，再按识别结果把端口分派给唯一对应的审计阶段：
+    非标准端口上的服务同样得到审计，标准端口上的其他服务不会被误判。
+    无法识别 (服务端沉默或直接断开) 时回退到端口配置；传入 baseline 时指纹未变的单元复用上次结果。
+    没有对应审计器的端口在该主机的指纹识别全部结束后整批交给规则引擎求值。
+    """
+    domain_list = [d.strip() for d in (request.domains or []) if d.strip()]
+    hints = port_hints(request)
+    identify_service = scanners.load("fingerprint").identify_service
+    unrouted = []
+    pending = {"count": len(active_ports)}
+    lock = threading.Lock()
+
+    def emit(port):
+        return lambda result: collect(target_ip, port, *result)
+
+    def fingerprinted():
+        # 最后一个指纹单元结束 (含失败与取消) 时，整批求值已收集的无审计器端口
+        with lock:
+            pending["count"] -= 1
+            if pending["count"]: return
+            observations = list(unrouted)
+        if not observations: return
+        for (protocol, port, banner), findings in zip(observations, analyzer.analyze_batch(observations)):
+            collect(target_ip, port, findings, {"port": port, "protocol": protocol, "status": "OPEN", "detail": f"Banner: {banner}" if banner else "Active"})
+
+    def dispatch(port, hint, service):
+        name = service.get("service")
+        route = SERVICE_ROUTES.get(name) if name else hint
+        if route == "ssh":
+            pipeline.submit("ssh", f"{target_ip}:{port}/ssh", audit_ssh, target_ip, port, request, baseline, pipeline.cancel, service.get("banner"), on_result=emit(port))
+        elif route in ("http", "https"):
+            for domain in (domain_list if domain_list else [None]):
+                pipeline.submit("web", f"{target_ip}:{port}/web", audit_web, pipeline, http_pool, tls, target_ip, port, domain, route == "https", request.web_wordlist, baseline, on_result=emit(port))
+            collect(target_ip, port, [], {"port": port, "protocol": "WEB", "status": "OPEN", "detail": "Web Service Detected"})
+        elif route == "dns":
+            for domain in domain_list:
+                pipeline.submit("dns", f"{target_ip}:{port}/dns", audit_dns, target_ip, port, domain, on_result=emit(port))
+            collect(target_ip, port, [], {"port": port, "protocol": "DNS", "status": "OPEN", "detail": "DNS Service Active"})
+        else:
+            # 无对应审计器的服务留待整批交给规则引擎 (命中兜底规则)，端口状态标注识别出的服务与 Banner
+            with lock:
+                unrouted.append(((name or "TCP").upper(), port, service.get("banner", "")))
+
+    for port in active_ports:
+        hint = hints.get(port)
+        pipeline.submit("fingerprint", f"{target_ip}:{port}/fingerprint", identify_service, target_ip, port, hint,
+                        on_result=lambda service, port=port, hint=hint: dispatch(port, hint, service), on_done=fingerprinted)
+
+def build_report(host: HostReport, request: ScanRequest, truncated: Optional[str] = None, timings: dict = None) -> dict:
+    """
+    写入剩余的发现项与档案头，返回任务结果中的主机报告：
+    评分与风险计数来自增量统计，defects / port_statuses 只含预览，超出预览上限时标记 preview。
+    """
+    report = {
+        "target": host.target, "score": host.score,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "metadata": request.metadata,
+        "summary": dict(host.summary),
+        "fingerprints": host.fingerprints
+    }
+    # 取消后未完成的单元没有结果，差异对比会把其缺陷误判为已修复，因此截断的报告不做对比
+    if host.diff and not truncated:
+        report["diff"] = host.diff.result(host.reused)
+    if truncated:
+        report["truncated"] = True
+        report["truncated_reason"] = truncated
+    if timings:
+        # 附带该主机扫描结束时的 RTT 估计，便于判断超时是否合理
+        report["timings"] = {**timings, "rtt": RTT.snapshot(host.target)}
+    host.flush()
+    storage.finish_scan(host.scan_id, report, host.defect_count, host.max_risk)
+    defects, port_statuses = host.preview()
+    result = {**report, "id": host.scan_id, "defects": defects, "port_statuses": port_statuses,
+              "defect_count": host.defect_count, "port_count": host.port_count}
+    if host.truncated_preview:
+        result["preview"] = True
+    return result
+
+def build_rollup(request: ScanRequest, reports: list) -> dict:
+    """多主机任务的汇总报告：各主机的预览带上 host 字段合并展示 (总数不超过预览上限)，评分取各主机最低分"""
+    defects, port_statuses = [], []
+    summary = {key: 0 for key in SUMMARY_KEYS.values()}
+    diff = None
+    for r in reports:
+        for key in summary:
+            summary[key] += r["summary"].get(key, 0)
+        defects.extend({**d, "host": r["target"]} for d in r["defects"][:PREVIEW_LIMIT - len(defects)])
+        port_statuses.extend({**ps, "host": r["target"]} for ps in r["port_statuses"][:PREVIEW_LIMIT - len(port_statuses)])
+        if "diff" in r:
+            diff = diff or {"new": [], "fixed": [], "unchanged": [], "new_count": 0, "fixed_count": 0, "unchanged_count": 0, "reused_units": 0}
+            for kind in ("new", "fixed", "unchanged"):
+                diff[kind].extend({**f, "host": r["target"]} for f in r["diff"][kind][:DIFF_LIST_LIMIT - len(diff[kind])])
+                diff[f"{kind}_count"] += r["diff"][f"{kind}_count"]
+            diff["reused_units"] += r["diff"]["reused_units"]
+    defect_count = sum(r["defect_count"] for r in reports)
+    port_count = sum(r["port_count"] for r in reports)
+    rollup = {
+        "target": request.target,
+        "score": min((r["score"] for r in reports), default=100),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "defects": defects, "port_statuses": port_statuses,
+        "metadata": request.metadata,
+        "summary": summary,
+        "defect_count": defect_count, "port_count": port_count,
+        "hosts": [{
+            "id": r.get("id"), "target": r["target"], "score": r["score"],
+            "open_ports": r["port_count"], "summary": r["summary"]
+        } for r in reports]
+    }
+    if defect_count > len(defects) or port_count > len(port_statuses):
+        rollup["preview"] = True
+    if diff:
+        rollup["diff"] = diff
+    return rollup
+
+# 本进程内正在执行的扫描数
+_running_scans = {"count": 0}
+_running_lock = threading.Lock()
+REGISTRY.register(Gauge("netaudit_scans_running", "Scans currently executing in this process",
+                        collect=lambda: {(): _running_scans["count"]}))
+
+# 截断原因对应的进度日志
+TRUNCATED_LOGS = {"cancelled": "审计已被用户取消，已保存部分结果", "deadline": "审计超出截止时间，已保存部分结果"}
+
+def run_deep_scan(task_id: str, request: ScanRequest, cancel: Optional[CancelToken] = None, lease=None):
+    """
+    执行一次扫描任务。cancel 由调用方 (worker) 持有以便外部取消；
+    request.deadline 设置后到期自动取消。取消后已完成的部分结果照常入库，并标记 truncated。
+    lease 为返回任务租约是否仍有效的函数 (由 worker 提供)：每次写入档案库与任务库前检查，
+    租约失效时任务可能已被其他 worker 重新领取，本次执行中止且不再写入任何结果。
+    """
+    with _running_lock:
+        _running_scans["count"] += 1
+    timer = ScanTimer()
+    cancel = cancel or CancelToken()
+    if request.deadline:
+        cancel.set_deadline(request.deadline)
+
+    def hold_lease():
+        if lease is not None and not lease():
+            cancel.cancel("lease_lost")
+            raise LeaseLost(f"lease on task {task_id} is no longer held")
+
+    def append_results(scan_id, findings, port_statuses):
+        hold_lease()
+        storage.append_results(scan_id, findings, port_statuses)
+
+    try:
+        def update_progress(pct, log):
+            if cancel.reason == "lease_lost": return
+            task_store.set_progress(task_id, pct, log)
+            events.publish(task_id, {"type": "progress", "percent": pct, "log": log})
+
+        with timer.phase("expand"):
+            hosts = expand_targets(request.target)
+            ports_to_scan = parse_ports(request.port_range)
+        
+        # 增量模式：载入各主机最近一次的审计档案作为基线；端口范围照常完整探测，
+        # 新开放的端口正常审计，指纹未变的审计单元复用上次的发现项
+        baselines = {}
+        if request.incremental:
+            with timer.phase("baseline"):
+                for host, scan_id in storage.latest_scan_ids(hosts).items():
+                    previous = storage.get_report(scan_id)
+                    # 被截断的档案缺少未完成的单元，不能作为基线
+                    if previous and not previous.get("truncated"): baselines[host] = ScanBaseline(previous)
+
+        update_progress(10, f"正在执行存活节点探测 ({len(hosts)} 台主机)...")
+
+        with timer.phase("sweep"):
+            open_map = sweep_hosts(hosts, ports_to_scan, concurrency=request.concurrency,
+                                   per_host_limit=request.per_host_concurrency, cancel=cancel)
+
+        # 网段审计中无开放端口的地址不单独生成报告 (有基线的主机除外，其发现项需记为已修复)
+        audit_hosts = [h for h in hosts if open_map[h] or len(hosts) == 1 or h in baselines]
+        # 各主机档案先建立占位行，发现项在审计过程中分批写入，内存中只保留计数与预览；
+        # 重新领取的任务先清理上次执行遗留的占位档案
+        hold_lease()
+        storage.discard_unfinished(task_id)
+        scan_ids = storage.begin_scans(audit_hosts, task_id)
+        host_reports = {h: HostReport(h, scan_ids[h], append_results,
+                                      baselines[h].tracker() if h in baselines else None) for h in audit_hosts}
+
+        def collect(host, port, findings, port_status, fingerprint=None):
+            # 工作单元完成即写入对应主机的报告，不等待整台主机审计结束
+            for f in findings:
+                f["port"] = port
+            host_reports[host].add(findings, port_status, fingerprint)
+            for f in findings:
+                events.publish(task_id, {"type": "finding", "host": host, "finding": f})
+
+        def on_unit_done(completed, total, label):
+            update_progress(20 + int((completed / total) * 60), f"正在审计 {label} ({completed}/{total})...")
+
+        update_progress(20, "正在分发协议审计任务...")
+        # 连接池与 TLS 证书缓存覆盖整个扫描，流水线结束后统一释放；
+        # 二者在第一个 Web 审计单元使用时才创建，没有 Web 端口的扫描不会导入 requests / cryptography
+        tls = LazyObject(lambda: scanners.load("tls").TlsInspector())
+        http_pool = LazyObject(lambda: scanners.load("http_pool").HttpClientPool())
+        try:
+            with timer.phase("audit"), AuditPipeline(AUDIT_STAGE_WORKERS, on_progress=on_unit_done, cancel=cancel) as pipeline:
+                for host in audit_hosts:
+                    plan_host_audit(pipeline, http_pool, tls, host, open_map[host], request, collect, baselines.get(host))
+                pipeline.join()
+        finally:
+            if http_pool.resolved: http_pool.close()
+
+        truncated = cancel.reason if cancel.cancelled else None
+        # 入库前的耗时分解随档案保存；入库耗时只体现在任务结果与 /metrics 中
+        timings = timer.summary(hosts=len(hosts), ports=len(ports_to_scan), stages=pipeline.stage_timings())
+
+        update_progress(95, "正在执行风险建模与评分...")
+        with timer.phase("persist"):
+            reports = []
+            for h in audit_hosts:
+                hold_lease()
+                reports.append(build_report(host_reports[h], request, truncated, timings))
+
+        result = reports[0] if len(hosts) == 1 else build_rollup(request, reports)
+        # 供前端按任务流式导出全部主机档案 (/api/scan/export/{task_id})
+        result["task_id"] = task_id
+        result["timings"] = timer.summary(hosts=len(hosts), ports=len(ports_to_scan), stages=pipeline.stage_timings())
+        hold_lease()
+        if truncated:
+            result["truncated"] = True
+            result["truncated_reason"] = truncated
+            task_store.complete(task_id, result, log=TRUNCATED_LOGS.get(truncated, "审计已中止"))
+        else:
+            task_store.complete(task_id, result)
+        events.publish(task_id, {"type": "completed", "result": result})
+        SCANS.inc(status=truncated or "completed")
+        
+    except LeaseLost as e:
+        # 占位档案与任务状态归新的执行方所有，这里不做清理
+        print(f"Task {task_id} aborted: {str(e)}")
+        SCANS.inc(status="lease_lost")
+    except Exception as e:
+        print(f"Task {task_id} failed: {str(e)}")
+        if cancel.reason == "lease_lost":
+            # 租约失效后的异常同样不写入失败状态，任务由新的执行方负责
+            SCANS.inc(status="lease_lost")
+            return
+        try:
+            storage.discard_unfinished(task_id)
+        except Exception as cleanup_error:
+            print(f"Task {task_id} cleanup failed: {str(cleanup_error)}")
+        SCANS.inc(status="failed")
+        task_store.fail(task_id, str(e))
+        events.publish(task_id, {"type": "failed", "error": str(e)})
+    finally:
+        cancel.close()
+        with _running_lock:
+            _running_scans["count"] -= 1
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from collections import deque
+
+TERMINAL_EVENTS = ("completed", "failed")
+
+class EventBroker:
+    """
+    扫描事件的进程内发布/订阅：
+    1. 扫描线程调用 publish() 推送进度、发现项与最终结果，订阅方 (SSE 连接) 通过 asyncio 队列接收。
+    2. 每个任务保留最近 history 条事件，订阅时先回放，避免建立连接前产生的发现项丢失；
+       任务结束后历史即被释放，之后的订阅方从任务状态中读取最终结果。
+    """
+    def __init__(self, history: int = 500):
+        self.history = history
+        self._subscribers = {}
+        self._history = {}
+        self._lock = threading.Lock()
+
+    def publish(self, task_id: str, event: dict):
+        with self._lock:
+            if event.get("type") in TERMINAL_EVENTS:
+                self._history.pop(task_id, None)
+            else:
+                self._history.setdefault(task_id, deque(maxlen=self.history)).append(event)
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # 订阅方的事件循环已关闭
+                pass
+
+    def subscribe(self, task_id: str):
+        """在事件循环内调用，返回 (队列, 回放事件列表)"""
+        queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(entry)
+            replay = list(self._history.get(task_id, ()))
+        return queue, replay
+
+    def unsubscribe(self, task_id: str, queue):
+        with self._lock:
+            entries = [e for e in self._subscribers.get(task_id, []) if e[1] is not queue]
+            if entries:
+                self._subscribers[task_id] = entries
+            else:
+                self._subscribers.pop(task_id, None)
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+
+# 累积到该大小后输出一个分块，兼顾分块数量与内存占用
+CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = ["host", "port", "protocol", "id", "check_item", "risk_level", "description",
+               "detail_value", "suggestion", "mlps_clause", "domain"]
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv")
+}
+
+def _chunked(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+def ndjson_chunks(rows):
+    """
+    每行一个 JSON 对象，type 为 report / finding / port：
+    报告头先于其发现项与端口状态输出，前端可按行增量渲染。
+    """
+    return _chunked(json.dumps({"type": kind, **item}, ensure_ascii=False) + "\n" for kind, item in rows)
+
+def csv_chunks(rows):
+    """只导出发现项；以 UTF-8 BOM 开头，便于表格软件正确识别中文"""
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(CSV_COLUMNS)
+        yield "\ufeff" + out.getvalue()
+        for kind, item in rows:
+            if kind != "finding":
+                continue
+            out.seek(0)
+            out.truncate()
+            writer.writerow([item.get(c, "") for c in CSV_COLUMNS])
+            yield out.getvalue()
+    return _chunked(lines())
+
+def export_chunks(fmt: str, rows):
+    return ndjson_chunks(rows) if fmt == "ndjson" else csv_chunks(rows)
@@ -0,0 +1,112 @@
+import sys
+import threading
+
+from core.analyzer import SUMMARY_KEYS, score_from_summary
+from core.storage import RISK_RANK
+
+# 每累计 FLUSH_BATCH 条发现项 / 端口状态批量写入一次档案库
+FLUSH_BATCH = 500
+# 任务结果与完成事件中随附的发现项 / 端口状态条数上限，完整内容经导出接口从档案库流式读取
+PREVIEW_LIMIT = 1000
+
+FINDING_FIELDS = ("id", "port", "protocol", "check_item", "risk_level", "description",
+                  "detail_value", "suggestion", "mlps_clause", "domain", "metadata")
+# 在大量发现项间重复出现的字段 (规则文本、协议、域名)，驻留后共享同一字符串对象
+INTERNED_FIELDS = ("protocol", "check_item", "risk_level", "description", "suggestion", "mlps_clause", "domain")
+
+class Finding:
+    """发现项的紧凑表示：固定槽位代替 dict，重复文本驻留 (含从基线复用、经数据库读出的发现项)"""
+    __slots__ = FINDING_FIELDS + ("extra",)
+
+    def __init__(self, **fields):
+        for name in FINDING_FIELDS:
+            value = fields.pop(name, None)
+            if name in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, name, value)
+        self.extra = fields or None
+
+    @classmethod
+    def from_dict(cls, finding: dict) -> "Finding":
+        return cls(**finding)
+
+    def to_dict(self) -> dict:
+        finding = {name: getattr(self, name) for name in FINDING_FIELDS}
+        # 与规则引擎的输出保持一致：未设置的 domain / metadata 不出现在结果中
+        if finding["domain"] is None: del finding["domain"]
+        if finding["metadata"] is None: del finding["metadata"]
+        if self.extra: finding.update(self.extra)
+        return finding
+
+class HostReport:
+    """
+    单台主机报告的增量构建，扫描期间内存占用与发现项总数无关：
+    1. 发现项转为 Finding 进入待写缓冲，满 FLUSH_BATCH 条即交给 writer 批量写入档案库。
+    2. 风险计数、最高风险等级与评分随每条发现项更新，扫描结束时无需再遍历。
+    3. 只保留前 PREVIEW_LIMIT 条发现项与端口状态作为任务结果的预览。
+    4. 传入 diff (BaselineDiff) 时，发现项产生即与基线对比。
+    """
+    def __init__(self, target: str, scan_id: int, writer, diff=None, batch: int = FLUSH_BATCH, preview: int = PREVIEW_LIMIT):
+        self.target = target
+        self.scan_id = scan_id
+        self.summary = {key: 0 for key in SUMMARY_KEYS.values()}
+        self.defect_count = 0
+        self.port_count = 0
+        self.max_risk = 0
+        self.fingerprints = {}
+        self.reused = 0
+        self.diff = diff
+        self._writer = writer
+        self._batch = batch
+        self._preview = preview
+        self._findings, self._ports = [], []
+        self._preview_findings, self._preview_ports = [], []
+        self._lock = threading.Lock()
+        # 同一主机的批次按顺序写入
+        self._write_lock = threading.Lock()
+
+    @property
+    def score(self) -> int:
+        return score_from_summary(self.summary)
+
+    @property
+    def truncated_preview(self) -> bool:
+        return self.defect_count > len(self._preview_findings) or self.port_count > len(self._preview_ports)
+
+    def add(self, findings: list, port_status: dict = None, fingerprint=None):
+        with self._lock:
+            for f in findings:
+                record = Finding.from_dict(f)
+                key = SUMMARY_KEYS.get(record.risk_level)
+                if key: self.summary[key] += 1
+                self.max_risk = max(self.max_risk, RISK_RANK.get(record.risk_level, 0))
+                self.defect_count += 1
+                self._findings.append(record)
+                if len(self._preview_findings) < self._preview: self._preview_findings.append(record)
+                if self.diff: self.diff.add(f)
+            if port_status:
+                self.port_count += 1
+                self._ports.append(port_status)
+                if len(self._preview_ports) < self._preview: self._preview_ports.append(port_status)
+            if fingerprint:
+                key, value, reused = fingerprint
+                if value: self.fingerprints[key] = value
+                if reused: self.reused += 1
+            due = len(self._findings) >= self._batch or len(self._ports) >= self._batch
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                findings, self._findings = self._findings, []
+                ports, self._ports = self._ports, []
+            if findings or ports:
+                self._writer(self.scan_id, [f.to_dict() for f in findings], ports)
+
+    def preview(self) -> tuple:
+        """返回按端口排序的 (发现项预览, 端口状态预览)"""
+        with self._lock:
+            findings = sorted((f.to_dict() for f in self._preview_findings), key=lambda f: f.get("port") or 0)
+            ports = sorted(self._preview_ports, key=lambda p: p["port"])
+        return findings, ports
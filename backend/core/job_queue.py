@@ -0,0 +1,159 @@
+import json
+import sqlite3
+import threading
+import time
+
+class JobQueue:
+    """
+    基于 SQLite (WAL) 的持久化扫描任务队列：
+    1. API 进程 enqueue() 写入任务，worker 进程 claim() 以租约方式领取；领取在 BEGIN IMMEDIATE 事务内完成，
+       多个进程/节点 (共享同一库文件) 不会重复领取同一任务。
+    2. 执行中的 worker 定期 heartbeat() 续约；worker 退出或失联导致租约过期后，任务重新回到可领取状态。
+       租约以 (worker, 领取次数) 标识，过期后即失效：heartbeat() / holds() / complete() / fail() 均不再生效，
+       即使同一 worker 重新领取了该任务，旧的执行也无法续约或写回状态。
+    3. 同一任务最多被领取 max_attempts 次，超出后由 reap() 标记为失败。
+    4. cancel() 直接取消排队中的任务；执行中的任务只记录取消标记，由执行它的 worker 轮询 cancel_requested() 后中止。
+    5. max_running 大于 0 时，租约有效的执行中任务达到上限后 claim() 不再领取，超出的任务留在队列中等待。
+    """
+    def __init__(self, path: str, max_attempts: int = 3, max_running: int = 0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.max_running = max_running
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT, lease_until REAL, error TEXT, created_at REAL, updated_at REAL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0)""")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "cancel_requested" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+
+    def enqueue(self, job_id: str, payload: dict):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, json.dumps(payload, ensure_ascii=False), now, now))
+
+    def claim(self, worker_id: str, lease: float):
+        """领取最早的待执行任务 (含租约已过期的任务)，返回 (job_id, payload, attempts) 或 None"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 并发上限在同一写事务内检查，多个 worker 同时领取也不会超出
+            if self.max_running and conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND lease_until >= ?", (now,)).fetchone()[0] >= self.max_running:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE attempts < ? AND "
+                "(status = 'queued' OR (status = 'running' AND lease_until < ?)) ORDER BY created_at LIMIT 1",
+                (self.max_attempts, now)).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease, now, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def heartbeat(self, job_id: str, worker_id: str, attempt: int, lease: float) -> bool:
+        """续约；返回 False 表示租约已过期或已被重新领取"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running' AND lease_until >= ?",
+            (now + lease, now, job_id, worker_id, attempt, now))
+        return cursor.rowcount > 0
+
+    def holds(self, job_id: str, worker_id: str, attempt: int) -> bool:
+        """第 attempt 次领取的租约是否仍然有效；执行方在写入结果前检查"""
+        return self._conn().execute(
+            "SELECT 1 FROM jobs WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running' AND lease_until >= ?",
+            (job_id, worker_id, attempt, time.time())).fetchone() is not None
+
+    def _finish(self, job_id: str, worker_id: str, attempt: int, status: str, error: str = None) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND attempts = ? AND status = 'running' AND lease_until >= ?",
+            (status, error, now, job_id, worker_id, attempt, now))
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: str, worker_id: str, attempt: int) -> bool:
+        return self._finish(job_id, worker_id, attempt, "done")
+
+    def fail(self, job_id: str, worker_id: str, attempt: int, error: str) -> bool:
+        return self._finish(job_id, worker_id, attempt, "failed", error)
+
+    def cancel(self, job_id: str):
+        """
+        请求取消任务，返回任务取消前的状态 (不存在时为 None)：
+        queued 的任务直接标记为 cancelled；running 的任务记录取消标记，由 worker 中止后照常 complete()。
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row and row[0] == "queued":
+                conn.execute("UPDATE jobs SET status = 'cancelled', cancel_requested = 1, updated_at = ? WHERE id = ?", (now, job_id))
+            elif row and row[0] == "running":
+                conn.execute("UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ?", (now, job_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0] if row else None
+
+    def cancel_requested(self, job_ids) -> set:
+        """返回 job_ids 中已被请求取消的任务"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        return {r[0] for r in self._conn().execute(
+            f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({','.join('?' * len(job_ids))})", job_ids)}
+
+    def reap(self) -> list:
+        """把租约过期且已达最大领取次数的任务标记为失败，返回这些任务的 id"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts))]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = 'worker lost', lease_until = NULL, updated_at = ? WHERE id = ?",
+                [(now, i) for i in ids])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    def purge(self, older_than: float):
+        """删除结束超过 older_than 秒的任务记录"""
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < ?", (time.time() - older_than,))
+
+    def counts(self) -> dict:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
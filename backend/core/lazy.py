@@ -0,0 +1,35 @@
+import threading
+
+class LazyObject:
+    """
+    首次访问属性时才调用 factory 构造的单例代理：
+    模块级单例 (规则引擎、存储库等) 可以照常以名称导入，而构造成本与文件系统操作推迟到第一次使用。
+    """
+    __slots__ = ("_factory", "_target", "_lock")
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, "_target", self._factory())
+                target = self._target
+        return target
+
+    @property
+    def resolved(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __contains__(self, item):
+        return item in self._resolve()
@@ -0,0 +1,183 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# 探测延迟直方图的分桶上限 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 扫描阶段耗时直方图的分桶上限 (秒)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        # 列表推导比生成器表达式快，探测热路径上每次调用都会执行
+        return tuple([labels.get(n, "") for n in self.labels])
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        """{标签值元组: 计数}"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in items]
+
+class Gauge(_Metric):
+    """取值在抓取时由回调函数给出，回调返回 {标签值元组: 数值}"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def render(self) -> list:
+        values = self.collect() if self.collect else {}
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in sorted(values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+PROBES = REGISTRY.register(Counter(
+    "netaudit_probes_total", "Scanner probes by outcome (ok, open, closed, timeout, error, ...)", ("scanner", "outcome")))
+PROBE_SECONDS = REGISTRY.register(Histogram(
+    "netaudit_probe_seconds", "Scanner probe latency in seconds", ("scanner",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "netaudit_scan_stage_seconds", "Wall time of each run_deep_scan stage in seconds", ("stage",), STAGE_BUCKETS))
+UNIT_SECONDS = REGISTRY.register(Histogram(
+    "netaudit_audit_unit_seconds", "Audit pipeline work unit duration in seconds", ("stage",)))
+SCANS = REGISTRY.register(Counter(
+    "netaudit_scans_total", "Finished scans by status", ("status",)))
+
+def _classify(exc: BaseException) -> str:
+    if isinstance(exc, (socket.timeout, TimeoutError)) or "timed out" in str(exc).lower():
+        return "timeout"
+    return "error"
+
+class _Probe:
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = "ok"
+
+@contextmanager
+def probe(scanner: str):
+    """
+    记录一次探测的耗时与结果。块内可设置 p.outcome 覆盖默认的 "ok"；
+    块内抛出的异常按超时/错误分类计数后继续向上抛出。
+    """
+    p = _Probe()
+    start = time.perf_counter()
+    try:
+        yield p
+    except Exception as e:
+        if p.outcome == "ok": p.outcome = _classify(e)
+        raise
+    finally:
+        PROBE_SECONDS.observe(time.perf_counter() - start, scanner=scanner)
+        PROBES.inc(scanner=scanner, outcome=p.outcome)
+
+def record_probe(scanner: str, outcome: str, seconds: float):
+    """供无法使用上下文管理器的场景 (如 asyncio 端口探测) 直接记录"""
+    PROBE_SECONDS.observe(seconds, scanner=scanner)
+    PROBES.inc(scanner=scanner, outcome=outcome)
+
+class ScanTimer:
+    """单次扫描的分阶段计时，结果附加到报告的 timings 字段"""
+    def __init__(self):
+        self.phases = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = round(self.phases.get(name, 0.0) + elapsed, 4)
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+    def summary(self, **extra) -> dict:
+        return {"total": round(time.perf_counter() - self._start, 4), "phases": dict(self.phases), **extra}
@@ -0,0 +1,129 @@
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from core.metrics import REGISTRY, Gauge, UNIT_SECONDS
+from core.cancel import ScanCancelled
+
+# 运行中的流水线，供 /metrics 抓取时汇总各阶段的排队与执行数量
+_LIVE = weakref.WeakSet()
+
+def _collect(attr: str):
+    def collect():
+        totals = {}
+        for pipeline in list(_LIVE):
+            for stage, n in pipeline.gauges(attr).items():
+                totals[(stage,)] = totals.get((stage,), 0) + n
+        return totals
+    return collect
+
+REGISTRY.register(Gauge("netaudit_pipeline_queue_depth", "Audit units waiting for a worker thread", ("stage",), _collect("queued")))
+REGISTRY.register(Gauge("netaudit_pipeline_running", "Audit units currently executing", ("stage",), _collect("running")))
+
+class AuditPipeline:
+    """
+    按协议分阶段的并发审计流水线：
+    1. 每个阶段 (ssh / web / tls / dns ...) 拥有独立的有界线程池，慢速审计器不会阻塞其他协议。
+    2. 每个提交的任务是一个工作单元，完成后立即回调 on_result，进度按已完成单元数计算；
+       on_done 在单元结束 (含失败与取消) 后、计入完成数之前回调，join 返回时已全部执行。
+    3. 各阶段的排队数、执行数与累计耗时实时统计，分别用于 /metrics 与报告的 timings。
+    4. 传入 cancel (CancelToken) 时，取消后尚未开始的单元直接跳过；执行中的单元由扫描器自行响应取消。
+    """
+    def __init__(self, stage_workers: dict, on_progress=None, cancel=None):
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"audit-{name}")
+            for name, n in stage_workers.items()
+        }
+        self.on_progress = on_progress
+        self.cancel = cancel
+        self.total = 0
+        self.completed = 0
+        self._lock = threading.Condition()
+        self._queued = {name: 0 for name in stage_workers}
+        self._running = {name: 0 for name in stage_workers}
+        self._stats = {name: {"units": 0, "busy": 0.0, "max": 0.0} for name in stage_workers}
+        _LIVE.add(self)
+
+    def gauges(self, attr: str) -> dict:
+        with self._lock:
+            return dict(self._queued if attr == "queued" else self._running)
+
+    def _tracked(self, stage: str, fn, args):
+        with self._lock:
+            self._queued[stage] += 1
+
+        def run():
+            if self.cancel is not None and self.cancel.cancelled:
+                with self._lock:
+                    self._queued[stage] -= 1
+                raise ScanCancelled(self.cancel.reason)
+            with self._lock:
+                self._queued[stage] -= 1
+                self._running[stage] += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                UNIT_SECONDS.observe(elapsed, stage=stage)
+                with self._lock:
+                    self._running[stage] -= 1
+                    stats = self._stats[stage]
+                    stats["units"] += 1
+                    stats["busy"] += elapsed
+                    stats["max"] = max(stats["max"], elapsed)
+        return run
+
+    def stage_timings(self) -> dict:
+        """各阶段已完成单元数、累计执行耗时与单个单元最长耗时 (秒)"""
+        with self._lock:
+            return {name: {"units": s["units"], "busy_s": round(s["busy"], 4), "max_s": round(s["max"], 4)}
+                    for name, s in self._stats.items() if s["units"]}
+
+    def spawn(self, stage: str, fn, *args):
+        """供工作单元内部提交子任务：计入阶段统计，但不计入进度"""
+        return self.pools[stage].submit(self._tracked(stage, fn, args))
+
+    def submit(self, stage: str, label: str, fn, *args, on_result=None, on_done=None):
+        with self._lock:
+            self.total += 1
+        future = self.pools[stage].submit(self._tracked(stage, fn, args))
+
+        def done(f):
+            try:
+                result = f.result()
+                if on_result: on_result(result)
+            except ScanCancelled:
+                pass
+            except Exception as e:
+                print(f"Audit unit {label} failed: {str(e)}")
+            if on_done:
+                try:
+                    on_done()
+                except Exception as e:
+                    print(f"Audit unit {label} completion hook failed: {str(e)}")
+            with self._lock:
+                self.completed += 1
+                completed, total = self.completed, self.total
+                self._lock.notify_all()
+            if self.on_progress: self.on_progress(completed, total, label)
+
+        future.add_done_callback(done)
+        return future
+
+    def join(self):
+        # 以回调计数为准：Future 完成后回调才写入结果，不能只等 Future 本身
+        with self._lock:
+            self._lock.wait_for(lambda: self.completed >= self.total)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _LIVE.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
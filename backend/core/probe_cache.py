@@ -0,0 +1,129 @@
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from core.config import PROBE_CACHE_TTL, PROBE_CACHE_MAX_ENTRIES
+from core.metrics import REGISTRY, Counter, Gauge
+
+PROBE_CACHE = REGISTRY.register(Counter(
+    "netaudit_probe_cache_total", "Probe cache lookups by result (hit, miss, shared)", ("cache", "kind", "result")))
+_CACHES = []
+REGISTRY.register(Gauge("netaudit_probe_cache_entries", "Entries currently held by the probe cache", ("cache",),
+                        collect=lambda: {(c.name,): c.stats()["entries"] for c in _CACHES}))
+
+class ProbeAbandoned(Exception):
+    """在途探测的发起方被取消 (如所在事件循环退出)，等待者需要自行重新探测"""
+
+class ProbeCache:
+    """
+    进程内共享的探测结果缓存，键为 (探测类型, 主机, 端口, 虚拟主机, 变体)；
+    variant 区分同一端口上结果不能互换的探测方式 (如 HTTP 与 HTTPS)：
+    1. 结果保留 ttl 秒，条目数超过 max_entries 时按 LRU 淘汰；ttl 为 0 时不缓存，但仍合并并发探测。
+    2. singleflight：相同探测同时只有一个在途，其余调用方等待同一结果 (shared)，不重复连接目标。
+    3. 只缓存正常返回的结果；探测抛出的异常会传递给同批等待者，但不写入缓存。
+    4. 返回值为缓存对象的深拷贝，调用方可以放心修改；immutable=True 的缓存 (如端口存活布尔值) 省去拷贝。
+    """
+    def __init__(self, name: str, ttl: float = PROBE_CACHE_TTL, max_entries: int = PROBE_CACHE_MAX_ENTRIES,
+                 immutable: bool = False):
+        self.name = name
+        self._copy = (lambda value: value) if immutable else copy.deepcopy
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        _CACHES.append(self)
+
+    def _begin(self, key: tuple):
+        """
+        返回 ("hit", 值) / ("leader", None) / ("shared", Future)。
+        在途记录初始为 None，出现第一个等待者时才创建 Future，无并发重复时不产生额外开销。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return "hit", entry[1]
+                del self._entries[key]
+            if key in self._inflight:
+                flight = self._inflight[key]
+                if flight is None:
+                    flight = self._inflight[key] = Future()
+                return "shared", flight
+            self._inflight[key] = None
+            return "leader", None
+
+    def _finish(self, key: tuple, value=None, error: BaseException = None):
+        with self._lock:
+            flight = self._inflight.pop(key, None)
+            if error is None and self.ttl > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if flight is None:
+            return
+        if error is None:
+            flight.set_result(value)
+        else:
+            flight.set_exception(error if isinstance(error, Exception) else ProbeAbandoned())
+
+    def _record(self, kind: str, result: str):
+        PROBE_CACHE.inc(cache=self.name, kind=kind, result=result)
+
+    def get(self, kind: str, host: str, port: int, vhost: str, fn, variant: str = None):
+        key = (kind, host, port, vhost, variant)
+        state, value = self._begin(key)
+        self._record(kind, "miss" if state == "leader" else state)
+        if state == "hit":
+            return self._copy(value)
+        if state == "shared":
+            try:
+                return self._copy(value.result())
+            except ProbeAbandoned:
+                return self.get(kind, host, port, vhost, fn, variant)
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, error=e)
+            raise
+        self._finish(key, result)
+        return self._copy(result)
+
+    async def aget(self, kind: str, host: str, port: int, vhost: str, coro_fn, variant: str = None):
+        """asyncio 版本：等待其他线程 (其他扫描的事件循环) 的在途探测时不阻塞本事件循环"""
+        key = (kind, host, port, vhost, variant)
+        state, value = self._begin(key)
+        self._record(kind, "miss" if state == "leader" else state)
+        if state == "hit":
+            return self._copy(value)
+        if state == "shared":
+            try:
+                return self._copy(await asyncio.wrap_future(value))
+            except ProbeAbandoned:
+                return await self.aget(kind, host, port, vhost, coro_fn, variant)
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, error=e)
+            raise
+        self._finish(key, result)
+        return self._copy(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 服务探测 (Banner、HTTP 根请求、TLS 握手) 的结果在 TTL 内跨扫描共享
+PROBES = ProbeCache("probe")
+# 端口存活只合并并发扫描的在途探测，不保留结果：每次扫描 (包括增量复扫) 看到的都是当次的开放/关闭状态
+PORTS = ProbeCache("port", ttl=0, immutable=True)
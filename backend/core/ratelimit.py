@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+
+from core.config import CONNECT_RATE, CONNECT_BURST
+from core.metrics import REGISTRY, Counter
+
+THROTTLED = REGISTRY.register(Counter(
+    "netaudit_connect_throttle_seconds_total", "Time spent waiting for the global connection budget", ("caller",)))
+
+class TokenBucket:
+    """
+    进程级令牌桶：rate 为每秒补充的令牌数，burst 为桶容量；rate 为 0 时不限速。
+    采用预约方式扣减：令牌不足时余额记为负数并返回需等待的时长，等待在锁外进行，
+    并发调用方按到达顺序依次获得令牌，不会在令牌补充瞬间争抢。
+    """
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """扣减令牌并返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens: float = 1, caller: str = "sync"):
+        if not self.rate:
+            return
+        wait = self._reserve(tokens)
+        if wait > 0:
+            THROTTLED.inc(wait, caller=caller)
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1, caller: str = "async"):
+        """asyncio 版本：等待期间不阻塞事件循环"""
+        if not self.rate:
+            return
+        wait = self._reserve(tokens)
+        if wait > 0:
+            THROTTLED.inc(wait, caller=caller)
+            await asyncio.sleep(wait)
+
+# 全部扫描共享的建连预算 (端口探测、Banner、TLS 握手、SSH 与 DNS 连接、HTTP 连接池新建的连接)
+CONNECTIONS = TokenBucket(CONNECT_RATE, CONNECT_BURST)
@@ -0,0 +1,147 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from core.ratelimit import CONNECTIONS
+
+# Jacobson/Karels 平滑系数 (RFC 6298)
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+RTT_K = 4
+# 时钟粒度：rttvar 收敛到接近 0 时 RTO 至少比 SRTT 多出该值
+RTT_GRANULARITY = 0.01
+
+# 建连超时 = RTO × CONNECT_MULTIPLIER，限制在上下限 (秒) 之间；上限另外不低于调用方默认值的 3 倍，保证高延迟链路不会被误判。
+# 下限为 0.5 秒：高并发扫描时目标的 SYN 队列排队、本端事件循环调度都会使单次建连远超 RTO
+CONNECT_MULTIPLIER = 3
+CONNECT_FLOOR = 0.5
+CONNECT_CEILING = 5.0
+# 读超时 = RTO × READ_MULTIPLIER，并限制在调用方默认值的 [1/4, 3] 倍之间 (服务端处理耗时无法从 RTT 推出)
+READ_MULTIPLIER = 8
+# 尚无 RTT 样本时，最多 SEED_ATTEMPTS 次建连使用较宽松的 SEED_TIMEOUT 等待首批响应 (按发起次数计，
+# 高并发扫描的第一波探测中只有这些探测使用宽松超时)；其余建连与仍无响应的主机使用调用方默认值
+SEED_TIMEOUT = 2.0
+SEED_ATTEMPTS = 32
+# 进程内最多保留的主机估计器数量
+MAX_HOSTS = 4096
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+class RttEstimator:
+    """单台主机的往返时延估计 (SRTT / RTTVAR)，样本来自建连耗时 (含被 RST 拒绝的连接)"""
+    __slots__ = ("srtt", "rttvar", "samples", "timeouts", "seeded")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.timeouts = 0
+        # 已按 SEED_TIMEOUT 发起的建连次数
+        self.seeded = 0
+
+    def observe(self, sample: float):
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - sample)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * sample
+        self.samples += 1
+
+    def rto(self):
+        if self.srtt is None:
+            return None
+        return self.srtt + max(RTT_GRANULARITY, RTT_K * self.rttvar)
+
+class RttRegistry:
+    """
+    进程内按主机维护 RTT 估计，所有扫描器共享：
+    1. 端口扫描、Banner、TLS、SSH 建连的耗时持续更新估计值，同一主机的后续扫描沿用。
+    2. connect_timeout()/read_timeout() 由 RTO 推导超时；局域网目标的关闭/过滤端口不再等待固定秒数，
+       高延迟链路的超时随 RTT 放宽，避免漏报。
+    3. 已有样本的主机上建连超时 (端口扫描另重试一次后) 判定为 filtered (RST 会在 RTO 内返回)。
+    """
+    def __init__(self, max_hosts: int = MAX_HOSTS):
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, host: str) -> RttEstimator:
+        # 调用方需持有 self._lock
+        estimator = self._hosts.get(host)
+        if estimator is None:
+            estimator = self._hosts[host] = RttEstimator()
+            if len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return estimator
+
+    def observe(self, host: str, sample: float):
+        with self._lock:
+            self._get(host).observe(sample)
+
+    def timed_out(self, host: str) -> bool:
+        """记录一次建连超时；返回该主机是否已有 RTT 样本 (有样本时超时可判定为 filtered)"""
+        with self._lock:
+            estimator = self._get(host)
+            estimator.timeouts += 1
+            return estimator.samples > 0
+
+    def connect_timeout(self, host: str, default: float) -> float:
+        with self._lock:
+            estimator = self._get(host)
+            rto = estimator.rto()
+            seeding = rto is None and estimator.seeded < SEED_ATTEMPTS
+            if seeding:
+                estimator.seeded += 1
+        if rto is None:
+            return max(default, SEED_TIMEOUT) if seeding else default
+        return _clamp(rto * CONNECT_MULTIPLIER, CONNECT_FLOOR, max(CONNECT_CEILING, default * 3))
+
+    def read_timeout(self, host: str, default: float) -> float:
+        with self._lock:
+            rto = self._get(host).rto()
+        if rto is None:
+            return default
+        return _clamp(rto * READ_MULTIPLIER, default / 4, default * 3)
+
+    def timeouts(self, host: str, connect_default: float, read_default: float) -> tuple:
+        """requests 风格的 (建连超时, 读超时)"""
+        return self.connect_timeout(host, connect_default), self.read_timeout(host, read_default)
+
+    def snapshot(self, host: str) -> dict:
+        with self._lock:
+            estimator = self._hosts.get(host)
+            if estimator is None or estimator.srtt is None:
+                return {}
+            return {"srtt_ms": round(estimator.srtt * 1000, 3), "rto_ms": round(estimator.rto() * 1000, 3),
+                    "samples": estimator.samples}
+
+    def clear(self):
+        with self._lock:
+            self._hosts.clear()
+
+RTT = RttRegistry()
+
+def connect(host: str, port: int, connect_default: float, read_default: float = None) -> socket.socket:
+    """
+    以 RTT 推导的超时建立 TCP 连接并记录建连耗时；返回的套接字已设置推导出的读超时。
+    被拒绝的连接同样计入 RTT 样本，异常照常抛出。建连前先从全局建连预算中取得令牌。
+    """
+    CONNECTIONS.acquire(caller="connect")
+    timeout = RTT.connect_timeout(host, connect_default)
+    start = time.monotonic()
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except ConnectionRefusedError:
+        RTT.observe(host, time.monotonic() - start)
+        raise
+    except socket.timeout:
+        RTT.timed_out(host)
+        raise
+    RTT.observe(host, time.monotonic() - start)
+    sock.settimeout(RTT.read_timeout(host, read_default if read_default is not None else connect_default))
+    return sock
@@ -0,0 +1,192 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from pydantic import BaseModel
+
+from core.engine import ScanRequest
+from core.metrics import REGISTRY, Counter
+from core.config import SCHEDULER_POLL_INTERVAL
+
+# 周期扫描的最短间隔 (秒)
+MIN_INTERVAL = 60
+# 未指定抖动时取间隔的 10%，且不超过 1 小时
+DEFAULT_JITTER_RATIO = 0.1
+DEFAULT_JITTER_CAP = 3600
+# 单次检查最多触发的计划数，其余留到下一轮
+CLAIM_BATCH = 50
+
+SCHEDULED = REGISTRY.register(Counter(
+    "netaudit_scheduled_runs_total", "Recurring scan runs triggered by the scheduler", ("result",)))
+
+class ScheduleRequest(BaseModel):
+    name: str
+    request: ScanRequest
+    # 执行间隔 (秒)，如每日 86400、每周 604800
+    interval_seconds: int
+    # 每次触发时间在计划时刻之后随机推迟 [0, jitter_seconds] 秒，缺省按间隔推导
+    jitter_seconds: Optional[int] = None
+    # 首次计划时刻 (Unix 时间戳)，缺省为创建时刻
+    start_at: Optional[float] = None
+    enabled: bool = True
+
+class ScheduleUpdate(BaseModel):
+    enabled: bool
+
+def default_jitter(interval: int) -> int:
+    return int(min(interval * DEFAULT_JITTER_RATIO, DEFAULT_JITTER_CAP))
+
+def next_slot(anchor: float, interval: int, jitter: int, now: float) -> tuple:
+    """
+    返回 (下一个计划时刻, 带抖动的实际触发时刻)。
+    计划时刻按固定间隔推进，抖动不会累积成漂移；停机期间错过的周期不补跑。
+    """
+    while anchor <= now:
+        anchor += interval
+    return anchor, anchor + random.uniform(0, jitter)
+
+class ScheduleStore:
+    """
+    持久化的周期扫描定义 (与任务队列同库，SQLite WAL)：
+    1. 每个计划保存扫描参数、间隔与抖动，next_run 为带抖动的下一次触发时刻，大量同时创建的计划不会同时触发。
+    2. claim_due() 在 BEGIN IMMEDIATE 事务内取出到期计划并推进 next_run，多个调度进程不会重复触发同一计划。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS schedules (
+            id TEXT PRIMARY KEY, name TEXT NOT NULL, payload TEXT NOT NULL, interval_seconds INTEGER NOT NULL,
+            jitter_seconds INTEGER NOT NULL, enabled INTEGER NOT NULL DEFAULT 1, anchor REAL NOT NULL,
+            next_run REAL NOT NULL, last_run REAL, last_task_id TEXT, created_at REAL, updated_at REAL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_schedules_due ON schedules (enabled, next_run)")
+
+    @staticmethod
+    def _row(row) -> dict:
+        (schedule_id, name, payload, interval, jitter, enabled, next_run, last_run, last_task_id, created_at) = row
+        return {
+            "id": schedule_id, "name": name, "request": json.loads(payload), "interval_seconds": interval,
+            "jitter_seconds": jitter, "enabled": bool(enabled), "next_run": next_run, "last_run": last_run,
+            "last_task_id": last_task_id, "created_at": created_at
+        }
+
+    _COLUMNS = "id, name, payload, interval_seconds, jitter_seconds, enabled, next_run, last_run, last_task_id, created_at"
+
+    def create(self, name: str, payload: dict, interval: int, jitter: int, start_at: float = None, enabled: bool = True) -> dict:
+        now = time.time()
+        anchor = start_at if start_at is not None else now
+        next_run = anchor + random.uniform(0, jitter)
+        if next_run < now:
+            anchor, next_run = next_slot(anchor, interval, jitter, now)
+        schedule_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO schedules (id, name, payload, interval_seconds, jitter_seconds, enabled, anchor, next_run, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (schedule_id, name, json.dumps(payload, ensure_ascii=False), interval, jitter, int(enabled), anchor, next_run, now, now))
+        return self.get(schedule_id)
+
+    def get(self, schedule_id: str):
+        row = self._conn().execute(f"SELECT {self._COLUMNS} FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self) -> list:
+        return [self._row(r) for r in self._conn().execute(f"SELECT {self._COLUMNS} FROM schedules ORDER BY next_run")]
+
+    def set_enabled(self, schedule_id: str, enabled: bool) -> bool:
+        """启停计划；停用后重新启用时从当前时刻起计算下一次触发，不补跑停用期间的周期"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT anchor, interval_seconds, jitter_seconds, enabled FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+            if row and enabled and not row[3]:
+                anchor, next_run = next_slot(row[0], row[1], row[2], now)
+                conn.execute("UPDATE schedules SET enabled = 1, anchor = ?, next_run = ?, updated_at = ? WHERE id = ?",
+                             (anchor, next_run, now, schedule_id))
+            elif row and not enabled:
+                conn.execute("UPDATE schedules SET enabled = 0, updated_at = ? WHERE id = ?", (now, schedule_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row is not None
+
+    def delete(self, schedule_id: str) -> bool:
+        return self._conn().execute("DELETE FROM schedules WHERE id = ?", (schedule_id,)).rowcount > 0
+
+    def claim_due(self, limit: int = CLAIM_BATCH) -> list:
+        """取出到期的计划并推进到下一个周期，返回 [(计划 id, 扫描参数)]"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, payload, anchor, interval_seconds, jitter_seconds FROM schedules "
+                "WHERE enabled = 1 AND next_run <= ? ORDER BY next_run LIMIT ?", (now, limit)).fetchall()
+            for schedule_id, _, anchor, interval, jitter in rows:
+                anchor, next_run = next_slot(anchor, interval, jitter, now)
+                conn.execute("UPDATE schedules SET anchor = ?, next_run = ?, last_run = ?, updated_at = ? WHERE id = ?",
+                             (anchor, next_run, now, now, schedule_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def record_run(self, schedule_id: str, task_id: str):
+        self._conn().execute("UPDATE schedules SET last_task_id = ? WHERE id = ?", (task_id, schedule_id))
+
+class Scheduler:
+    """
+    周期扫描调度线程：每 poll_interval 秒取出到期的计划，经 submit (与 /api/scan 相同的入队逻辑) 写入任务队列。
+    触发只负责入队；实际执行受队列并发上限 (MAX_CONCURRENT_SCANS) 与全局建连预算约束，超出的任务在队列中等待。
+    """
+    def __init__(self, store: ScheduleStore, submit, poll_interval: float = SCHEDULER_POLL_INTERVAL):
+        self.store = store
+        self.submit = submit
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="scan-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> int:
+        fired = 0
+        for schedule_id, payload in self.store.claim_due():
+            try:
+                self.store.record_run(schedule_id, self.submit(payload))
+                SCHEDULED.inc(result="enqueued")
+                fired += 1
+            except Exception as e:
+                print(f"Scheduled scan {schedule_id} failed to enqueue: {str(e)}")
+                SCHEDULED.inc(result="failed")
+        return fired
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Scheduler error: {str(e)}")
+            self._stop.wait(self.poll_interval)
@@ -0,0 +1,292 @@
+import json
+import sqlite3
+import threading
+import time
+
+# 风险等级到数值的映射，用于索引与按风险筛选
+RISK_RANK = {"高危": 3, "中危": 2, "低危": 1, "安全": 0}
+
+FINDING_COLUMNS = ("id", "port", "protocol", "check_item", "risk_level", "description",
+                   "detail_value", "suggestion", "mlps_clause", "domain", "metadata")
+PORT_COLUMNS = ("port", "protocol", "status", "detail")
+REPORT_KEYS = ("id", "target", "score", "timestamp", "metadata", "summary", "defects", "port_statuses",
+               "defect_count", "port_count", "preview")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scans (
+        id INTEGER PRIMARY KEY, task_id TEXT, target TEXT NOT NULL, score INTEGER,
+        timestamp TEXT, created_at REAL, high INTEGER DEFAULT 0, medium INTEGER DEFAULT 0,
+        low INTEGER DEFAULT 0, defect_count INTEGER DEFAULT 0, max_risk INTEGER DEFAULT 0,
+        metadata TEXT, extra TEXT);
+    CREATE TABLE IF NOT EXISTS findings (
+        id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+        finding_id TEXT, port INTEGER, protocol TEXT, check_item TEXT, risk_level TEXT,
+        risk_rank INTEGER, description TEXT, detail_value TEXT, suggestion TEXT,
+        mlps_clause TEXT, domain TEXT, metadata TEXT, extra TEXT);
+    CREATE TABLE IF NOT EXISTS port_status (
+        id INTEGER PRIMARY KEY, scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+        port INTEGER, protocol TEXT, status TEXT, detail TEXT, extra TEXT);
+    CREATE INDEX IF NOT EXISTS idx_scans_target ON scans (target, id);
+    CREATE INDEX IF NOT EXISTS idx_scans_created ON scans (created_at);
+    CREATE INDEX IF NOT EXISTS idx_scans_risk ON scans (max_risk, id);
+    CREATE INDEX IF NOT EXISTS idx_scans_task ON scans (task_id);
+    CREATE INDEX IF NOT EXISTS idx_findings_scan ON findings (scan_id, risk_rank);
+    CREATE INDEX IF NOT EXISTS idx_findings_scan_port ON findings (scan_id, port, id);
+    CREATE INDEX IF NOT EXISTS idx_port_status_scan ON port_status (scan_id, port);
+"""
+
+class ScanStorage:
+    """
+    规范化的审计档案存储 (SQLite WAL)：
+    1. scans 表只保存摘要字段，发现项与端口状态分别存入 findings / port_status 表，列表查询无需解析完整报告。
+    2. target、时间与最高风险等级均建有索引，列表接口按 id 游标分页。
+    3. 每个线程复用一个长连接，不再为每个请求新建连接。
+    4. 扫描中的档案先以 begin_scans 建立占位行 (score 为 NULL)，发现项与端口状态分批 append_results，
+       finish_scan 写入摘要后才出现在列表与基线查询中。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        legacy = [r[1] for r in conn.execute("PRAGMA table_info(scans)")]
+        with conn:
+            # 旧表改名、建表与数据迁移在同一事务内完成 (executescript 会隐式提交，因此逐条执行)
+            conn.execute("BEGIN")
+            if "report" in legacy:
+                conn.execute("ALTER TABLE scans RENAME TO scans_legacy")
+            for statement in SCHEMA.split(";"):
+                if statement.strip(): conn.execute(statement)
+            if "report" in legacy:
+                self._migrate_legacy(conn)
+
+    def _migrate_legacy(self, conn):
+        """将旧版 scans(id, target, score, report) 表中的 JSON 报告拆分写入新表"""
+        for scan_id, report in conn.execute("SELECT id, report FROM scans_legacy ORDER BY id").fetchall():
+            try:
+                data = json.loads(report)
+            except (TypeError, ValueError):
+                continue
+            data["id"] = scan_id
+            self._insert(conn, data, None)
+        conn.execute("DROP TABLE scans_legacy")
+
+    def _insert(self, conn, report: dict, task_id: str) -> int:
+        findings = report.get("defects") or []
+        max_risk = max((RISK_RANK.get(f.get("risk_level"), 0) for f in findings), default=0)
+        scan_id = conn.execute("INSERT INTO scans (id, task_id, target, created_at) VALUES (?, ?, ?, ?)",
+                               (report.get("id"), task_id, report.get("target"), time.time())).lastrowid
+        self._insert_findings(conn, scan_id, findings)
+        self._insert_port_statuses(conn, scan_id, report.get("port_statuses") or [])
+        self._update_header(conn, scan_id, report, len(findings), max_risk)
+        return scan_id
+
+    @staticmethod
+    def _update_header(conn, scan_id: int, report: dict, defect_count: int, max_risk: int):
+        summary = report.get("summary") or {}
+        extra = {k: v for k, v in report.items() if k not in REPORT_KEYS}
+        conn.execute(
+            "UPDATE scans SET score = ?, timestamp = ?, high = ?, medium = ?, low = ?, defect_count = ?, max_risk = ?, "
+            "metadata = ?, extra = ? WHERE id = ?",
+            (report.get("score"), report.get("timestamp") or time.strftime("%Y-%m-%d %H:%M:%S"),
+             summary.get("high", 0), summary.get("medium", 0), summary.get("low", 0), defect_count, max_risk,
+             json.dumps(report.get("metadata") or {}, ensure_ascii=False),
+             json.dumps(extra, ensure_ascii=False) if extra else None, scan_id))
+
+    def _insert_port_statuses(self, conn, scan_id: int, port_statuses):
+        conn.executemany(
+            "INSERT INTO port_status (scan_id, port, protocol, status, detail, extra) VALUES (?, ?, ?, ?, ?, ?)",
+            [(scan_id, p.get("port"), p.get("protocol"), p.get("status"), p.get("detail"),
+              self._dump_extra(p, PORT_COLUMNS)) for p in port_statuses])
+
+    @staticmethod
+    def _dump_extra(item: dict, columns):
+        extra = {k: v for k, v in item.items() if k not in columns}
+        return json.dumps(extra, ensure_ascii=False) if extra else None
+
+    def _insert_findings(self, conn, scan_id: int, findings):
+        conn.executemany(
+            "INSERT INTO findings (scan_id, finding_id, port, protocol, check_item, risk_level, risk_rank, description, "
+            "detail_value, suggestion, mlps_clause, domain, metadata, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(scan_id, f.get("id"), f.get("port"), f.get("protocol"), f.get("check_item"), f.get("risk_level"),
+              RISK_RANK.get(f.get("risk_level"), 0), f.get("description"), f.get("detail_value"), f.get("suggestion"),
+              f.get("mlps_clause"), f.get("domain"),
+              json.dumps(f["metadata"], ensure_ascii=False) if f.get("metadata") is not None else None,
+              self._dump_extra(f, FINDING_COLUMNS)) for f in findings])
+
+    def begin_scans(self, targets, task_id: str = None) -> dict:
+        """为每个目标建立占位档案，返回 {目标: 档案 id}"""
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            return {target: conn.execute("INSERT INTO scans (task_id, target, created_at) VALUES (?, ?, ?)",
+                                         (task_id, target, now)).lastrowid for target in targets}
+
+    def append_results(self, scan_id: int, findings=(), port_statuses=()):
+        """追加一批发现项与端口状态 (dict)"""
+        conn = self._conn()
+        with conn:
+            if findings: self._insert_findings(conn, scan_id, findings)
+            if port_statuses: self._insert_port_statuses(conn, scan_id, port_statuses)
+
+    def finish_scan(self, scan_id: int, report: dict, defect_count: int, max_risk: int):
+        """写入报告头 (评分、风险计数与其他字段)；defects / port_statuses 已由 append_results 写入，不在此处读取"""
+        conn = self._conn()
+        with conn:
+            self._update_header(conn, scan_id, report, defect_count, max_risk)
+
+    def discard_unfinished(self, task_id: str) -> int:
+        """删除任务未完成的占位档案 (连同已写入的发现项)"""
+        conn = self._conn()
+        with conn:
+            return conn.execute("DELETE FROM scans WHERE task_id = ? AND score IS NULL", (task_id,)).rowcount
+
+    def save_report(self, report: dict, task_id: str = None) -> int:
+        conn = self._conn()
+        with conn:
+            scan_id = self._insert(conn, report, task_id)
+        report["id"] = scan_id
+        return scan_id
+
+    @staticmethod
+    def _summary_row(row) -> dict:
+        scan_id, target, score, timestamp, high, medium, low, defect_count, metadata = row
+        return {
+            "id": scan_id, "target": target, "score": score, "timestamp": timestamp,
+            "summary": {"high": high, "medium": medium, "low": low},
+            "defect_count": defect_count,
+            "metadata": json.loads(metadata) if metadata else {}
+        }
+
+    def list_scans(self, cursor: int = None, limit: int = 50, target: str = None, min_risk: int = None):
+        """按 id 倒序的游标分页，只返回摘要；返回 (条目列表, 下一页游标)"""
+        clauses, params = [], []
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+        if target:
+            clauses.append("target = ?")
+            params.append(target)
+        if min_risk is not None:
+            clauses.append("max_risk >= ?")
+            params.append(min_risk)
+        # 扫描中的占位档案 (score 为 NULL) 不出现在列表中
+        clauses.append("score IS NOT NULL")
+        where = f"WHERE {' AND '.join(clauses)}"
+        rows = self._conn().execute(
+            f"SELECT id, target, score, timestamp, high, medium, low, defect_count, metadata FROM scans {where} "
+            f"ORDER BY id DESC LIMIT ?", (*params, limit + 1)).fetchall()
+        items = [self._summary_row(r) for r in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return items, next_cursor
+
+    @staticmethod
+    def _load_extra(item: dict, extra):
+        if extra:
+            item.update(json.loads(extra))
+        return item
+
+    def iter_findings(self, scan_id: int, batch: int = 500, conn: sqlite3.Connection = None):
+        """以服务端游标分批读取发现项，内存占用与发现项总数无关"""
+        cursor = (conn or self._conn()).execute(
+            "SELECT finding_id, port, protocol, check_item, risk_level, description, detail_value, suggestion, "
+            "mlps_clause, domain, metadata, extra FROM findings WHERE scan_id = ? ORDER BY port, id", (scan_id,))
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows: return
+            for r in rows:
+                finding = {
+                    "id": r[0], "port": r[1], "protocol": r[2], "check_item": r[3], "risk_level": r[4],
+                    "description": r[5], "detail_value": r[6], "suggestion": r[7], "mlps_clause": r[8]
+                }
+                if r[9] is not None: finding["domain"] = r[9]
+                if r[10] is not None: finding["metadata"] = json.loads(r[10])
+                yield self._load_extra(finding, r[11])
+
+    def iter_port_statuses(self, scan_id: int, conn: sqlite3.Connection = None):
+        cursor = (conn or self._conn()).execute(
+            "SELECT port, protocol, status, detail, extra FROM port_status WHERE scan_id = ? ORDER BY port", (scan_id,))
+        for p in cursor:
+            yield self._load_extra({"port": p[0], "protocol": p[1], "status": p[2], "detail": p[3]}, p[4])
+
+    def _report_header(self, conn: sqlite3.Connection, scan_id: int):
+        row = conn.execute(
+            "SELECT id, target, score, timestamp, high, medium, low, defect_count, metadata, extra FROM scans WHERE id = ?",
+            (scan_id,)).fetchone()
+        if not row:
+            return None
+        report = self._summary_row(row[:9])
+        del report["defect_count"]
+        return self._load_extra(report, row[9])
+
+    def has_scan(self, scan_id: int) -> bool:
+        return self._conn().execute("SELECT 1 FROM scans WHERE id = ?", (scan_id,)).fetchone() is not None
+
+    def scan_ids_for_task(self, task_id: str) -> list:
+        return [r[0] for r in self._conn().execute("SELECT id FROM scans WHERE task_id = ? ORDER BY id", (task_id,))]
+
+    def iter_export(self, scan_ids, batch: int = 500):
+        """
+        流式导出档案：依次产出 ("report", 报告头)、("finding", 发现项)...、("port", 端口状态)...。
+        使用独立连接读取，生成器可在不同线程间逐步迭代 (如 StreamingResponse 的线程池)，迭代结束或中断时关闭连接。
+        """
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        try:
+            for scan_id in scan_ids:
+                header = self._report_header(conn, scan_id)
+                if header is None:
+                    continue
+                yield "report", header
+                for finding in self.iter_findings(scan_id, batch, conn):
+                    yield "finding", {**finding, "host": header["target"]}
+                for port_status in self.iter_port_statuses(scan_id, conn):
+                    yield "port", {**port_status, "host": header["target"]}
+        finally:
+            conn.close()
+
+    def get_report(self, scan_id: int):
+        report = self._report_header(self._conn(), scan_id)
+        if report is None:
+            return None
+        report["defects"] = list(self.iter_findings(scan_id))
+        report["port_statuses"] = list(self.iter_port_statuses(scan_id))
+        return report
+
+    def latest_scan_ids(self, targets) -> dict:
+        """返回 {目标: 最近一次审计的档案 id}，没有历史记录的目标不在结果中"""
+        targets = list(dict.fromkeys(targets))
+        ids = {}
+        # 分批查询，避免超出 SQLite 的参数数量上限
+        for i in range(0, len(targets), 500):
+            chunk = targets[i:i + 500]
+            ids.update(self._conn().execute(
+                f"SELECT target, MAX(id) FROM scans WHERE score IS NOT NULL AND target IN ({','.join('?' * len(chunk))}) GROUP BY target",
+                chunk).fetchall())
+        return ids
+
+    def delete_scan(self, scan_id: int) -> bool:
+        conn = self._conn()
+        with conn:
+            count = conn.execute("DELETE FROM scans WHERE id = ?", (scan_id,)).rowcount
+        return count > 0
+
+    def purge(self):
+        """清空已完成的档案；扫描中的占位档案 (score 为 NULL) 仍在分批写入，予以保留"""
+        conn = self._conn()
+        finished = "SELECT id FROM scans WHERE score IS NOT NULL"
+        with conn:
+            conn.execute(f"DELETE FROM findings WHERE scan_id IN ({finished})")
+            conn.execute(f"DELETE FROM port_status WHERE scan_id IN ({finished})")
+            conn.execute("DELETE FROM scans WHERE score IS NOT NULL")
@@ -0,0 +1,57 @@
+import ipaddress
+import re
+
+# 单个任务允许展开的最大主机数 (相当于一个 /16)
+MAX_HOSTS = 65536
+
+_SPLIT_RE = re.compile(r'[\s,，;；]+')
+
+def _expand_range(part: str):
+    """支持 10.0.0.1-10.0.0.50 与 10.0.0.1-50 两种写法 (仅 IPv4)"""
+    start_str, end_str = [x.strip() for x in part.split('-', 1)]
+    start = ipaddress.ip_address(start_str)
+    if '.' in end_str:
+        end = ipaddress.ip_address(end_str)
+    else:
+        octets = start_str.split('.')
+        end = ipaddress.ip_address('.'.join(octets[:3] + [end_str]))
+    if end.version != start.version or int(end) < int(start):
+        raise ValueError(f"无效的地址范围: {part}")
+    return (ipaddress.ip_address(i) for i in range(int(start), int(end) + 1))
+
+def expand_targets(target: str, limit: int = MAX_HOSTS) -> list:
+    """
+    将 target 字段展开为主机列表，支持：
+    单个 IP / 主机名、CIDR 网段 (192.168.1.0/24)、地址范围，以及用逗号、空格或换行分隔的组合。
+    展开结果去重并保持输入顺序，超出 limit 时抛出 ValueError。
+    """
+    hosts = []
+    seen = set()
+
+    def add(host: str):
+        if host in seen: return
+        if len(hosts) >= limit:
+            raise ValueError(f"目标主机数超过上限 {limit}")
+        seen.add(host)
+        hosts.append(host)
+
+    for part in _SPLIT_RE.split(target or ''):
+        if not part: continue
+        if '/' in part:
+            try:
+                net = ipaddress.ip_network(part, strict=False)
+            except ValueError:
+                raise ValueError(f"无效的网段: {part}")
+            if net.num_addresses > limit:
+                raise ValueError(f"网段 {part} 超过主机数上限 {limit}")
+            for ip in net.hosts():
+                add(str(ip))
+        elif '-' in part and not part.startswith('-') and part.replace('.', '').replace('-', '').isdigit():
+            for ip in _expand_range(part):
+                add(str(ip))
+        else:
+            add(part)
+
+    if not hosts:
+        raise ValueError("未提供有效的审计目标")
+    return hosts
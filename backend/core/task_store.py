@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import threading
+import time
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+class TaskStore:
+    """
+    基于 SQLite (WAL) 的任务状态层：
+    1. 状态落盘，进程重启后已完成任务仍可查询；多个 uvicorn worker 共享同一个库文件。
+    2. 已结束任务按 TTL 过期，并按条数与结果体积上限以 LRU (最近访问时间) 淘汰。
+    3. 进度更新按 progress_interval 节流写入，避免高频进度回调放大磁盘写入。
+    """
+    def __init__(self, path: str, ttl: int = 3600, max_entries: int = 500,
+                 max_bytes: int = 256 * 1024 * 1024, progress_interval: float = 0.5):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.progress_interval = progress_interval
+        self._local = threading.local()
+        self._last_progress = {}
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # 每个线程持有一个长连接，WAL 模式下读写互不阻塞
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY, status TEXT NOT NULL, progress TEXT, result TEXT, error TEXT,
+            size INTEGER NOT NULL DEFAULT 0, created_at REAL, updated_at REAL, accessed_at REAL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_accessed ON tasks (status, accessed_at)")
+
+    def create(self, task_id: str, progress: dict):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO tasks (id, status, progress, created_at, updated_at, accessed_at) VALUES (?, 'running', ?, ?, ?, ?)",
+            (task_id, json.dumps(progress, ensure_ascii=False), now, now, now))
+
+    def set_progress(self, task_id: str, percent: int, log: str, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress.get(task_id, 0) < self.progress_interval:
+                return
+            self._last_progress[task_id] = now
+        self._conn().execute(
+            "UPDATE tasks SET progress = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+            (json.dumps({"percent": percent, "log": log}, ensure_ascii=False), time.time(), task_id))
+
+    def _finish(self, task_id: str, status: str, progress: dict, result=None, error: str = None):
+        payload = json.dumps(result, ensure_ascii=False) if result is not None else None
+        now = time.time()
+        self._conn().execute(
+            "UPDATE tasks SET status = ?, progress = ?, result = ?, error = ?, size = ?, updated_at = ?, accessed_at = ? WHERE id = ?",
+            (status, json.dumps(progress, ensure_ascii=False), payload, error, len(payload or ""), now, now, task_id))
+        with self._lock:
+            self._last_progress.pop(task_id, None)
+        self.evict()
+
+    def complete(self, task_id: str, result: dict, log: str = "审计完成"):
+        self._finish(task_id, "completed", {"percent": 100, "log": log}, result=result)
+
+    def fail(self, task_id: str, error: str):
+        self._finish(task_id, "failed", {"percent": 100, "log": "审计失败"}, error=error)
+
+    def get(self, task_id: str, include_result: bool = True):
+        cols = "status, progress, error, result" if include_result else "status, progress, error, NULL"
+        row = self._conn().execute(f"SELECT {cols} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if not row:
+            return None
+        status, progress, error, result = row
+        if status in TERMINAL_STATUSES:
+            # 读取即刷新 LRU 访问时间
+            self._conn().execute("UPDATE tasks SET accessed_at = ? WHERE id = ?", (time.time(), task_id))
+        state = {"status": status, "progress": json.loads(progress) if progress else None}
+        if status == "completed":
+            state["result"] = json.loads(result) if result else None
+        elif status == "failed":
+            state["error"] = error
+        else:
+            state["result"] = None
+        return state
+
+    def __contains__(self, task_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is not None
+
+    def evict(self):
+        """按 TTL、条数与体积上限淘汰已结束的任务"""
+        conn = self._conn()
+        conn.execute("DELETE FROM tasks WHERE status IN ('completed', 'failed') AND updated_at < ?", (time.time() - self.ttl,))
+        rows = conn.execute(
+            "SELECT id, size FROM tasks WHERE status IN ('completed', 'failed') ORDER BY accessed_at DESC").fetchall()
+        total = 0
+        stale = []
+        for idx, (task_id, size) in enumerate(rows):
+            total += size
+            if idx >= self.max_entries or total > self.max_bytes:
+                stale.append((task_id,))
+        if stale:
+            conn.executemany("DELETE FROM tasks WHERE id = ?", stale)
@@ -0,0 +1,121 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+from core.job_queue import JobQueue
+from core.cancel import CancelToken
+from core import engine
+
+class ScanWorker:
+    """
+    从 JobQueue 领取并执行扫描任务：
+    1. slots 个执行线程各自循环领取任务，队列为空时按 poll_interval 轮询。
+    2. 心跳线程每 lease/3 秒为执行中的任务续约；进程崩溃后租约自然过期，任务由其他 worker 重新领取。
+    3. 结果通过 engine 的共享存储 (任务库与档案库) 写回，API 进程据此提供查询与 SSE 推送。
+    4. 心跳线程每秒检查执行中任务的取消标记，命中后触发对应扫描的 CancelToken。
+    5. 续约失败 (租约已过期或被重新领取) 时以 "lease_lost" 原因取消该扫描；扫描写入结果前同样检查租约，
+       失去租约的执行不会覆盖新执行方的档案与任务状态。
+    """
+    def __init__(self, queue: JobQueue, slots: int = 1, lease: float = 60, poll_interval: float = 1.0, worker_id: str = None):
+        self.queue = queue
+        self.slots = max(1, slots)
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._loop, name=f"scan-worker-{i}", daemon=True) for i in range(self.slots)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="scan-worker-heartbeat", daemon=True))
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, wait: bool = False):
+        """停止领取新任务；wait=True 时等待执行中的任务结束"""
+        self._stop.set()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def run_forever(self):
+        self.start()
+        for t in self._threads:
+            while t.is_alive():
+                t.join(timeout=1)
+
+    def _reap(self):
+        for job_id in self.queue.reap():
+            error = "执行该任务的 worker 多次失联，任务已放弃"
+            engine.task_store.fail(job_id, error)
+            engine.events.publish(job_id, {"type": "failed", "error": error})
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, self.lease)
+                if job is None:
+                    self._reap()
+            except Exception as e:
+                print(f"Worker {self.worker_id} queue error: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._execute(*job)
+
+    def _execute(self, job_id: str, payload: dict, attempt: int):
+        token = CancelToken()
+        with self._lock:
+            self._active[job_id] = (token, attempt)
+        try:
+            if attempt > 1:
+                engine.task_store.set_progress(job_id, 0, f"任务由 worker 重新领取 (第 {attempt} 次执行)", force=True)
+            # 重新领取的任务可能在上次执行期间已被请求取消
+            if self.queue.cancel_requested([job_id]):
+                token.cancel()
+            # run_deep_scan 自行捕获扫描异常并写入任务失败状态
+            engine.run_deep_scan(job_id, engine.ScanRequest(**payload), token,
+                                 lease=lambda: self.queue.holds(job_id, self.worker_id, attempt))
+            if not self.queue.complete(job_id, self.worker_id, attempt):
+                print(f"Worker {self.worker_id} lost lease on job {job_id} before completion")
+        except Exception as e:
+            self.queue.fail(job_id, self.worker_id, attempt, str(e))
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+
+    def _check_cancelled(self, active: dict):
+        try:
+            flagged = self.queue.cancel_requested(active)
+        except Exception as e:
+            print(f"Worker {self.worker_id} cancel check error: {str(e)}")
+            return
+        for job_id in flagged:
+            active[job_id][0].cancel()
+
+    def _heartbeat(self):
+        interval = max(1, int(self.lease / 3))
+        tick = 0
+        while True:
+            with self._lock:
+                active = dict(self._active)
+            if self._stop.is_set() and not active:
+                return
+            if tick % interval == 0:
+                for job_id, (token, attempt) in active.items():
+                    try:
+                        if not self.queue.heartbeat(job_id, self.worker_id, attempt, self.lease):
+                            print(f"Worker {self.worker_id} lost lease on job {job_id}, aborting")
+                            token.cancel("lease_lost")
+                    except Exception as e:
+                        print(f"Worker {self.worker_id} heartbeat error: {str(e)}")
+            # 取消标记按秒检查，续约按 interval 秒执行；停止后无执行中任务时尽快退出
+            self._check_cancelled(active)
+            tick += 1
+            time.sleep(1)
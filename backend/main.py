@@ -1,36 +1,61 @@
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from typing import Optional
 import uvicorn
-import time
+import asyncio
 import os
-import socket
-import sqlite3
 import json
 import uuid
-from concurrent.futures import ThreadPoolExecutor
 
-from core.analyzer import SecurityAnalyzer
-from scanners.web_scan import scan_http, check_tls_vulnerability
-from scanners.sys_scan import check_ssh_banner, brute_force_ssh
-from scanners.dns_scan import check_zone_transfer
+from core.targets import expand_targets
+from core.events import TERMINAL_EVENTS
+from core.task_store import TERMINAL_STATUSES
+from core.storage import RISK_RANK
+from core.export import EXPORT_FORMATS, export_chunks
+from core.metrics import REGISTRY, Gauge
+from core.job_queue import JobQueue
+from core.worker import ScanWorker
+from core.lazy import LazyObject
+from core.scheduler import MIN_INTERVAL, ScheduleRequest, ScheduleStore, ScheduleUpdate, Scheduler, default_jitter
+from core.engine import ScanRequest, analyzer, ensure_data_dir, events, storage, task_store
+from core.config import DIST_DIR, QUEUE_DB_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, EMBEDDED_WORKERS, MAX_CONCURRENT_SCANS, SCHEDULER_ENABLED
+from scanners.wordlist import resolve_wordlist_path
 
-app = FastAPI(title="NetAudit 审计引擎")
-analyzer = SecurityAnalyzer()
+# SSE 心跳间隔 (秒)，防止代理断开空闲连接
+STREAM_KEEPALIVE = 15
+# 无本地事件时回查任务库的间隔 (秒)
+STREAM_POLL_INTERVAL = 1.0
 
-task_store: Dict[str, Any] = {}
+def _open_job_queue() -> JobQueue:
+    ensure_data_dir()
+    return JobQueue(QUEUE_DB_PATH, max_attempts=JOB_MAX_ATTEMPTS, max_running=MAX_CONCURRENT_SCANS)
 
-DATA_DIR = "/app/data" 
-DIST_DIR = "/app/dist" 
+def _open_schedule_store() -> ScheduleStore:
+    ensure_data_dir()
+    return ScheduleStore(QUEUE_DB_PATH)
 
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+job_queue = LazyObject(_open_job_queue)
+schedule_store = LazyObject(_open_schedule_store)
+REGISTRY.register(Gauge("netaudit_queue_jobs", "Scan jobs in the durable queue by status", ("status",),
+                        collect=lambda: {(k,): v for k, v in job_queue.counts().items()}))
 
-DB_PATH = os.path.join(DATA_DIR, "netaudit.db")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 单机部署时 API 进程内嵌 worker；拆分部署时由独立的 worker.py 进程领取任务
+    if EMBEDDED_WORKERS > 0:
+        # 启动时加载合规规则，规则文件缺失或无效时直接启动失败，而不是在扫描中才暴露
+        analyzer.rules
+    worker = ScanWorker(job_queue, slots=EMBEDDED_WORKERS, lease=JOB_LEASE_SECONDS).start() if EMBEDDED_WORKERS > 0 else None
+    scheduler = Scheduler(schedule_store, _enqueue_scan).start() if SCHEDULER_ENABLED else None
+    yield
+    if scheduler: scheduler.stop()
+    if worker: worker.stop()
+
+app = FastAPI(title="NetAudit 审计引擎", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,154 +64,41 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-class ScanRequest(BaseModel):
-    target: str
-    domains: Optional[List[str]] = []
-    port_range: str
-    ports_config: Dict[str, str]
-    dictionaries: Dict[str, str]
-    mode: str = "快速扫描"
-    enable_brute: bool = False
-    metadata: Optional[Dict[str, str]] = {} 
-
-def parse_ports(port_str: str) -> List[int]:
-    ports = set()
-    for part in port_str.replace('，', ',').split(','):
-        part = part.strip()
-        if not part: continue
-        try:
-            if '-' in part:
-                s, e = map(int, part.split('-'))
-                for p in range(s, min(e + 1, s + 1000)): ports.add(p)
-            else: ports.add(int(part))
-        except: continue
-    return sorted(list(ports))
-
-def run_deep_scan(task_id: str, request: ScanRequest):
+def _validate_scan(request: ScanRequest):
     try:
-        def update_progress(pct, log):
-            task_store[task_id]["progress"] = {"percent": pct, "log": log}
-
-        target_ip = request.target
-        domain_list = [d.strip() for d in (request.domains or []) if d.strip()]
-        ports_to_scan = parse_ports(request.port_range)
-        
-        update_progress(10, "正在执行存活节点探测...")
-
-        with ThreadPoolExecutor(max_workers=50) as executor:
-            def check(p):
-                s = socket.socket()
-                s.settimeout(0.5)
-                if s.connect_ex((target_ip, p)) == 0:
-                    s.close()
-                    return p
-                return None
-            results = list(executor.map(check, ports_to_scan))
-            active_ports = [p for p in results if p]
-
-        all_findings = []
-        port_status_summary = []
-        
-        ssh_p = parse_ports(request.ports_config.get('ssh', '22'))
-        http_p = parse_ports(request.ports_config.get('http', '80'))
-        https_p = parse_ports(request.ports_config.get('https', '443'))
-        dns_p = parse_ports(request.ports_config.get('dns', '53'))
-
-        total_steps = len(active_ports)
-        for idx, port in enumerate(active_ports):
-            progress_base = 20 + int((idx / total_steps) * 60)
-            update_progress(progress_base, f"正在审计端口 {port} ({idx+1}/{total_steps})...")
-            
-            is_scanned = False
-            
-            if port in ssh_p:
-                banner = check_ssh_banner(target_ip, port)
-                creds = []
-                if request.mode == "深度审计" and request.enable_brute:
-                    user_list = request.dictionaries.get('usernames', 'admin').split('\n')
-                    pass_list = request.dictionaries.get('passwords', '123456').split('\n')
-                    creds = brute_force_ssh(target_ip, port, user_list, pass_list)
-                
-                findings = analyzer.analyze_service("SSH", port, banner, {"weak_creds": creds})
-                all_findings.extend(findings)
-                port_status_summary.append({"port": port, "protocol": "SSH", "status": "OPEN", "detail": f"Banner: {banner}"})
-                is_scanned = True
-            
-            if port in http_p or port in https_p:
-                scan_targets = domain_list if domain_list else [None]
-                for domain in scan_targets:
-                    res = scan_http(target_ip, port, vhost=domain)
-                    proto = "HTTPS" if port in https_p else "HTTP"
-                    tls_res = check_tls_vulnerability(target_ip, port, vhost=domain) if port in https_p else {}
-                    
-                    # 关键逻辑：将 scan_http 的深度结果传给 analyzer
-                    domain_findings = analyzer.analyze_service(proto, port, res.get("banner", "Unknown"), {
-                        "tls_results": tls_res,
-                        "web_results": res
-                    })
-                    for f in domain_findings:
-                        if domain: f["domain"] = domain
-                        all_findings.append(f)
-                port_status_summary.append({"port": port, "protocol": "WEB", "status": "OPEN", "detail": "Web Service Detected"})
-                is_scanned = True
-
-            if port in dns_p:
-                for domain in domain_list:
-                    if domain:
-                        dns_res = check_zone_transfer(domain, target_ip, port)
-                        if dns_res.get("vulnerable"):
-                            dns_findings = analyzer.analyze_service("DNS", port, "DNS-AXFR", {"dns_results": dns_res})
-                            for f in dns_findings:
-                                f["domain"] = domain
-                                all_findings.append(f)
-                port_status_summary.append({"port": port, "protocol": "DNS", "status": "OPEN", "detail": "DNS Service Active"})
-                is_scanned = True
-
-            if not is_scanned:
-                all_findings.append({
-                    "id": f"PORT-{port}", "protocol": "TCP", "check_item": "通用端口开放", 
-                    "risk_level": "安全", "description": f"检测到非预设业务端口 {port} 开放。",
-                    "detail_value": f"Port: {port}",
-                    "suggestion": "请核查此端口是否为业务必需。", "mlps_clause": "G3-访问控制"
-                })
-                port_status_summary.append({"port": port, "protocol": "TCP", "status": "OPEN", "detail": "Active"})
-
-        update_progress(95, "正在执行风险建模与评分...")
-        score = analyzer.calculate_score(all_findings)
-        
-        report = {
-            "target": target_ip, "score": score,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "defects": all_findings, "port_statuses": port_status_summary,
-            "metadata": request.metadata, 
-            "summary": {
-                "high": len([d for d in all_findings if d["risk_level"] == "高危"]), 
-                "medium": len([d for d in all_findings if d["risk_level"] == "中危"]), 
-                "low": len([d for d in all_findings if d["risk_level"] == "低危"])
-            }
-        }
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS scans (id INTEGER PRIMARY KEY, target TEXT, score INTEGER, report TEXT)")
-        cursor.execute("INSERT INTO scans (target, score, report) VALUES (?, ?, ?)", (target_ip, score, json.dumps(report)))
-        report['id'] = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        task_store[task_id] = {"status": "completed", "result": report, "progress": {"percent": 100, "log": "审计完成"}}
-        
-    except Exception as e:
-        print(f"Task {task_id} failed: {str(e)}")
-        task_store[task_id] = {"status": "failed", "error": str(e)}
+        expand_targets(request.target)
+        if request.web_wordlist: resolve_wordlist_path(request.web_wordlist)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/api/scan")
-async def start_scan(request: ScanRequest, background_tasks: BackgroundTasks):
+def _enqueue_scan(payload: dict) -> str:
+    """创建任务记录并写入扫描队列，/api/scan 与周期调度共用"""
     task_id = str(uuid.uuid4())
-    task_store[task_id] = {"status": "running", "result": None, "progress": {"percent": 0, "log": "初始化审计引擎"}}
-    background_tasks.add_task(run_deep_scan, task_id, request)
+    task_store.create(task_id, {"percent": 0, "log": "任务已进入扫描队列"})
+    job_queue.enqueue(task_id, payload)
+    return task_id
+
+@app.post("/api/scan")
+async def start_scan(request: ScanRequest):
+    _validate_scan(request)
+    task_id = _enqueue_scan(request.model_dump())
     return {"task_id": task_id, "status": "running"}
 
+@app.post("/api/scan/cancel/{task_id}")
+async def cancel_scan(task_id: str):
+    if task_id not in task_store:
+        raise HTTPException(status_code=404, detail="Task ID not found")
+    previous = job_queue.cancel(task_id)
+    if previous == "queued":
+        # 尚未开始执行的任务没有部分结果，直接结束
+        task_store.fail(task_id, "任务已取消")
+        events.publish(task_id, {"type": "failed", "error": "任务已取消"})
+        return {"task_id": task_id, "status": "cancelled"}
+    if previous == "running":
+        # 执行中的任务由 worker 中止各扫描器，部分结果入库后以 truncated 报告完成
+        return {"task_id": task_id, "status": "cancelling"}
+    return {"task_id": task_id, "status": (task_store.get(task_id, include_result=False) or {}).get("status")}
+
 @app.get("/api/scan/status/{task_id}")
 async def get_scan_status(task_id: str):
     status = task_store.get(task_id)
@@ -194,40 +106,159 @@ async def get_scan_status(task_id: str):
         raise HTTPException(status_code=404, detail="Task ID not found")
     return status
 
-@app.get("/api/history")
-async def history():
-    if not os.path.exists(DB_PATH): return []
-    conn = sqlite3.connect(DB_PATH)
-    rows = conn.cursor().execute("SELECT id, report FROM scans ORDER BY id DESC LIMIT 50").fetchall()
-    conn.close()
-    results = []
-    for r in rows:
-        item = json.loads(r[1])
-        item['id'] = r[0]
-        results.append(item)
-    return results
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
 
-@app.delete("/api/history/{scan_id}")
-async def delete_scan(scan_id: int):
-    if not os.path.exists(DB_PATH): 
-        raise HTTPException(status_code=404, detail="Database not found")
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM scans WHERE id = ?", (scan_id,))
-    conn.commit()
-    count = cursor.rowcount
-    conn.close()
-    if count == 0:
-        raise HTTPException(status_code=404, detail="Record not found")
+def _terminal_event(status: dict):
+    if status.get("status") == "completed":
+        return {"type": "completed", "result": status.get("result")}
+    if status.get("status") == "failed":
+        return {"type": "failed", "error": status.get("error")}
+    return None
+
+@app.get("/api/scan/stream/{task_id}")
+async def stream_scan(task_id: str):
+    """
+    以 Server-Sent Events 推送扫描进度：progress / finding 为增量事件，
+    completed 事件携带完整报告且只发送一次，随后关闭连接。
+    """
+    if task_id not in task_store:
+        raise HTTPException(status_code=404, detail="Task ID not found")
+
+    async def event_stream():
+        # 先订阅再读取状态，确保订阅前已结束的任务也能拿到最终结果
+        queue, replay = events.subscribe(task_id)
+        try:
+            status = task_store.get(task_id) or {}
+            final = _terminal_event(status)
+            if final:
+                yield _sse(final)
+                return
+            if replay:
+                for event in replay:
+                    yield _sse(event)
+            elif status.get("progress"):
+                yield _sse({"type": "progress", **status["progress"]})
+            last_progress = status.get("progress")
+            idle = 0.0
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), STREAM_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 任务可能由其他 worker 进程执行，本进程收不到事件时回退到读取共享任务库
+                    status = task_store.get(task_id, include_result=False) or {}
+                    if status.get("status") in TERMINAL_STATUSES:
+                        final = _terminal_event(task_store.get(task_id) or {})
+                        if final: yield _sse(final)
+                        return
+                    if status.get("progress") and status["progress"] != last_progress:
+                        last_progress = status["progress"]
+                        idle = 0.0
+                        yield _sse({"type": "progress", **last_progress})
+                        continue
+                    idle += STREAM_POLL_INTERVAL
+                    if idle >= STREAM_KEEPALIVE:
+                        idle = 0.0
+                        yield ": keepalive\n\n"
+                    continue
+                idle = 0.0
+                yield _sse(event)
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            events.unsubscribe(task_id, queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
+    })
+
+def _export_response(scan_ids: list, fmt: str, name: str) -> StreamingResponse:
+    # 发现项由数据库游标逐批读出并分块发送 (chunked)，服务端内存占用与档案规模无关
+    media_type, ext = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        export_chunks(fmt, storage.iter_export(scan_ids)), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{ext}"'})
+
+def _export_format(fmt: str) -> str:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {fmt}")
+    return fmt
+
+@app.get("/api/scan/export/{task_id}")
+async def export_scan(task_id: str, format: str = "ndjson"):
+    """导出一次扫描任务的全部主机档案 (多主机任务的每台主机各有一份档案)"""
+    fmt = _export_format(format)
+    scan_ids = storage.scan_ids_for_task(task_id)
+    if not scan_ids:
+        raise HTTPException(status_code=404, detail="No reports for this task")
+    return _export_response(scan_ids, fmt, f"netaudit_{task_id[:8]}")
+
+@app.get("/api/schedules")
+async def list_schedules():
+    return {"items": schedule_store.list()}
+
+@app.post("/api/schedules")
+async def create_schedule(schedule: ScheduleRequest):
+    """创建周期扫描；jitter_seconds 缺省为间隔的 10% (不超过 1 小时)，用于错开大量计划的触发时刻"""
+    _validate_scan(schedule.request)
+    if schedule.interval_seconds < MIN_INTERVAL:
+        raise HTTPException(status_code=400, detail=f"执行间隔不能小于 {MIN_INTERVAL} 秒")
+    jitter = schedule.jitter_seconds if schedule.jitter_seconds is not None else default_jitter(schedule.interval_seconds)
+    if not 0 <= jitter < schedule.interval_seconds:
+        raise HTTPException(status_code=400, detail="抖动范围需小于执行间隔")
+    return schedule_store.create(schedule.name, schedule.request.model_dump(), schedule.interval_seconds, jitter,
+                                 schedule.start_at, schedule.enabled)
+
+@app.patch("/api/schedules/{schedule_id}")
+async def update_schedule(schedule_id: str, update: ScheduleUpdate):
+    if not schedule_store.set_enabled(schedule_id, update.enabled):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule_store.get(schedule_id)
+
+@app.delete("/api/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    if not schedule_store.delete(schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的引擎指标：探测计数与延迟、扫描阶段耗时、流水线排队深度"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/history")
+async def history(cursor: Optional[int] = None, limit: int = 50, target: Optional[str] = None, risk: Optional[str] = None):
+    """档案列表：只返回摘要，按 id 游标分页；risk 为最低风险等级 (高危/中危/低危)"""
+    if risk is not None and risk not in RISK_RANK:
+        raise HTTPException(status_code=400, detail=f"未知的风险等级: {risk}")
+    items, next_cursor = storage.list_scans(
+        cursor=cursor, limit=max(1, min(limit, 200)), target=target,
+        min_risk=RISK_RANK[risk] if risk else None)
+    return {"items": items, "next_cursor": next_cursor}
+
 @app.delete("/api/history/purge")
 async def purge_history():
-    if not os.path.exists(DB_PATH): return {"status": "ok"}
-    conn = sqlite3.connect(DB_PATH)
-    conn.cursor().execute("DELETE FROM scans")
-    conn.commit()
-    conn.close()
+    storage.purge()
+    return {"status": "ok"}
+
+@app.get("/api/history/{scan_id}")
+async def get_history_report(scan_id: int):
+    report = storage.get_report(scan_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return report
+
+@app.get("/api/history/{scan_id}/export")
+async def export_history_report(scan_id: int, format: str = "ndjson"):
+    fmt = _export_format(format)
+    if not storage.has_scan(scan_id):
+        raise HTTPException(status_code=404, detail="Record not found")
+    return _export_response([scan_id], fmt, f"netaudit_{scan_id}")
+
+@app.delete("/api/history/{scan_id}")
+async def delete_scan(scan_id: int):
+    if not storage.delete_scan(scan_id):
+        raise HTTPException(status_code=404, detail="Record not found")
     return {"status": "ok"}
 
 if os.path.exists(DIST_DIR):
@@ -1,31 +1,115 @@
+import struct
+import time
 
-import dns.query
-import dns.zone
-import dns.resolver
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
 
-def check_zone_transfer(domain: str, nameserver: str, port: int = 53):
+from core.metrics import probe
+from core import rtt
+
+# 单次区域传送读取的记录数与字节数上限，超出后停止读取 (已足以证明漏洞)
+AXFR_MAX_RECORDS = 50000
+AXFR_MAX_BYTES = 8 * 1024 * 1024
+# 单次区域传送的总时长上限 (秒)
+AXFR_LIFETIME = 30
+# 报告中作为证据保留的记录名数量
+EVIDENCE_RECORDS = 10
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        part = sock.recv(remaining)
+        if not part:
+            raise ConnectionError("连接被服务端提前关闭")
+        chunks.append(part)
+        remaining -= len(part)
+    return b"".join(chunks)
+
+def _stream_axfr(domain: str, nameserver: str, port: int, max_records: int, max_bytes: int, prove_only: bool) -> dict:
+    """
+    基于 TCP 的流式 AXFR：逐条读取响应消息，只累计记录数与少量证据名称，不在内存中构建区域。
+    返回 {rcode, records, bytes, names, complete, capped}。
+    """
+    origin = dns.name.from_text(domain)
+    query = dns.message.make_query(origin, dns.rdatatype.AXFR)
+    wire = query.to_wire()
+    state = {"rcode": dns.rcode.NOERROR, "records": 0, "bytes": 0, "names": [], "complete": False, "capped": False}
+    deadline = time.monotonic() + AXFR_LIFETIME
+    soa_seen = 0
+    with rtt.connect(nameserver, port, 5) as sock:
+        sock.sendall(struct.pack("!H", len(wire)) + wire)
+        while time.monotonic() < deadline:
+            length = struct.unpack("!H", _recv_exact(sock, 2))[0]
+            # 上限按线上字节计算，包含每条消息 2 字节的长度前缀
+            if state["bytes"] + length + 2 > max_bytes:
+                state["capped"] = True
+                break
+            state["bytes"] += length + 2
+            message = dns.message.from_wire(_recv_exact(sock, length))
+            if message.id != query.id:
+                raise ValueError("响应 ID 与请求不匹配")
+            if message.rcode() != dns.rcode.NOERROR:
+                state["rcode"] = message.rcode()
+                break
+            for rrset in message.answer:
+                for _ in rrset:
+                    if rrset.rdtype == dns.rdatatype.SOA and rrset.name == origin:
+                        soa_seen += 1
+                        # 第二条 SOA 标志传送结束，不计入记录数
+                        if soa_seen == 2:
+                            state["complete"] = True
+                            break
+                    state["records"] += 1
+                if state["complete"]:
+                    break
+                name = rrset.name.relativize(origin).to_text()
+                if len(state["names"]) < EVIDENCE_RECORDS and name not in state["names"]:
+                    state["names"].append(name)
+            if state["complete"] or not message.answer:
+                break
+            if prove_only and state["records"] > soa_seen:
+                break
+            if state["records"] >= max_records:
+                state["capped"] = True
+                break
+    return state
+
+def check_zone_transfer(domain: str, nameserver: str, port: int = 53, max_records: int = AXFR_MAX_RECORDS,
+                        max_bytes: int = AXFR_MAX_BYTES, prove_only: bool = False):
     """
     检测 DNS 区域传送漏洞 (AXFR)
-    支持自定义端口探测
+    支持自定义端口探测；响应按消息流式读取，内存占用与区域大小无关：
+    1. prove_only=True 时收到 SOA 之外的首批记录即停止读取。
+    2. 否则边读边计数，直到传送结束或达到 max_records / max_bytes 上限。
     """
     try:
-        # 尝试进行区域传送请求，显式指定端口
-        # xfr 返回一个生成器
-        xfr_query = dns.query.xfr(nameserver, domain, port=port, timeout=5)
-        zone = dns.zone.from_xfr(xfr_query)
-        
-        if zone:
-            # 提取发现的记录名称，证明泄露
-            nodes = list(zone.nodes.keys())
-            return {
-                "vulnerable": True,
-                "records_count": len(nodes),
-                "detail": f"探测到敏感域: {domain}。成功获取到 {len(nodes)} 条解析记录。",
-                "records": [str(n) for n in nodes[:10]] # 记录前10条作为证据
-            }
+        with probe("dns_axfr") as p:
+            state = _stream_axfr(domain, nameserver, port, max_records, max_bytes, prove_only)
+            if state["rcode"] != dns.rcode.NOERROR:
+                p.outcome = "refused"
     except Exception as e:
         return {
             "vulnerable": False,
             "detail": f"探测失败: {str(e)}"
         }
-    return {"vulnerable": False, "detail": "Connection Refused or No Data"}
+
+    if state["rcode"] != dns.rcode.NOERROR:
+        return {"vulnerable": False, "detail": f"服务端拒绝区域传送 ({dns.rcode.to_text(state['rcode'])})"}
+    if not state["records"]:
+        return {"vulnerable": False, "detail": "Connection Refused or No Data"}
+
+    count = state["records"]
+    if state["complete"]:
+        detail = f"探测到敏感域: {domain}。成功获取到 {count} 条解析记录。"
+    else:
+        detail = f"探测到敏感域: {domain}。已获取 {count} 条解析记录 (确认可传送后停止读取)。"
+    return {
+        "vulnerable": True,
+        "records_count": count,
+        "complete": state["complete"],
+        "bytes_read": state["bytes"],
+        "detail": detail,
+        "records": state["names"] # 记录前10条作为证据
+    }
@@ -0,0 +1,136 @@
+import os
+import re
+import ssl
+import socket
+import struct
+
+from core.metrics import probe
+from core import rtt
+from core.rtt import RTT
+from core.probe_cache import PROBES
+
+# 等待服务端主动发送问候 (SSH / FTP / SMTP 等) 的默认时长 (秒)，实际值由 RTT 推导
+GREETING_TIMEOUT = 1.0
+# 发送探测报文后等待响应的默认时长 (秒)
+PROBE_TIMEOUT = 2.0
+# 识别只需要响应的开头部分
+READ_BYTES = 512
+
+# 预编译的服务签名索引：一次匹配响应开头，命中的分组名即服务类型。
+# 只有 ssh / http / tls / dns 会分派给对应审计器，其余服务只用于标注端口状态。
+SIGNATURES = re.compile(
+    rb"(?P<ssh>SSH-\d)"
+    # HTTP 状态行；按 HTTP/0.9 处理探测报文的服务端直接返回错误页面
+    rb"|(?P<http>HTTP/\d|\s*<!DOCTYPE html|\s*<html)"
+    # TLS 记录头：握手 (ServerHello) 或告警，版本号 3.0 ~ 3.4
+    rb"|(?P<tls>[\x15\x16]\x03[\x00-\x04])"
+    rb"|(?P<ftp>220[ -].*FTP)"
+    rb"|(?P<smtp>220[ -].*SMTP)"
+    rb"|(?P<pop3>\+OK)"
+    rb"|(?P<imap>\* OK)"
+    rb"|(?P<redis>-(ERR|NOAUTH|DENIED))",
+    re.IGNORECASE | re.DOTALL)
+
+def _client_hello() -> bytes:
+    """借助 MemoryBIO 生成标准库 TLS 客户端的 ClientHello，不需要真正的 TLS 连接"""
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+    tls = ctx.wrap_bio(incoming, outgoing, server_hostname=None)
+    try:
+        tls.do_handshake()
+    except ssl.SSLWantReadError:
+        pass
+    return outgoing.read()
+
+def _dns_query() -> tuple:
+    """DNS over TCP 的根域 SOA 查询，返回 (报文, 事务 ID)"""
+    txid = struct.unpack("!H", os.urandom(2))[0]
+    message = struct.pack("!HHHHHH", txid, 0x0100, 1, 0, 0, 0) + b"\x00" + struct.pack("!HH", 6, 1)
+    return struct.pack("!H", len(message)) + message, txid
+
+def _probe_payload(hint: str):
+    """
+    服务端保持沉默时发送的探测报文，返回 (报文, 响应判定函数)。
+    端口配置为 DNS 时发送 DNS 查询；否则发送 ClientHello 并追加空行：
+    TLS 服务先按记录长度读取 ClientHello 并回应 ServerHello，HTTP 服务则在空行处结束请求并返回 400 状态行。
+    DNS 服务会把 ClientHello 开头当作长度前缀等待后续字节，对该报文不作回应，由 _answers_dns 另行探测。
+    """
+    if hint == "dns":
+        payload, txid = _dns_query()
+        # 长度前缀 + 相同事务 ID + QR 位
+        def is_dns(data: bytes) -> bool:
+            return len(data) >= 6 and struct.unpack("!H", data[2:4])[0] == txid and data[4] & 0x80 != 0
+        return payload, is_dns
+    return _client_hello() + b"\r\n\r\n", lambda data: False
+
+def _recv(sock, timeout: float) -> bytes:
+    sock.settimeout(timeout)
+    try:
+        return sock.recv(READ_BYTES)
+    except socket.timeout:
+        return None
+
+def match_service(data: bytes) -> str:
+    match = SIGNATURES.match(data or b"")
+    return match.lastgroup if match else None
+
+def _banner(data: bytes) -> str:
+    return data.split(b"\n", 1)[0].decode(errors="ignore").strip()
+
+def _answers_dns(target: str, port: int) -> bool:
+    """在新连接上发送 DNS 查询，判断端口上是否为 DNS over TCP 服务"""
+    payload, is_dns = _probe_payload("dns")
+    try:
+        with rtt.connect(target, port, 3) as sock:
+            sock.sendall(payload)
+            return is_dns(_recv(sock, RTT.read_timeout(target, PROBE_TIMEOUT)) or b"")
+    except OSError:
+        return False
+
+def _identify(target: str, port: int, hint: str) -> dict:
+    with probe("service_fingerprint") as p, rtt.connect(target, port, 3) as sock:
+        # 客户端先发言的协议 (HTTP / TLS / DNS) 不会主动问候，按端口配置提示直接发送探测报文
+        data = None
+        if hint not in ("http", "https", "dns"):
+            data = _recv(sock, RTT.read_timeout(target, GREETING_TIMEOUT))
+            if data == b"":
+                p.outcome = "closed"
+                return {"service": None, "banner": ""}
+        if data:
+            return {"service": match_service(data), "banner": _banner(data)}
+
+        payload, is_expected = _probe_payload(hint)
+        try:
+            sock.sendall(payload)
+        except OSError:
+            p.outcome = "closed"
+            return {"service": None, "banner": ""}
+        data = _recv(sock, RTT.read_timeout(target, PROBE_TIMEOUT)) or b""
+        if is_expected(data):
+            return {"service": hint, "banner": ""}
+        service = match_service(data)
+        if service is None and not data and hint != "dns":
+            # 对 ClientHello 沉默或直接断开的端口可能是未在端口配置中标注的 DNS 服务
+            if _answers_dns(target, port):
+                return {"service": "dns", "banner": ""}
+        if service is None:
+            p.outcome = "unknown"
+        # 只有 HTTP 状态行可作为 Banner，TLS 记录与错误页面不展示
+        return {"service": service, "banner": _banner(data) if data.startswith(b"HTTP/") else ""}
+
+def identify_service(target: str, port: int, hint: str = None) -> dict:
+    """
+    单连接识别端口上的服务：
+    1. 先读取服务端主动发送的问候 (SSH / FTP / SMTP ...)；
+    2. 服务端沉默时发送一个探测报文 (ClientHello 或 DNS 查询)，按响应开头匹配签名索引；
+       ClientHello 没有任何响应时，换新连接再发送一次 DNS 查询。
+    hint 为端口配置给出的预期协议 (ssh / http / https / dns)，只影响探测顺序。
+    返回 {"service": ssh|http|tls|dns|ftp|...|None, "banner": 首行文本}；无法识别或连接失败时 service 为 None。
+    结果经进程级探测缓存在并发扫描间共享；连接失败不缓存。
+    """
+    try:
+        return PROBES.get("service", target, port, hint, lambda: _identify(target, port, hint))
+    except Exception as e:
+        return {"service": None, "banner": "", "error": str(e)}
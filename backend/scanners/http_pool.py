@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from core.ratelimit import CONNECTIONS
+
+USER_AGENT = 'NetAudit-Audit-Bot/3.1'
+
+class _Budgeted:
+    """每次新建 TCP 连接前消耗全局建连预算的一个令牌；复用 keep-alive 连接不消耗"""
+    def connect(self):
+        CONNECTIONS.acquire(caller="http")
+        super().connect()
+
+class _HTTPConnection(_Budgeted, HTTPConnection):
+    pass
+
+class _HTTPSConnection(_Budgeted, HTTPSConnection):
+    pass
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+class BudgetedAdapter(HTTPAdapter):
+    """连接池新建的连接计入 core.ratelimit.CONNECTIONS，Web 路径探测与其他扫描共享同一建连预算"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+def new_session(vhost: str = None, maxsize: int = 8) -> requests.Session:
+    """创建一个 keep-alive 会话：同一目标的所有探测复用连接，HTTPS 只需一次握手；新建连接消耗全局建连预算"""
+    session = requests.Session()
+    adapter = BudgetedAdapter(pool_connections=1, pool_maxsize=maxsize, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.verify = False
+    session.headers['User-Agent'] = USER_AGENT
+    if vhost: session.headers['Host'] = vhost
+    return session
+
+class HttpClientPool:
+    """
+    单次扫描范围内共享的 HTTP 客户端池：
+    1. 每个 (host, port, vhost) 对应一个持久会话，根请求、敏感路径探测与虚拟主机校验共用连接。
+    2. 会话数量有上限，超出时按 LRU 不再分发最久未用的会话；被淘汰的会话可能仍在其他审计线程中使用，
+       因此不主动关闭，由其持有者用完后随垃圾回收释放。扫描结束调用 close() 释放池内全部连接。
+    """
+    def __init__(self, max_clients: int = 128, connections_per_client: int = 8):
+        self.max_clients = max_clients
+        self.connections_per_client = connections_per_client
+        self._sessions = OrderedDict()
+        self._baselines = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int, vhost: str = None) -> requests.Session:
+        key = (host, port, vhost)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+            session = new_session(vhost, self.connections_per_client)
+            self._sessions[key] = session
+            if len(self._sessions) > self.max_clients:
+                self._sessions.popitem(last=False)
+            return session
+
+    def baseline(self, host: str, port: int, vhost: str, factory):
+        """每个虚拟主机的伪 404 基线只计算一次，扫描内复用"""
+        key = (host, port, vhost)
+        with self._lock:
+            if key in self._baselines:
+                return self._baselines[key]
+        value = factory()
+        with self._lock:
+            return self._baselines.setdefault(key, value)
+
+    def close(self):
+        with self._lock:
+            self._baselines.clear()
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
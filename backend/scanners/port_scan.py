@@ -0,0 +1,140 @@
+import asyncio
+import socket
+import struct
+
+from core.metrics import record_probe
+from core.rtt import RTT
+from core.probe_cache import PORTS
+from core.ratelimit import CONNECTIONS
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块
+    resource = None
+
+# 默认并发上限：单线程事件循环内同时挂起的 connect 数量
+DEFAULT_CONCURRENCY = 1000
+DEFAULT_TIMEOUT = 0.5
+# 已有 RTT 样本的主机上建连超时后的重试次数
+FILTERED_RETRIES = 1
+
+# 为日志、数据库等其他句柄预留的文件描述符
+FD_RESERVE = 64
+
+def _fd_ceiling(requested: int) -> int:
+    """并发上限不能超过进程可用的文件描述符数量"""
+    if resource is None:
+        return requested
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except Exception:
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - FD_RESERVE))
+
+def _resolve(target: str):
+    """只解析一次目标地址，避免每个端口重复 DNS 查询"""
+    family, _, _, _, sockaddr = socket.getaddrinfo(target, None, type=socket.SOCK_STREAM)[0]
+    return family, sockaddr[0]
+
+async def _attempt(loop, host: str, family: int, address: str, port: int, timeout: float) -> str:
+    """单次建连，返回 open / closed / timeout；建连前从全局建连预算中取得令牌"""
+    await CONNECTIONS.aacquire(caller="port")
+    s = socket.socket(family, socket.SOCK_STREAM)
+    s.setblocking(False)
+    start = loop.time()
+    try:
+        await asyncio.wait_for(loop.sock_connect(s, (address, port)), RTT.connect_timeout(host, timeout))
+        RTT.observe(host, loop.time() - start)
+        # 以 RST 方式关闭已建立的连接，避免本端堆积 TIME_WAIT
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        return "open"
+    except asyncio.TimeoutError:
+        return "timeout"
+    except ConnectionRefusedError:
+        RTT.observe(host, loop.time() - start)
+        return "closed"
+    except OSError:
+        return "closed"
+    finally:
+        # 无论成功、拒绝还是超时都必须关闭套接字
+        s.close()
+
+async def _probe(loop, host: str, family: int, address: str, port: int, timeout: float) -> bool:
+    """
+    单个端口的建连探测，超时由该主机的 RTT 估计推导 (timeout 为无样本时的默认值)。
+    建连成功与被 RST 拒绝的耗时都作为 RTT 样本。已有样本的主机上超时后重试 FILTERED_RETRIES 次，
+    仍超时才判定为 filtered：高并发扫描中单个 SYN 丢失或监听队列已满不会让开放端口被误判。
+    """
+    start = loop.time()
+    for _ in range(FILTERED_RETRIES + 1):
+        outcome = await _attempt(loop, host, family, address, port, timeout)
+        if outcome != "timeout":
+            break
+        if not RTT.timed_out(host):
+            # 尚无样本的主机已按较宽松的种子超时等待，不再重试
+            break
+        outcome = "filtered"
+    record_probe("port", outcome, loop.time() - start)
+    return outcome == "open"
+
+def _interleave(hosts: list, ports: list):
+    """按端口主序、主机次序交错生成 (host, port)，使相邻探测落在不同主机上"""
+    for port in ports:
+        for host in hosts:
+            yield host, port
+
+async def _sweep(hosts: list, ports: list, concurrency: int, per_host_limit: int, timeout: float, cancel=None) -> dict:
+    loop = asyncio.get_running_loop()
+    results = {h: [] for h in hosts}
+    addresses = {}
+    for host in hosts:
+        try:
+            addresses[host] = _resolve(host)
+        except OSError:
+            # 无法解析的主机不参与探测，结果为空
+            continue
+    live_hosts = [h for h in hosts if h in addresses]
+    host_slots = {h: asyncio.Semaphore(per_host_limit) for h in live_hosts}
+    probe_iter = _interleave(live_hosts, ports)
+
+    async def worker():
+        # 所有 worker 共享同一个迭代器，单线程内无需加锁
+        for host, port in probe_iter:
+            # 取消后停止下发新探测；在途探测最多再等待一个 timeout
+            if cancel is not None and cancel.cancelled:
+                return
+            family, address = addresses[host]
+
+            async def probe_port():
+                async with host_slots[host]:
+                    return await _probe(loop, host, family, address, port, timeout)
+
+            # 并发扫描同一主机时，相同端口的在途探测只发起一次 (结果不跨扫描保留)
+            if await PORTS.aget("connect", host, port, None, probe_port):
+                results[host].append(port)
+
+    total = len(ports) * len(live_hosts)
+    workers = min(_fd_ceiling(concurrency), total)
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    for open_ports in results.values():
+        open_ports.sort()
+    return results
+
+def sweep_hosts(hosts: list, ports: list, concurrency: int = DEFAULT_CONCURRENCY,
+                per_host_limit: int = None, timeout: float = DEFAULT_TIMEOUT, cancel=None) -> dict:
+    """
+    多主机全局探测调度：
+    1. (host, port) 探测在主机间交错进行，所有主机共享同一个事件循环与全局在途上限 concurrency。
+    2. per_host_limit 限制单台主机的在途连接数，默认与全局上限一致。
+    3. 每台主机的建连超时由 core.rtt 的 RTT 估计推导，timeout 只是尚无样本时的默认值；超时的端口重试一次后才判定为 filtered。
+    4. cancel (CancelToken) 触发后不再发起新的探测，返回已发现的开放端口。
+    5. 每次建连消耗全局建连预算 (core.ratelimit.CONNECTIONS) 的一个令牌，预算耗尽时探测排队等待。
+    返回 {host: [开放端口]}。
+    """
+    if not hosts or not ports:
+        return {h: [] for h in hosts}
+    concurrency = max(1, concurrency)
+    per_host_limit = max(1, per_host_limit or concurrency)
+    return asyncio.run(_sweep(list(hosts), list(ports), concurrency, per_host_limit, timeout, cancel))
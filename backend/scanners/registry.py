@@ -0,0 +1,43 @@
+import importlib
+import threading
+
+# 扫描器插件表：名称 -> 模块路径。模块在首次使用时才导入，
+# 未启用 SSH / DNS 审计的部署不会加载 paramiko、dnspython 等重量级依赖。
+SCANNERS = {
+    "ssh": "scanners.sys_scan",
+    "web": "scanners.web_scan",
+    "tls": "scanners.tls_scan",
+    "dns": "scanners.dns_scan",
+    "http_pool": "scanners.http_pool",
+    "fingerprint": "scanners.fingerprint"
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+def register(name: str, module_path: str):
+    """注册 (或替换) 扫描器插件；已导入的同名插件在下次使用时按新路径重新加载"""
+    with _lock:
+        SCANNERS[name] = module_path
+        _loaded.pop(name, None)
+
+def load(name: str):
+    """返回扫描器模块，首次调用时导入"""
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        if name not in _loaded:
+            if name not in SCANNERS:
+                raise KeyError(f"未注册的扫描器: {name}")
+            _loaded[name] = importlib.import_module(SCANNERS[name])
+        return _loaded[name]
+
+def preload(names=None) -> list:
+    """预先导入扫描器 (worker 在 fork 子进程前调用，子进程共享已导入的模块)，返回已加载的名称"""
+    for name in names or list(SCANNERS):
+        load(name)
+    return sorted(_loaded)
+
+def loaded() -> list:
+    return sorted(_loaded)
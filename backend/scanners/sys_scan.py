@@ -1,78 +1,210 @@
-import socket
 import paramiko
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+
+from core.metrics import probe
+from core import rtt
+from core.probe_cache import PROBES
 
 # 配置日志记录，减少 paramiko 的调试输出
 logging.getLogger("paramiko").setLevel(logging.WARNING)
 
 def check_ssh_banner(target: str, port: int):
-    """获取 SSH 指纹，用于初步确认服务类型"""
+    """
+    获取 SSH 指纹，用于初步确认服务类型；结果经进程级探测缓存在并发扫描间共享。
+    建连失败在缓存之外转换为 "SSH Connection Refused"，失败结果不会被缓存，下次调用重新探测。
+    """
     try:
-        with socket.create_connection((target, port), timeout=3) as s:
-            s.settimeout(3)
-            banner = s.recv(1024).decode(errors='ignore').strip()
-            return banner if banner else "SSH-2.0-Generic"
+        return PROBES.get("ssh_banner", target, port, None, lambda: _read_banner(target, port))
     except Exception:
         return "SSH Connection Refused"
 
-def brute_force_ssh(target: str, port: int, usernames: list, passwords: list):
+def _read_banner(target: str, port: int):
+    with probe("ssh_banner"), rtt.connect(target, port, 3) as s:
+        banner = s.recv(1024).decode(errors='ignore').strip()
+        return banner if banner else "SSH-2.0-Generic"
+
+# 单个会话上尝试的认证次数初始取服务器默认 MaxAuthTries (6)；
+# 首个在认证过程中被服务器断开的会话给出实际上限，后续批次按该值切分
+MAX_AUTH_PER_SESSION = 6
+# 连续建连失败达到该次数后放弃该 worker
+MAX_CONNECT_FAILURES = 5
+
+def _credential_batches(usernames: list, passwords: list, batch_size=lambda: MAX_AUTH_PER_SESSION):
     """
-    优化后的 SSH 弱口令审计函数：
-    1. 引入线程池并发验证，显著提升大字典扫描速度。
-    2. 保留早停机制，一旦发现有效凭据即刻终止所有线程并返回。
+    惰性生成去重后的凭据批次 (用户名, [密码...])，不在内存中构建用户名×密码的完整笛卡尔积。
+    同一会话内不允许切换用户名 (OpenSSH 会直接断开)，因此每批只包含一个用户。
+    batch_size 在生成每个批次时调用，探测到的 MaxAuthTries 对尚未生成的批次立即生效。
     """
-    
-    # 内部登录尝试函数
-    def attempt_login(user, pwd):
-        user = user.strip()
-        pwd = pwd.strip()
-        if not user or not pwd:
-            return None
-            
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    users = list(dict.fromkeys(u.strip() for u in usernames if u.strip()))
+    pwds = list(dict.fromkeys(p.strip() for p in passwords if p.strip()))
+    for user in users:
+        i = 0
+        while i < len(pwds):
+            size = batch_size()
+            yield user, pwds[i:i + size]
+            i += size
+
+class _Backoff:
+    """所有 worker 共享的退避状态：检测到限流 (连接重置、Banner 超时) 时指数退避，成功建连后复位"""
+    def __init__(self, base: float = 0.5, cap: float = 30.0, interrupt: threading.Event = None):
+        self.base = base
+        self.cap = cap
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        # 退避等待可被 interrupt 打断 (发现凭据或扫描取消)
+        self._sleep = interrupt.wait if interrupt else time.sleep
+
+    def failure(self):
+        with self._lock:
+            self.delay = min(self.cap, self.delay * 2 if self.delay else self.base)
+            delay = self.delay
+        self._sleep(delay)
+
+    def success(self):
+        with self._lock:
+            self.delay = 0.0
+
+    def wait(self):
+        if self.delay: self._sleep(self.delay)
+
+def _open_transport(target: str, port: int):
+    with probe("ssh_connect"):
+        sock = rtt.connect(target, port, 5)
         try:
-            # 关键优化：禁用所有不必要的认证方法以加快速度
-            client.connect(
-                hostname=target,
-                port=port,
-                username=user,
-                password=pwd,
-                timeout=5,          # 认证超时
-                banner_timeout=10,  # 响应超时
-                look_for_keys=False,
-                allow_agent=False
-            )
-            return {"user": user, "pass": pwd, "is_compromised": True}
-        except paramiko.AuthenticationException:
-            return None # 账号密码错误
+            transport = paramiko.Transport(sock)
+            # 超时按目标 RTT 推导，括号内为尚无 RTT 样本时的默认值
+            transport.banner_timeout = rtt.RTT.read_timeout(target, 10)  # 响应超时
+            transport.auth_timeout = rtt.RTT.read_timeout(target, 5)     # 认证超时
+            transport.start_client(timeout=rtt.RTT.read_timeout(target, 5))
+            return transport
         except Exception:
-            return None # 网络层或协议错误
-        finally:
-            client.close()
-
-    # 构建任务列表
-    credentials_to_test = [(u, p) for u in usernames for p in passwords]
-    
-    # 使用线程池加速审计 (建议并发数 5-10，避免被目标防火墙拉黑)
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        # 提交所有任务
-        future_to_cred = {
-            executor.submit(attempt_login, u, p): (u, p) 
-            for u, p in credentials_to_test
-        }
-        
-        try:
-            for future in as_completed(future_to_cred):
-                result = future.result()
-                if result:
-                    # 【核心优化：早停机制】
-                    # 发现一个有效凭据后，立即强制取消所有还未开始的任务并关闭线程池
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    return [result]
-        except Exception as e:
-            print(f"审计过程中出现异常: {str(e)}")
-
-    return [] # 未发现弱口令
\ No newline at end of file
+            sock.close()
+            raise
+
+def brute_force_ssh(target: str, port: int, usernames: list, passwords: list, workers: int = 5, cancel=None):
+    """
+    SSH 弱口令审计：
+    1. 每个批次只做一次 TCP 连接与密钥交换，在同一 Transport 上连续执行不超过服务器 MaxAuthTries 次
+       auth_password；会话被服务器提前断开时剩余密码重新入队。上限初始为 MAX_AUTH_PER_SESSION，
+       首个在认证中途被断开的会话已完成的尝试次数即作为该服务器的实际上限。
+    2. 凭据批次惰性生成，内存占用与字典规模无关。
+    3. 检测到限流时所有 worker 共同退避；发现有效凭据即刻停止。
+    4. cancel (CancelToken) 触发时停止所有 worker 并关闭在途会话。
+    返回 {"weak_creds": [...], "complete": bool, "untested": int}：
+    worker 因持续限流全部退出、仍有凭据未验证时 complete 为 False，此时空的 weak_creds 不代表没有弱口令。
+    """
+    auth_limit = {"value": MAX_AUTH_PER_SESSION, "detected": False}
+    batches = _credential_batches(usernames, passwords, lambda: auth_limit["value"])
+    retry = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    backoff = _Backoff(interrupt=stop)
+    found = []
+    # 服务器不接受密码认证时无需验证剩余凭据，结果同样是完整的
+    password_auth = {"accepted": True}
+    transports = set()
+
+    def abort():
+        stop.set()
+        with lock:
+            active = list(transports)
+        for transport in active:
+            transport.close()
+
+    def next_batch():
+        with lock:
+            if retry: return retry.pop()
+            return next(batches, None)
+
+    def requeue(batch):
+        with lock:
+            retry.append(batch)
+
+    def disconnected(user, pwds, attempts):
+        """会话在第 attempts 次尝试后被断开：剩余密码重新入队，并据此确定服务器的 MaxAuthTries"""
+        requeue((user, pwds[attempts:]))
+        with lock:
+            if attempts > 0 and not auth_limit["detected"]:
+                auth_limit["value"] = min(auth_limit["value"], attempts)
+                auth_limit["detected"] = True
+        return attempts > 0
+
+    def run_batch(transport, user, pwds):
+        """返回本会话是否至少完成了一次认证尝试"""
+        # 重新入队的批次可能按探测到上限之前的大小切分，超出部分留给下一个会话
+        limit = auth_limit["value"]
+        if len(pwds) > limit:
+            requeue((user, pwds[limit:]))
+            pwds = pwds[:limit]
+        for i, pwd in enumerate(pwds):
+            if stop.is_set(): return True
+            if not transport.is_active():
+                return disconnected(user, pwds, i)
+            try:
+                with probe("ssh_auth") as p:
+                    try:
+                        transport.auth_password(user, pwd)
+                    except paramiko.AuthenticationException:
+                        p.outcome = "rejected"
+                        raise
+                if transport.is_authenticated():
+                    found.append({"user": user, "pass": pwd, "is_compromised": True})
+                    stop.set()
+                    return True
+            except paramiko.BadAuthenticationType:
+                # 服务器不接受密码认证，无需继续
+                password_auth["accepted"] = False
+                stop.set()
+                return True
+            except paramiko.AuthenticationException:
+                continue # 账号密码错误，会话仍可复用
+            except Exception:
+                # 会话在认证过程中中断，剩余密码需要重试
+                return disconnected(user, pwds, i)
+        return True
+
+    def worker():
+        connect_failures = 0
+        while not stop.is_set():
+            batch = next_batch()
+            if batch is None: return
+            backoff.wait()
+            if stop.is_set(): return
+            try:
+                transport = _open_transport(target, port)
+            except Exception:
+                # 连接被重置或 Banner 超时，通常意味着目标开始限流
+                requeue(batch)
+                connect_failures += 1
+                if connect_failures >= MAX_CONNECT_FAILURES: return
+                backoff.failure()
+                continue
+            with lock:
+                transports.add(transport)
+            try:
+                progressed = run_batch(transport, *batch)
+            finally:
+                with lock:
+                    transports.discard(transport)
+                transport.close()
+            if progressed:
+                connect_failures = 0
+                backoff.success()
+            else:
+                # 建连后首次认证即被断开，同样按限流处理，避免同一批次无限重试
+                connect_failures += 1
+                if connect_failures >= MAX_CONNECT_FAILURES: return
+                backoff.failure()
+
+    unregister = cancel.on_cancel(abort) if cancel is not None else None
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    if unregister: unregister()
+
+    # 所有 worker 都因连续建连失败退出时，重新入队与尚未生成的批次均未验证
+    untested = sum(len(pwds) for _, pwds in retry) + sum(len(pwds) for _, pwds in batches)
+    complete = bool(found) or not password_auth["accepted"] or untested == 0
+    return {"weak_creds": found[:1], "complete": complete, "untested": 0 if complete else untested}
@@ -0,0 +1,165 @@
+import ssl
+import hashlib
+import threading
+from datetime import datetime, timezone
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+
+from core.metrics import probe
+from core import rtt
+from core.probe_cache import PROBES
+
+WEAK_VERSIONS = {"TLSv1": "TLSv1.0", "TLSv1.1": "TLSv1.1"}
+
+def _client_context(max_version=None) -> ssl.SSLContext:
+    # 审计需要与老旧协议和弱套件握手，因此放开最低版本与安全等级，且不校验证书
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    try:
+        ctx.minimum_version = ssl.TLSVersion.TLSv1
+        if max_version: ctx.maximum_version = max_version
+        ctx.set_ciphers("ALL:@SECLEVEL=0")
+    except (ValueError, ssl.SSLError):
+        pass
+    return ctx
+
+def _handshake(target: str, port: int, sni: str, max_version=None, timeout: float = 2):
+    """完成一次握手，返回 (协商版本, 套件名, 证书 DER)；timeout 为尚无 RTT 样本时的默认超时"""
+    ctx = _client_context(max_version)
+    with probe("tls_handshake"), rtt.connect(target, port, timeout) as sock:
+        with ctx.wrap_socket(sock, server_hostname=sni) as ssock:
+            cipher = ssock.cipher()
+            return ssock.version(), cipher[0] if cipher else None, ssock.getpeercert(True)
+
+def _cached_handshake(target: str, port: int, sni: str, max_version=None, timeout: float = 2):
+    """经进程级探测缓存的握手：证书拉取与各协议版本探测在并发扫描间共享，握手失败不缓存"""
+    kind = f"tls_handshake:{max_version.name if max_version else 'default'}"
+    return PROBES.get(kind, target, port, sni, lambda: _handshake(target, port, sni, max_version, timeout))
+
+def _not_valid_after(cert) -> datetime:
+    expiry = getattr(cert, "not_valid_after_utc", None)
+    return expiry if expiry is not None else cert.not_valid_after.replace(tzinfo=timezone.utc)
+
+def analyze_certificate(der: bytes) -> dict:
+    cert = x509.load_der_x509_certificate(der, default_backend())
+    expiry = _not_valid_after(cert)
+    key_size = getattr(cert.public_key(), 'key_size', 2048)
+    try:
+        ext = cert.extensions.get_extension_for_oid(x509.oid.ExtensionOID.SUBJECT_ALTERNATIVE_NAME)
+        sans = ext.value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        sans = []
+    cn = cert.subject.get_attributes_for_oid(x509.oid.NameOID.COMMON_NAME)
+    return {
+        "subject": cert.subject.rfc4514_string(),
+        "common_name": str(cn[0].value) if cn else None,
+        "sans": sans,
+        "expiry": expiry.strftime("%Y-%m-%d"),
+        "key_size": key_size,
+        "is_expired": datetime.now(timezone.utc) > expiry
+    }
+
+def hostname_matches(cert_info: dict, vhost: str) -> bool:
+    """按 SAN (含通配符) 匹配域名，无 SAN 时回退到 CN"""
+    names = cert_info.get("sans") or ([cert_info["common_name"]] if cert_info.get("common_name") else [])
+    vhost = vhost.lower().rstrip('.')
+    for name in names:
+        name = name.lower()
+        if name.startswith('*.'):
+            # 通配符只匹配一级子域
+            if vhost.count('.') == name.count('.') and vhost.endswith(name[1:]):
+                return True
+        elif name == vhost:
+            return True
+    return False
+
+class TlsInspector:
+    """
+    单次扫描范围内共享的 TLS 检查器：
+    1. 一次默认握手同时取得协商版本、套件与证书；老旧协议只在需要时追加最多两次限定版本的握手。
+    2. 检查结果按 (ip, port, SNI) 缓存，证书解析按指纹缓存；
+       同一端点上共用证书的虚拟主机复用证书分析与协议矩阵。
+    """
+    def __init__(self, timeout: float = 2):
+        self.timeout = timeout
+        self._results = {}
+        self._certs = {}
+        self._protocols = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, cache: dict, key, factory):
+        with self._lock:
+            if key in cache:
+                return cache[key]
+        value = factory()
+        with self._lock:
+            return cache.setdefault(key, value)
+
+    def _weak_protocols(self, target: str, port: int, sni: str, negotiated: str) -> list:
+        if negotiated == "TLSv1":
+            # 服务器最高只支持 TLSv1.0，无需再探测
+            return ["TLSv1.0"]
+        weak = []
+        probes = [ssl.TLSVersion.TLSv1_1, ssl.TLSVersion.TLSv1]
+        if negotiated == "TLSv1.1":
+            weak.append("TLSv1.1")
+            probes = [ssl.TLSVersion.TLSv1]
+        for max_version in probes:
+            try:
+                version = _cached_handshake(target, port, sni, max_version, self.timeout)[0]
+            except Exception:
+                # 限定最高 1.1 仍失败时，服务器同样不接受 1.0
+                break
+            weak.append(WEAK_VERSIONS.get(version, version))
+            if version == "TLSv1":
+                break
+        return sorted(set(weak))
+
+    def inspect(self, target: str, port: int, vhost: str = None) -> dict:
+        sni = vhost if vhost else target
+        return self._cached(self._results, (target, port, sni), lambda: self._inspect(target, port, sni))
+
+    def _inspect(self, target: str, port: int, sni: str) -> dict:
+        results = {
+            "weak_protocols": [],
+            "cert_info": None,
+            "vulnerabilities": []
+        }
+        try:
+            version, cipher, der = _cached_handshake(target, port, sni, timeout=self.timeout)
+        except Exception:
+            return results
+
+        results["protocol"] = version
+        results["cipher"] = cipher
+        if der:
+            fingerprint = hashlib.sha256(der).hexdigest()
+            results["fingerprint"] = fingerprint
+            try:
+                results["cert_info"] = self._cached(self._certs, fingerprint, lambda: analyze_certificate(der))
+            except Exception:
+                pass
+            proto_key = (target, port, fingerprint)
+        else:
+            proto_key = (target, port, sni)
+        results["weak_protocols"] = list(self._cached(
+            self._protocols, proto_key, lambda: self._weak_protocols(target, port, sni, version)))
+
+        info = results["cert_info"]
+        if info:
+            if info["is_expired"]: results["vulnerabilities"].append("CERT_EXPIRED")
+            if info["key_size"] < 2048: results["vulnerabilities"].append("WEAK_KEY_SIZE")
+        return results
+
+def certificate_fingerprint(target: str, port: int, vhost: str = None, timeout: float = 2):
+    """单次握手取得证书 SHA-256 指纹，握手失败时返回 None"""
+    try:
+        der = _cached_handshake(target, port, vhost if vhost else target, timeout=timeout)[2]
+    except Exception:
+        return None
+    return hashlib.sha256(der).hexdigest() if der else None
+
+def check_tls_vulnerability(target: str, port: int, vhost: str = None, inspector: TlsInspector = None):
+    """检测老旧协议与证书问题；传入扫描级 TlsInspector 时复用握手与证书分析结果"""
+    return (inspector or TlsInspector()).inspect(target, port, vhost)
@@ -1,14 +1,22 @@
 
 import requests
-import ssl
-import socket
+import math
 import re
-from datetime import datetime
-from cryptography import x509
-from cryptography.hazmat.backends import default_backend
-from concurrent.futures import ThreadPoolExecutor
+import html
+import uuid
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, quote
 
-# 离线探测常用的敏感路径集
+from core.metrics import probe
+from core.rtt import RTT
+from core.probe_cache import PROBES
+from scanners.http_pool import new_session
+from scanners.wordlist import load_wordlist, AdaptiveLimiter
+from scanners.tls_scan import TlsInspector, hostname_matches
+
+# 内置敏感路径集，data/wordlists 下的字典文件缺失时使用
 SENSITIVE_PATHS = [
     "/.git/config",
     "/.env",
@@ -23,6 +31,19 @@ SENSITIVE_PATHS = [
     "/server-status"
 ]
 
+# 路径探测只读取响应体的前 N 字节
+PROBE_BODY_CAP = 4096
+# 声明长度不超过该值的响应会被读完，以便连接回到 keep-alive 池
+DRAIN_LIMIT = 64 * 1024
+# 路径探测并发上限，实际并发由 AdaptiveLimiter 在 [1, 上限] 内动态调整
+PROBE_MAX_WORKERS = 32
+# 伪 404 基线采样：不同形态的随机不存在路径
+BASELINE_SAMPLES = ["/{}", "/{}.php", "/{}/"]
+# 响应体词元集合的 Jaccard 相似度达到该值即视为与基线同一兜底页面 (容忍 CSRF 值、时间戳等逐请求变化的片段)
+SOFT404_SIMILARITY = 0.8
+# 词元按空白与常见标记符号切分
+_TOKEN = re.compile(rb"[^\s<>\"'=/&;,:]+")
+
 # 关键安全响应头检查列表
 SECURITY_HEADERS = [
     "Content-Security-Policy",
@@ -32,90 +53,243 @@ SECURITY_HEADERS = [
     "Referrer-Policy"
 ]
 
-def verify_vhost(target: str, port: int, vhost: str):
+def verify_vhost(target: str, port: int, vhost: str, pool=None, inspector: TlsInspector = None, scheme: str = None):
     """
-    验证域名是否真的是该 IP 承载的有效虚拟主机
+    验证域名是否真的是该 IP 承载的有效虚拟主机：
+    HTTPS 证书覆盖该域名即可确认 (证书来自扫描级 TlsInspector 缓存，不再单独握手)；
+    否则以该域名为 Host 请求根路径 (与服务指纹共用同一次请求)，404 / 421 视为未承载。
     """
+    if _scheme(port, scheme) == "https":
+        info = (inspector or TlsInspector()).inspect(target, port, vhost).get("cert_info")
+        if info and hostname_matches(info, vhost):
+            return True
     try:
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        
-        with socket.create_connection((target, port), timeout=3) as sock:
-            with context.wrap_socket(sock, server_hostname=vhost) as ssock:
-                cert_bin = ssock.getpeercert(True)
-                cert = x509.load_der_x509_certificate(cert_bin, default_backend())
-                
-                try:
-                    ext = cert.extensions.get_extension_for_oid(x509.oid.ExtensionOID.SUBJECT_ALTERNATIVE_NAME)
-                    sans = ext.value.get_values_for_type(x509.GeneralName)
-                    for san in sans:
-                        pattern = san.replace('.', r'\.').replace('*', r'.*')
-                        if re.fullmatch(pattern, vhost, re.IGNORECASE):
-                            return True
-                except:
-                    cn = str(cert.subject.get_attributes_for_oid(x509.oid.NameOID.COMMON_NAME)[0].value)
-                    if cn.lower() == vhost.lower():
-                        return True
+        return fetch_root(target, port, vhost, pool, scheme)["status"] not in (404, 421)
+    except Exception:
         return False
-    except:
+
+def _fetch_capped(client, url, headers, timeout=2, cap=PROBE_BODY_CAP):
+    """
+    流式 GET，仅读取前 cap 字节：
+    小响应读完后连接归还连接池，大响应直接断开，避免下载整个页面。
+    返回 (状态码, 响应长度, 响应体前缀)。
+    """
+    with probe("http_path"):
+        r = client.get(url, headers=headers, timeout=timeout, allow_redirects=False, verify=False, stream=True)
+    try:
+        body = r.raw.read(cap, decode_content=True) or b""
+        declared = r.headers.get('Content-Length', '')
+        length = int(declared) if declared.isdigit() else len(body)
+        if len(body) < cap or (declared.isdigit() and length <= DRAIN_LIMIT):
+            r.raw.drain_conn()
+            r.raw.release_conn()
+        else:
+            r.close()
+    except Exception:
+        r.close()
+        raise
+    return r.status_code, length, body
+
+def _length_bucket(length: int) -> int:
+    # 按约 10% 的对数区间分桶，容忍动态内容造成的细微长度差异
+    return int(math.log(length + 1, 1.1))
+
+def _fingerprint(status: int, length: int, body: bytes, path: str) -> dict:
+    # 兜底页面常回显请求路径，计算摘要前剔除完整路径及其 HTML 转义、URL 编码形式；
+    # 只剔除带开头 / 的完整路径，正文中与路径同名的普通单词 (admin、backup 等) 保持不变
+    normalized = body
+    for echo in sorted({path, html.escape(path), quote(path)}, key=len, reverse=True):
+        normalized = normalized.replace(echo.encode(), b"")
+    return {
+        "status": status,
+        # 分桶长度只扣除实际剔除的回显字节，不回显路径的兜底页面长度不随路径变化
+        "bucket": _length_bucket(max(0, length - (len(body) - len(normalized)))),
+        "hash": hashlib.sha1(normalized).hexdigest(),
+        "tokens": frozenset(_TOKEN.findall(normalized))
+    }
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+def build_soft404_baseline(base_url, headers, session=None):
+    """
+    请求若干随机的不存在路径，记录服务器对"不存在"的响应指纹 (状态码、长度分桶、内容摘要与词元集合)。
+    正常返回 404 的服务器基线为空。
+    """
+    client = session or requests
+    baseline = []
+    timeout = RTT.timeouts(urlsplit(base_url).hostname, 2, 2)
+    for template in BASELINE_SAMPLES:
+        path = template.format(uuid.uuid4().hex)
         try:
-            r = requests.get(f"http://{target}:{port}", headers={"Host": vhost}, timeout=2, allow_redirects=False)
-            return r.status_code not in [404, 421]
-        except:
-            return False
+            status, length, body = _fetch_capped(client, f"{base_url.rstrip('/')}{path}", headers, timeout)
+        except Exception:
+            continue
+        fp = _fingerprint(status, length, body, path)
+        if status == 200 and fp not in baseline:
+            baseline.append(fp)
+    return baseline
 
-def probe_sensitive_paths(base_url, headers):
+def _matches_baseline(fp: dict, baseline: list) -> bool:
+    # 长度分桶只用于预筛，状态码一致且内容摘要相同或词元集合足够相似才视为兜底页面；
+    # 长度相近但内容不同的真实页面不会被误判为不存在
+    for b in baseline:
+        if fp["status"] != b["status"] or abs(fp["bucket"] - b["bucket"]) > 1: continue
+        if fp["hash"] == b["hash"] or _similarity(fp["tokens"], b["tokens"]) >= SOFT404_SIMILARITY:
+            return True
+    return False
+
+def probe_sensitive_paths(base_url, headers, session=None, baseline=None, wordlist=None, max_workers=PROBE_MAX_WORKERS, cancel=None):
     """
-    并发探测敏感目录
+    按字典探测敏感路径，传入 session 时所有路径复用同一组 keep-alive 连接：
+    1. 字典按目录深度逐层流式下发，上级目录不存在时跳过其子路径。
+    2. 每个响应只读取前 PROBE_BODY_CAP 字节，并与伪 404 基线比对排除兜底页面。
+    3. 在途请求数由 AdaptiveLimiter 根据延迟与错误率动态调整。
+    4. cancel (CancelToken) 触发后不再下发新路径，等待在途请求结束后返回已发现的结果。
     """
+    client = session or requests
+    baseline = baseline or []
+    wordlist = wordlist or load_wordlist(fallback=SENSITIVE_PATHS)
+    limiter = AdaptiveLimiter(maximum=max_workers)
+    # 每条路径的 (建连, 读) 超时由目标 RTT 推导，在整次探测内固定
+    timeout = RTT.timeouts(urlsplit(base_url).hostname, 2, 2)
     exposed = []
+    absent = set()
     
     def check_path(path):
+        # 返回 (路径, 是否存在, 暴露记录)；网络错误时是否存在为 None，不参与剪枝
+        started = time.monotonic()
         try:
             full_url = f"{base_url.rstrip('/')}{path}"
-            # 仅做 HEAD 请求以减少流量，或者做 GET 但只读少量内容
-            r = requests.get(full_url, headers=headers, timeout=2, allow_redirects=False, verify=False)
-            # 排除 404, 403, 5xx，通常 200 或 3xx 可能代表存在
-            if r.status_code == 200:
-                # 二次校验：如果内容包含 404 文本（伪 404），则跳过
-                if "404" not in r.text[:200].lower():
-                    return {"path": path, "status": r.status_code}
-            return None
-        except:
-            return None
-
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = list(executor.map(check_path, SENSITIVE_PATHS))
-        exposed = [r for r in results if r]
+            status, length, body = _fetch_capped(client, full_url, headers, timeout)
+        except Exception:
+            limiter.record(time.monotonic() - started, error=True)
+            return path, None, None
+        limiter.record(time.monotonic() - started)
+
+        if status in (404, 410):
+            return path, False, None
+        # 排除 404, 403, 5xx，通常 200 或 3xx 可能代表存在
+        if status == 200:
+            # 二次校验：内容包含 404 文本或与伪 404 基线一致时视为不存在
+            if "404" in body[:200].decode(errors='ignore').lower():
+                return path, False, None
+            if _matches_baseline(_fingerprint(status, length, body, path), baseline):
+                return path, False, None
+            return path, True, {"path": path, "status": status}
+        return path, True, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in range(len(wordlist.levels)):
+            if cancel is not None and cancel.cancelled:
+                break
+            # 每层全部完成后再进入下一层，保证剪枝所需的目录结果已知
+            paths = wordlist.iter_level(level, absent)
+            pending = set()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < limiter.limit:
+                    if cancel is not None and cancel.cancelled:
+                        exhausted = True
+                        break
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(check_path, path))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    path, present, hit = f.result()
+                    if present is False and path in wordlist.dirs:
+                        absent.add(path)
+                    if hit:
+                        exposed.append(hit)
     
-    return exposed
+    return sorted(exposed, key=lambda x: x["path"])
+
+def _scheme(port: int, scheme: str = None) -> str:
+    # scheme 由服务指纹识别给出；未指定时按常见端口推断
+    return scheme or ("https" if port == 443 or port == 8443 else "http")
+
+def _base_url(target: str, port: int, scheme: str = None) -> str:
+    return f"{_scheme(port, scheme)}://{target}:{port}"
+
+# 参与 Web 服务指纹计算的响应头 (Date、Set-Cookie 等每次请求都会变化的头不计入)
+FINGERPRINT_HEADERS = ["Server", "X-Powered-By", "Location"] + SECURITY_HEADERS
+
+def _fetch_root(session, target: str, port: int, vhost: str = None, scheme: str = None) -> dict:
+    """请求根路径，只读取状态码与响应头 (不下载响应体)"""
+    headers = {'User-Agent': 'NetAudit-Audit-Bot/3.1'}
+    if vhost: headers['Host'] = vhost
+    with probe("http_root"):
+        r = session.get(_base_url(target, port, scheme), headers=headers, timeout=RTT.timeouts(target, 4, 4), allow_redirects=False, verify=False, stream=True)
+    r.close()
+    return {"status": r.status_code, "headers": r.headers}
 
-def scan_http(target: str, port: int, vhost: str = None):
+def fetch_root(target: str, port: int, vhost: str = None, pool=None, scheme: str = None) -> dict:
+    """
+    根路径响应经进程级探测缓存共享：同一扫描的指纹计算与深度探测、
+    以及并发扫描同一目标时只请求一次；HTTP 与 HTTPS 的结果分别缓存。失败时抛出异常 (不缓存)。
+    """
+    def fetch():
+        owns_session = pool is None
+        session = new_session(vhost) if owns_session else pool.get(target, port, vhost)
+        try:
+            return _fetch_root(session, target, port, vhost, scheme)
+        finally:
+            if owns_session: session.close()
+    return PROBES.get("http_root", target, port, vhost, fetch, _scheme(port, scheme))
+
+def fingerprint_http(target: str, port: int, vhost: str = None, pool=None, scheme: str = None):
+    """
+    单次请求获取 Web 服务指纹 (状态码与稳定响应头)，供增量审计判断服务是否变化。
+    请求失败时返回 None。
+    """
     try:
-        protocol = "https" if port == 443 or port == 8443 else "http"
-        url = f"{protocol}://{target}:{port}"
+        root = fetch_root(target, port, vhost, pool, scheme)
+    except Exception:
+        return None
+    return {"status": root["status"], **{h: root["headers"].get(h) for h in FINGERPRINT_HEADERS}}
+
+def scan_http(target: str, port: int, vhost: str = None, pool=None, wordlist: str = None, cancel=None, scheme: str = None):
+    """
+    Web 服务探测。传入 HttpClientPool 时会话与伪 404 基线在整个扫描内复用，
+    否则创建临时会话并在返回前关闭。wordlist 为 data/wordlists 下的字典名称。
+    cancel (CancelToken) 触发后敏感路径探测提前结束，返回部分结果。
+    scheme (http / https) 缺省时按端口推断。
+    """
+    owns_session = pool is None
+    session = new_session(vhost) if owns_session else pool.get(target, port, vhost)
+    try:
+        url = _base_url(target, port, scheme)
         
         headers = {'User-Agent': 'NetAudit-Audit-Bot/3.1'}
         if vhost: headers['Host'] = vhost
             
-        response = requests.get(url, headers=headers, timeout=4, allow_redirects=False, verify=False)
-        server_banner = response.headers.get('Server', 'Unknown')
+        response_headers = fetch_root(target, port, vhost, pool, scheme)["headers"]
+        server_banner = response_headers.get('Server', 'Unknown')
         
         # 深度探测：敏感目录扫描
-        exposed_paths = probe_sensitive_paths(url, headers)
+        if owns_session:
+            baseline = build_soft404_baseline(url, headers, session)
+        else:
+            baseline = pool.baseline(target, port, vhost, lambda: build_soft404_baseline(url, headers, session))
+        exposed_paths = probe_sensitive_paths(url, headers, session, baseline, load_wordlist(wordlist, fallback=SENSITIVE_PATHS), cancel=cancel)
         
         # 深度探测：安全头分析
         missing_headers = []
         for sh in SECURITY_HEADERS:
-            if sh not in response.headers:
+            if sh not in response_headers:
                 missing_headers.append(sh)
 
         return {
             "port": port,
             "status": "OPEN",
             "banner": server_banner,
-            "headers": dict(response.headers),
+            "headers": dict(response_headers),
             "vhost_matched": vhost if vhost else target,
             "deep_scan": {
                 "exposed_paths": exposed_paths,
@@ -124,42 +298,5 @@ def scan_http(target: str, port: int, vhost: str = None):
         }
     except Exception as e:
         return {"port": port, "status": "CLOSED", "error": str(e)}
-
-def check_tls_vulnerability(target: str, port: int, vhost: str = None):
-    results = {
-        "weak_protocols": [],
-        "cert_info": None,
-        "vulnerabilities": []
-    }
-    
-    # 1. 检测老旧协议
-    for version_name, version_const in [("TLSv1.0", ssl.PROTOCOL_TLSv1), ("TLSv1.1", ssl.PROTOCOL_TLSv1_1)]:
-        try:
-            context = ssl.SSLContext(version_const)
-            with socket.create_connection((target, port), timeout=2) as sock:
-                with context.wrap_socket(sock, server_hostname=vhost if vhost else target) as ssock:
-                    results["weak_protocols"].append(version_name)
-        except: pass
-
-    # 2. 证书分析
-    try:
-        cert_pem = ssl.get_server_certificate((target, port))
-        cert = x509.load_pem_x509_certificate(cert_pem.encode(), default_backend())
-        
-        now = datetime.utcnow()
-        is_expired = now > cert.not_valid_after
-        pub_key = cert.public_key()
-        key_size = getattr(pub_key, 'key_size', 2048)
-        
-        results["cert_info"] = {
-            "subject": cert.subject.rfc4514_string(),
-            "expiry": cert.not_valid_after.strftime("%Y-%m-%d"),
-            "key_size": key_size,
-            "is_expired": is_expired
-        }
-        
-        if is_expired: results["vulnerabilities"].append("CERT_EXPIRED")
-        if key_size < 2048: results["vulnerabilities"].append("WEAK_KEY_SIZE")
-    except: pass
-
-    return results
+    finally:
+        if owns_session: session.close()
@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+import time
+
+WORDLIST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "wordlists")
+DEFAULT_WORDLIST = "sensitive_paths"
+
+_NAME_RE = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+class Wordlist:
+    """
+    去重后按目录深度分层的只读路径字典：
+    1. 同一份实例在所有虚拟主机间共享，探测时逐层流式迭代，不会为每个虚拟主机复制列表。
+    2. 以 / 结尾的条目视为目录，目录探测结果为不存在时，其子路径在后续层级中被剪枝。
+    """
+    def __init__(self, paths):
+        unique = {}
+        for raw in paths:
+            path = raw.strip()
+            if not path or path.startswith('#'): continue
+            if not path.startswith('/'): path = '/' + path
+            unique[path] = None
+
+        levels = {}
+        for path in unique:
+            levels.setdefault(self.depth(path), []).append(path)
+        self.levels = [tuple(levels[d]) for d in sorted(levels)]
+        self.dirs = frozenset(p for p in unique if p.endswith('/'))
+        self._size = len(unique)
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def depth(path: str) -> int:
+        return len([seg for seg in path.split('/') if seg])
+
+    def ancestors(self, path: str):
+        """返回字典中存在的、path 的所有上级目录"""
+        segs = [seg for seg in path.split('/') if seg]
+        for i in range(1, len(segs)):
+            parent = '/' + '/'.join(segs[:i]) + '/'
+            if parent in self.dirs:
+                yield parent
+
+    def iter_level(self, index: int, absent: set):
+        """流式迭代某一层的路径，跳过上级目录已确认不存在的条目"""
+        for path in self.levels[index]:
+            if absent and any(parent in absent for parent in self.ancestors(path)):
+                continue
+            yield path
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def resolve_wordlist_path(name: str = None) -> str:
+    name = name or DEFAULT_WORDLIST
+    if not _NAME_RE.match(name):
+        raise ValueError(f"无效的字典名称: {name}")
+    return os.path.join(WORDLIST_DIR, f"{name}.txt")
+
+def load_wordlist(name: str = None, fallback=None) -> Wordlist:
+    """
+    按名称加载 data/wordlists 下的字典文件，按 (路径, mtime) 缓存，文件更新后自动重新加载。
+    文件不存在时使用 fallback 列表。
+    """
+    path = resolve_wordlist_path(name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return Wordlist(fallback or [])
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        wordlist = Wordlist(f)
+    with _cache_lock:
+        _cache[path] = (mtime, wordlist)
+    return wordlist
+
+class AdaptiveLimiter:
+    """
+    基于观测延迟与错误率的并发自适应 (AIMD)：
+    1. 连续成功一轮 (limit 个请求) 且延迟平稳时并发 +1。
+    2. 出现错误或延迟超过最低延迟的 latency_factor 倍时并发减半，每个冷却窗口最多收缩一次。
+    """
+    def __init__(self, initial: int = 5, minimum: int = 1, maximum: int = 32, latency_factor: float = 3.0):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.min_latency = None
+        self.avg_latency = None
+        self.errors = 0
+        self.requests = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+                self._decrease()
+                return
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+            self.avg_latency = latency if self.avg_latency is None else self.avg_latency * 0.8 + latency * 0.2
+            if self.avg_latency > self.min_latency * self.latency_factor and self.avg_latency > 0.05:
+                self._decrease()
+                return
+            self._successes += 1
+            if self._successes >= self.limit:
+                self._successes = 0
+                self.limit = min(self.maximum, self.limit + 1)
+
+    def _decrease(self):
+        now = time.monotonic()
+        # 冷却窗口取当前平均延迟，避免同一批在途请求的失败被重复惩罚
+        if now - self._last_decrease < max(self.avg_latency or 0.0, 0.5):
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.minimum, self.limit // 2)
@@ -0,0 +1,72 @@
+import argparse
+import multiprocessing
+import os
+import signal
+
+from core.config import QUEUE_DB_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, MAX_CONCURRENT_SCANS
+from core.job_queue import JobQueue
+from core.worker import ScanWorker
+from core import engine
+from scanners import registry as scanners
+
+# 独立的扫描 worker 进程：与 API 进程共享 DATA_DIR 下的队列库、任务库与档案库。
+# 拆分部署时 API 进程设置 NETAUDIT_EMBEDDED_WORKERS=0，按需在一个或多个节点上启动多个 worker：
+#     python worker.py --slots 4
+# 多进程模式下父进程预先导入全部扫描器并加载规则后再 fork，子进程直接共享已导入的模块：
+#     python worker.py --processes 4 --slots 2
+
+def serve(args):
+    # 规则文件缺失或无效时在领取任务前失败；多进程模式下父进程已加载，子进程直接沿用
+    engine.analyzer.rules
+    worker = ScanWorker(JobQueue(QUEUE_DB_PATH, max_attempts=JOB_MAX_ATTEMPTS, max_running=MAX_CONCURRENT_SCANS),
+                        slots=args.slots, lease=args.lease, poll_interval=args.poll_interval)
+
+    def shutdown(signum, frame):
+        # 收到终止信号后不再领取新任务，执行中的任务完成后退出
+        print(f"Worker {worker.worker_id} draining...")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    print(f"Worker {worker.worker_id} started with {args.slots} slots")
+    worker.run_forever()
+
+def supervise(args):
+    """
+    预加载后 fork 出 args.processes 个 worker 子进程：
+    父进程只导入扫描器与规则，不打开任何 SQLite 连接、不启动线程，子进程各自建立连接。
+    父进程把终止信号转发给子进程，并等待全部子进程退出。
+    """
+    loaded = scanners.preload()
+    print(f"Preloaded scanners: {', '.join(loaded)}; {len(engine.analyzer.rules)} compliance rules")
+    ctx = multiprocessing.get_context("fork")
+    children = [ctx.Process(target=serve, args=(args,), name=f"scan-worker-{i}") for i in range(args.processes)]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="NetAudit 扫描 worker")
+    parser.add_argument("--slots", type=int, default=2, help="每个 worker 进程并发执行的扫描任务数")
+    parser.add_argument("--processes", type=int, default=1, help="worker 进程数，大于 1 时预加载后 fork 子进程")
+    parser.add_argument("--lease", type=float, default=JOB_LEASE_SECONDS, help="任务租约时长 (秒)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="队列为空时的轮询间隔 (秒)")
+    args = parser.parse_args()
+
+    engine.ensure_data_dir()
+    if args.processes > 1:
+        supervise(args)
+    else:
+        serve(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 
 import React, { useEffect, useState } from 'react';
 import { Clock, Fingerprint, Activity, ShieldCheck, Zap, TrendingUp } from 'lucide-react';
-import { ScanReport } from '../types';
+import { ScanReport, ScanSummary } from '../types';
 import { Radar, RadarChart, PolarGrid, PolarAngleAxis, ResponsiveContainer } from 'recharts';
 
 interface DashboardProps {
   report: ScanReport | null;
-  scanHistory: ScanReport[];
-  onSelectReport: (report: ScanReport) => void;
+  scanHistory: ScanSummary[];
+  onSelectReport: (report: ScanSummary) => void;
 }
 
 const Dashboard: React.FC<DashboardProps> = ({ report }) => {
@@ -103,6 +103,29 @@ const Dashboard: React.FC<DashboardProps> = ({ report }) => {
                 <span className="text-2xl font-black">{report.summary.low}</span>
               </div>
             </div>
+            {report.truncated && (
+              <div className="mt-6 p-3 rounded-lg bg-orange-500/10 border border-orange-500/20">
+                <p className="text-[9px] font-black uppercase text-orange-500">
+                  {report.truncated_reason === 'deadline' ? '审计超出截止时间' : '审计已被取消'}，报告仅包含已完成的部分
+                </p>
+              </div>
+            )}
+            {report.diff && (
+              <div className="mt-6 grid grid-cols-3 gap-2 text-center">
+                <div className="p-2 rounded-lg bg-danger/10 border border-danger/20">
+                  <div className="text-lg font-black">{report.diff.new_count ?? report.diff.new.length}</div>
+                  <div className="text-[8px] font-black uppercase text-danger">新增</div>
+                </div>
+                <div className="p-2 rounded-lg bg-brand/10 border border-brand/20">
+                  <div className="text-lg font-black">{report.diff.fixed_count ?? report.diff.fixed.length}</div>
+                  <div className="text-[8px] font-black uppercase text-brand">已修复</div>
+                </div>
+                <div className="p-2 rounded-lg bg-white/5 border border-white/10">
+                  <div className="text-lg font-black">{report.diff.unchanged_count ?? report.diff.unchanged.length}</div>
+                  <div className="text-[8px] font-black uppercase text-white/40">未变化</div>
+                </div>
+              </div>
+            )}
             <div className="mt-8 bg-brand/10 p-4 rounded-xl border border-brand/20">
                <p className="text-[9px] font-bold text-brand uppercase leading-tight italic">
                  建议: 优先修复端口 {report.port_statuses.find(p => p.protocol === 'HTTP')?.port || '80'} 的版本泄露问题。
@@ -1,18 +1,19 @@
 
 import React, { useState, useRef } from 'react';
-import { ScanReport } from '../types';
+import { ScanReport, ScanSummary } from '../types';
 import { Database, Search, Calendar, Target, Trash2, ExternalLink, Download, Upload, Loader2, RefreshCw, Bomb, Eraser } from 'lucide-react';
 
 interface HistoryViewProps {
-  history: ScanReport[];
-  onSelect: (report: ScanReport) => void;
+  history: ScanSummary[];
+  onSelect: (report: ScanSummary) => void;
   onDelete: (id: number) => void;
   onImport?: (reports: ScanReport[]) => void;
   onRefresh?: () => void;
+  onLoadMore?: () => void;
   apiBaseUrl: string;
 }
 
-const HistoryView: React.FC<HistoryViewProps> = ({ history, onSelect, onDelete, onImport, onRefresh, apiBaseUrl }) => {
+const HistoryView: React.FC<HistoryViewProps> = ({ history, onSelect, onDelete, onImport, onRefresh, onLoadMore, apiBaseUrl }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [deletingId, setDeletingId] = useState<number | null>(null);
   const [isPurging, setIsPurging] = useState(false);
@@ -22,8 +23,23 @@ const HistoryView: React.FC<HistoryViewProps> = ({ history, onSelect, onDelete,
     item.target.includes(searchTerm) || item.timestamp.includes(searchTerm)
   );
 
-  const handleExportDB = () => {
-    const dataStr = JSON.stringify(history, null, 2);
+  const handleExportDB = async () => {
+    // 列表只含摘要，备份前逐条拉取完整报告
+    const base = apiBaseUrl.replace(/\/$/, "");
+    const reports: ScanReport[] = [];
+    for (const item of history) {
+      if (item.defects || item.id === undefined) {
+        reports.push(item as ScanReport);
+        continue;
+      }
+      try {
+        const response = await fetch(`${base}/api/history/${item.id}`);
+        if (response.ok) reports.push(await response.json());
+      } catch (e) {
+        console.warn(`导出档案 ${item.id} 失败`);
+      }
+    }
+    const dataStr = JSON.stringify(reports, null, 2);
     const blob = new Blob([dataStr], { type: 'application/json' });
     const url = URL.createObjectURL(blob);
     const link = document.createElement('a');
@@ -199,7 +215,7 @@ const HistoryView: React.FC<HistoryViewProps> = ({ history, onSelect, onDelete,
                  <div className="flex items-center gap-4">
                     <div className="flex -space-x-2">
                        {item.summary.high > 0 && <div className="w-8 h-8 rounded-full bg-red-500/20 border border-red-500/40 flex items-center justify-center text-red-500 font-black text-[10px]" title="高危">{item.summary.high}</div>}
-                       <div className="w-8 h-8 rounded-full bg-white/5 border border-white/10 flex items-center justify-center text-white/40 font-black text-[10px]">{item.defects.length}</div>
+                       <div className="w-8 h-8 rounded-full bg-white/5 border border-white/10 flex items-center justify-center text-white/40 font-black text-[10px]">{item.defect_count ?? item.defects?.length ?? 0}</div>
                     </div>
                  </div>
               </div>
@@ -222,6 +238,11 @@ const HistoryView: React.FC<HistoryViewProps> = ({ history, onSelect, onDelete,
               </div>
             </div>
           ))}
+          {onLoadMore && (
+            <button onClick={onLoadMore} className="w-full py-4 rounded-2xl border border-white/5 text-[10px] font-black text-white/30 hover:text-white hover:border-white/10 transition-all uppercase tracking-widest">
+              加载更多档案
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -1,6 +1,7 @@
 
 import React, { useState, useRef } from 'react';
 import { ScanReport, AppConfig } from '../types';
+import { exportUrl } from '../services/scanService';
 import { Database, FileJson, Loader2, FileText, Printer, FileCode, ShieldCheck, Download, Zap, ShieldAlert, Cpu, Lock, Terminal, Shield, UserCheck } from 'lucide-react';
 
 interface ReportViewProps {
@@ -133,6 +134,16 @@ ${report.port_statuses.map(p => `- Port ${p.port} (${p.protocol}): ${p.detail}`)
     }, 500);
   };
 
+  // 发现项明细由服务端从数据库流式导出，浏览器直接下载，不在前端序列化整份报告
+  const downloadCsv = () => {
+    if (!report) return;
+    const url = exportUrl(config?.apiBaseUrl || '', report, 'csv');
+    if (!url) return;
+    const a = document.createElement('a');
+    a.href = url;
+    a.click();
+  };
+
   if (!report) {
     return (
       <div className="flex flex-col items-center justify-center h-[600px] tactical-card rounded-[4rem] border-dashed border-white/5 relative overflow-hidden bg-black/20">
@@ -196,6 +207,13 @@ ${report.port_statuses.map(p => `- Port ${p.port} (${p.protocol}): ${p.detail}`)
                  <span className="text-[8px] opacity-40 font-bold block mt-1 tracking-widest uppercase">System Raw Data</span>
                </div>
              </button>
+             <button onClick={downloadCsv} disabled={!!isExporting || !exportUrl(config?.apiBaseUrl || '', report, 'csv')} className="px-10 py-6 bg-white/5 border border-white/10 text-white rounded-2xl font-black uppercase italic text-sm flex items-center gap-4 hover:bg-white/10 transition-all disabled:opacity-50 min-w-[260px]">
+               <FileText size={20} className="text-info" />
+               <div className="text-left">
+                 <span className="block leading-none">CSV 缺陷明细</span>
+                 <span className="text-[8px] opacity-40 font-bold block mt-1 tracking-widest uppercase">Streamed Export</span>
+               </div>
+             </button>
           </div>
         </div>
       </div>
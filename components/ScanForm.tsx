@@ -17,6 +17,7 @@ const ScanForm: React.FC<ScanFormProps> = ({ onScanComplete, config, draft, setD
   const [isScanning, setIsScanning] = useState(false);
   const [scanMode, setScanMode] = useState<ScanMode>(ScanMode.QUICK);
   const [enableBrute, setEnableBrute] = useState(false);
+  const [incremental, setIncremental] = useState(false);
   const [progress, setProgress] = useState(0);
   const [currentAction, setCurrentAction] = useState("");
   const [showHistoryPopup, setShowHistoryPopup] = useState(false);
@@ -119,7 +120,8 @@ const ScanForm: React.FC<ScanFormProps> = ({ onScanComplete, config, draft, setD
           }
         },
         abortRef.current,
-        metadata
+        metadata,
+        incremental
       );
 
       setProgress(100);
@@ -168,16 +170,16 @@ const ScanForm: React.FC<ScanFormProps> = ({ onScanComplete, config, draft, setD
 
               {/* Form Fields */}
               <div className="space-y-4">
-                {/* 目标 IP */}
+                {/* 目标 IP / 网段 */}
                 <div className="relative group" onMouseEnter={handleMouseEnter} onMouseLeave={handleMouseLeave}>
-                  <label className="text-[9px] font-black uppercase tracking-[0.3em] text-white/20 mb-1.5 px-1 block">目标 IP 地址</label>
+                  <label className="text-[9px] font-black uppercase tracking-[0.3em] text-white/20 mb-1.5 px-1 block">目标 IP / 网段</label>
                   <div className="relative">
                     <input 
                       value={draft.target} 
                       onChange={e => handleUpdateDraft('target', e.target.value)} 
                       disabled={isScanning} 
                       className="w-full pl-11 pr-6 py-3.5 bg-white/[0.03] border border-white/10 rounded-xl text-sm font-bold focus:border-brand/40 outline-none transition-all mono text-white/90" 
-                      placeholder="127.0.0.1" 
+                      placeholder="192.168.1.0/24, 10.0.0.5" 
                     />
                     <Network className="absolute left-4 top-1/2 -translate-y-1/2 text-white/20" size={16} />
                   </div>
@@ -274,6 +276,19 @@ const ScanForm: React.FC<ScanFormProps> = ({ onScanComplete, config, draft, setD
                   </div>
                 </div>
 
+                {/* 增量复测开关 */}
+                <div className={`p-4 rounded-xl border transition-all flex items-center justify-between cursor-pointer ${incremental ? 'bg-brand/5 border-brand/30' : 'bg-white/5 border-white/10'}`} onClick={() => !isScanning && setIncremental(!incremental)}>
+                  <div className="flex items-center gap-3">
+                     <div className={`w-7 h-7 rounded-lg flex items-center justify-center transition-all ${incremental ? 'bg-brand text-black' : 'bg-white/10 text-white/30'}`}>
+                        <History size={14} />
+                     </div>
+                     <div className="text-[9px] font-black text-white/80 uppercase">增量复测</div>
+                  </div>
+                  <div className={`w-8 h-4 rounded-full relative transition-all ${incremental ? 'bg-brand' : 'bg-white/10'}`}>
+                     <div className={`absolute top-0.5 w-3 h-3 rounded-full bg-white transition-all ${incremental ? 'left-4.5' : 'left-0.5'}`}></div>
+                  </div>
+                </div>
+
                 {/* 端口范围 */}
                 <div className="relative group">
                   <label className="text-[9px] font-black uppercase tracking-[0.3em] text-white/20 mb-1.5 px-1 block">探测端口集</label>
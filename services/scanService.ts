@@ -10,6 +10,147 @@ const getApiUrl = (baseUrl: string, endpoint: string): string => {
   return `${sanitizedBase}${normalizedEndpoint}`;
 };
 
+class StreamUnavailableError extends Error {}
+
+/** 流式导出接口的地址：单份档案按 id 导出，多主机汇总报告按任务导出 */
+export const exportUrl = (apiBaseUrl: string, report: ScanReport, format: 'ndjson' | 'csv'): string | null => {
+  if (report.id !== undefined) return getApiUrl(apiBaseUrl, `/api/history/${report.id}/export?format=${format}`);
+  if (report.task_id) return getApiUrl(apiBaseUrl, `/api/scan/export/${report.task_id}?format=${format}`);
+  return null;
+};
+
+/**
+ * 以 NDJSON 流式加载历史档案：报告头到达后即回调，发现项与端口状态按到达的数据块增量追加，
+ * 大型档案无需等待整个 JSON 下载与解析完成即可开始渲染。
+ */
+export const streamHistoryReport = async (
+  apiBaseUrl: string,
+  scanId: number,
+  onUpdate: (report: ScanReport) => void
+): Promise<ScanReport> => {
+  const response = await fetch(getApiUrl(apiBaseUrl, `/api/history/${scanId}/export?format=ndjson`));
+  if (!response.ok || !response.body) throw new Error(`${response.status}`);
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const state: { report: ScanReport | null } = { report: null };
+  let pending = '';
+  let lastRender = 0;
+
+  const apply = (line: string) => {
+    if (!line.trim()) return;
+    const { type, host, ...item } = JSON.parse(line);
+    if (type === 'report') {
+      state.report = { ...item, defects: [], port_statuses: [] } as ScanReport;
+    } else if (state.report && type === 'finding') {
+      state.report.defects.push(item);
+    } else if (state.report && type === 'port') {
+      state.report.port_statuses.push(item);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    pending += decoder.decode(value, { stream: !done });
+    const lines = pending.split('\n');
+    pending = done ? '' : lines.pop() || '';
+    lines.forEach(apply);
+    // 渲染节流：每 250ms 最多回调一次新的对象引用
+    if (state.report && (done || Date.now() - lastRender > 250)) {
+      lastRender = Date.now();
+      onUpdate({ ...state.report, defects: [...state.report.defects], port_statuses: [...state.report.port_statuses] });
+    }
+    if (done) break;
+  }
+  if (!state.report) throw new Error("档案数据为空");
+  return state.report;
+};
+
+const streamScan = (
+  apiBaseUrl: string,
+  taskId: string,
+  onProgress: (pct: number, log: string) => void,
+  abortSignal: { cancelled: boolean }
+): Promise<ScanReport> => new Promise((resolve, reject) => {
+  const source = new EventSource(getApiUrl(apiBaseUrl, `/api/scan/stream/${taskId}`));
+
+  const finish = () => {
+    source.close();
+    window.clearInterval(abortTimer);
+  };
+
+  const abortTimer = window.setInterval(() => {
+    if (abortSignal.cancelled) {
+      finish();
+      onProgress(0, "审计任务已被用户中止。");
+      reject(new Error("审计已取消"));
+    }
+  }, 300);
+
+  source.addEventListener('progress', (e) => {
+    const data = JSON.parse((e as MessageEvent).data);
+    onProgress(data.percent || 10, data.log || "正在探测...");
+  });
+
+  source.addEventListener('completed', (e) => {
+    finish();
+    onProgress(100, "审计完成，正在同步报告...");
+    resolve(JSON.parse((e as MessageEvent).data).result as ScanReport);
+  });
+
+  source.addEventListener('failed', (e) => {
+    finish();
+    reject(new Error(JSON.parse((e as MessageEvent).data).error || "扫描引擎异常终止"));
+  });
+
+  source.onerror = () => {
+    finish();
+    reject(new StreamUnavailableError());
+  };
+});
+
+const pollScan = async (
+  apiBaseUrl: string,
+  taskId: string,
+  onProgress: (pct: number, log: string) => void,
+  abortSignal: { cancelled: boolean }
+): Promise<ScanReport> => {
+  const statusUrl = getApiUrl(apiBaseUrl, `/api/scan/status/${taskId}`);
+  
+  const MAX_POLLS = 1200; 
+  let polls = 0;
+
+  while (polls < MAX_POLLS) {
+    if (abortSignal.cancelled) {
+      onProgress(0, "审计任务已被用户中止。");
+      throw new Error("审计已取消");
+    }
+
+    const statusResponse = await fetch(statusUrl);
+    if (!statusResponse.ok) throw new Error("查询任务进度时链路异常");
+
+    const statusData = await statusResponse.json();
+    
+    if (statusData.status === 'completed') {
+      onProgress(100, "审计完成，正在同步报告...");
+      return statusData.result as ScanReport;
+    }
+    
+    if (statusData.status === 'failed') {
+      throw new Error(statusData.error || "扫描引擎异常终止");
+    }
+
+    if (statusData.progress) {
+      onProgress(statusData.progress.percent || 10, statusData.progress.log || "正在探测...");
+    }
+
+    polls++;
+    await new Promise(resolve => setTimeout(resolve, 1500));
+  }
+
+  throw new Error("扫描任务执行超时。");
+};
+
 export const performScan = async (
   apiBaseUrl: string,
   target: string, 
@@ -21,9 +162,12 @@ export const performScan = async (
   enableBrute: boolean,
   onProgress: (pct: number, log: string) => void,
   abortSignal: { cancelled: boolean },
-  metadata?: any // 新增元数据参数
+  metadata?: any, // 新增元数据参数
+  incremental: boolean = false,
+  deadline?: number // 扫描截止时间 (秒)，超时后服务端保存部分结果
 ): Promise<ScanReport> => {
   
+  let taskId: string | null = null;
   try {
     const startUrl = getApiUrl(apiBaseUrl, '/api/scan');
     const startResponse = await fetch(startUrl, {
@@ -37,7 +181,9 @@ export const performScan = async (
         dictionaries: dicts,
         mode: mode,
         enable_brute: enableBrute,
-        metadata: metadata // 发送到后端
+        metadata: metadata, // 发送到后端
+        incremental: incremental,
+        deadline: deadline
       }),
     });
 
@@ -47,45 +193,25 @@ export const performScan = async (
     }
 
     const { task_id } = await startResponse.json();
+    taskId = task_id;
     onProgress(5, "任务已同步到内核，排队中...");
 
-    const statusUrl = getApiUrl(apiBaseUrl, `/api/scan/status/${task_id}`);
-    
-    const MAX_POLLS = 1200; 
-    let polls = 0;
-
-    while (polls < MAX_POLLS) {
-      if (abortSignal.cancelled) {
-        onProgress(0, "审计任务已被用户中止。");
-        throw new Error("审计已取消");
-      }
-
-      const statusResponse = await fetch(statusUrl);
-      if (!statusResponse.ok) throw new Error("查询任务进度时链路异常");
-
-      const statusData = await statusResponse.json();
-      
-      if (statusData.status === 'completed') {
-        onProgress(100, "审计完成，正在同步报告...");
-        return statusData.result as ScanReport;
-      }
-      
-      if (statusData.status === 'failed') {
-        throw new Error(statusData.error || "扫描引擎异常终止");
-      }
-
-      if (statusData.progress) {
-        onProgress(statusData.progress.percent || 10, statusData.progress.log || "正在探测...");
-      }
-
-      polls++;
-      await new Promise(resolve => setTimeout(resolve, 1500));
+    try {
+      return await streamScan(apiBaseUrl, task_id, onProgress, abortSignal);
+    } catch (error: any) {
+      if (!(error instanceof StreamUnavailableError)) throw error;
+      // 推送通道不可用 (如代理不支持 SSE) 时回退到轮询
+      return await pollScan(apiBaseUrl, task_id, onProgress, abortSignal);
     }
 
-    throw new Error("扫描任务执行超时。");
-
   } catch (error: any) {
-    if (error.message === "审计已取消") throw error;
+    if (error.message === "审计已取消") {
+      // 通知服务端中止扫描，释放探测连接；已完成的部分结果由服务端保存
+      if (taskId) {
+        fetch(getApiUrl(apiBaseUrl, `/api/scan/cancel/${taskId}`), { method: 'POST' }).catch(() => {});
+      }
+      throw error;
+    }
     throw new Error(error.message || "审计服务异常");
   }
 };
@@ -31,6 +31,8 @@ export interface DefectDict {
   detail_value?: string;
   suggestion: string;
   mlps_clause: string;
+  domain?: string;
+  host?: string;
   metadata?: {
     success_user?: string;
     success_pass?: string;
@@ -43,6 +45,20 @@ export interface PortStatus {
   port: number;
   status: 'OPEN' | 'CLOSED' | 'FILTERED';
   detail: string;
+  host?: string;
+}
+
+// 多主机任务中单台主机的报告摘要
+export interface HostSummary {
+  id?: number;
+  target: string;
+  score: number;
+  open_ports: number;
+  summary: {
+    high: number;
+    medium: number;
+    low: number;
+  };
 }
 
 export interface ScanReport {
@@ -64,6 +80,63 @@ export interface ScanReport {
     location: string;
     evaluator: string;
   };
+  hosts?: HostSummary[];
+  fingerprints?: Record<string, string>;
+  diff?: ScanDiff;
+  timings?: ScanTimings;
+  // 扫描被取消或超出截止时间时为 true，报告只包含已完成的部分
+  truncated?: boolean;
+  truncated_reason?: 'cancelled' | 'deadline';
+  // 产生该报告的扫描任务，用于 /api/scan/export/{task_id} 流式导出
+  task_id?: string;
+  // 发现项与端口状态总数；preview 为 true 时 defects / port_statuses 只是前若干条，完整内容需从档案流式加载
+  defect_count?: number;
+  port_count?: number;
+  preview?: boolean;
+}
+
+// 扫描耗时分解 (秒)：phases 为 run_deep_scan 各阶段，stages 为审计流水线各协议阶段
+export interface ScanTimings {
+  total: number;
+  phases: Record<string, number>;
+  stages?: Record<string, { units: number; busy_s: number; max_s: number }>;
+  hosts?: number;
+  ports?: number;
+  rtt?: { srtt_ms: number; rto_ms: number; samples: number };
+}
+
+// 增量审计相对上一次档案的差异
+export interface ScanDiff {
+  base_scan_id?: number;
+  new: DefectDict[];
+  fixed: DefectDict[];
+  unchanged: DefectDict[];
+  // 明细列表有条数上限，完整数量以 *_count 为准 (旧档案没有这些字段)
+  new_count?: number;
+  fixed_count?: number;
+  unchanged_count?: number;
+  reused_units: number;
+}
+
+// 档案列表条目：服务端只返回摘要，完整报告按需获取 (本地导入的备份带有完整 defects)
+export interface ScanSummary {
+  id?: number;
+  target: string;
+  timestamp: string;
+  score: number;
+  summary: {
+    high: number;
+    medium: number;
+    low: number;
+  };
+  defect_count?: number;
+  defects?: DefectDict[];
+  metadata?: ScanReport['metadata'];
+}
+
+export interface HistoryPage {
+  items: ScanSummary[];
+  next_cursor: number | null;
 }
 
 export interface AppConfig {